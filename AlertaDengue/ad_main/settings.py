@@ -323,9 +323,20 @@ DBF_SINAN = os.getenv("DBF_SINAN")
 MEDIA_ROOT = os.getenv("MEDIA_ROOT")
 IMPORTED_FILES = os.getenv("IMPORTED_FILES")
 TEMP_FILES_DIR = os.getenv("TEMP_FILES_DIR")
+# "copy" streams each chunk with COPY FROM STDIN, "executemany" inserts rows
+SINAN_UPLOAD_LOADER = os.getenv("SINAN_UPLOAD_LOADER", "copy")
+# Chunks parsed ahead, in parallel with the DB inserts (1 = no pipeline)
+SINAN_UPLOAD_PARSE_WORKERS = int(os.getenv("SINAN_UPLOAD_PARSE_WORKERS", 2))
+SINAN_UPLOAD_PARSE_QUEUE_DEPTH = int(
+    os.getenv("SINAN_UPLOAD_PARSE_QUEUE_DEPTH", 4)
+)
 
 # Storage destination path between production and development are not the same
 DATA_DIR = APPS_DIR.parent.parent / os.getenv("STORAGE")
+# City page snapshots written by dados.tasks.precompute_alert_snapshots
+ALERT_SNAPSHOTS_DIR = os.getenv(
+    "ALERT_SNAPSHOTS_DIR", str(DATA_DIR / "alert_snapshots")
+)
 
 # TEMPLATES
 # ------------------------------------------------------------------------------
@@ -380,6 +391,14 @@ RASTER_METEROLOGICAL_FACTOR_INCREASE = os.getenv(
 MEMCACHED_HOST = os.getenv("MEMCACHED_HOST")
 MEMCACHED_PORT = os.getenv("MEMCACHED_PORT")
 QUERY_CACHE_TIMEOUT = int(os.getenv("QUERY_CACHE_TIMEOUT"))
+# Max seconds a cache miss waits for another worker computing the same key
+QUERY_CACHE_LOCK_TIMEOUT = int(os.getenv("QUERY_CACHE_LOCK_TIMEOUT", 60))
+# Rows fetched at a time by the streamed API exports (api.streaming)
+API_STREAM_BATCH_SIZE = int(os.getenv("API_STREAM_BATCH_SIZE", 10000))
+# In-process LRU in front of CACHES for the small lookups (dados.localcache)
+LOCAL_CACHE_TIMEOUT = int(os.getenv("LOCAL_CACHE_TIMEOUT", 300))
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1024))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", 64 * 2**20))
 CACHE_MIDDLEWARE_ALIAS = "default"
 CACHE_MIDDLEWARE_SECONDS = 600
 CACHE_MIDDLEWARE_KEY_PREFIX = "_"
@@ -1,12 +1,23 @@
-from typing import Optional
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
 
 import ibis
 import ibis.expr.datatypes as dt
+import numpy as np
 import pandas as pd
 
 # local
 from ad_main.settings import PSQL_DB, get_ibis_conn, get_sqla_conn
-from dados.dbdata import CID10, STATE_NAME, get_disease_suffix  # noqa:F401
+from dados import epicalendar
+from dados.dbdata import (  # noqa:F401
+    CID10,
+    STATE_NAME,
+    cached_latest_alert_date,
+    get_disease_suffix,
+)
+from django.core.cache import cache
+from django.utils import timezone
 from sqlalchemy import text
 from sqlalchemy.engine.base import Engine
 
@@ -14,19 +25,186 @@ DB_ENGINE = get_sqla_conn()
 IBIS_CONN = get_ibis_conn()
 
 
+class NotificationFilter:
+    """
+    Composable WHERE clause over "Municipio"."Notificacao" (aliased `notif`).
+
+    Every predicate is written against the columns of the base table, so
+    PostgreSQL can use its indexes (dt_notific, cid10_codigo), and every
+    value is a bound parameter. The filters are immutable: each method
+    returns a new filter with one more predicate.
+
+    The parameter names are prefixed with `prefix`, so two filters can be
+    used in the same statement.
+    """
+
+    # nu_idade_n ranges (inclusive) of the age groups of the charts
+    AGE_RANGES = {
+        "00-04 anos": (None, 4004),
+        "05-09 anos": (4005, 4009),
+        "10-19 anos": (4010, 4019),
+        "20-29 anos": (4020, 4029),
+        "30-39 anos": (4030, 4039),
+        "40-49 anos": (4040, 4049),
+        "50-59 anos": (4050, 4059),
+        "60+ anos": (4060, None),
+    }
+
+    # sunday of the week one year before today, as a date so the
+    # comparison with dt_notific does not cast the column
+    PERIOD_START = """(
+        CAST(CURRENT_DATE - INTERVAL '1 YEAR' AS DATE)
+        - CAST(EXTRACT(DOW FROM CURRENT_DATE - INTERVAL '1 YEAR') AS INTEGER)
+    )"""
+
+    def __init__(
+        self,
+        predicates: Tuple[str, ...] = (),
+        params: Optional[dict] = None,
+        prefix: str = "",
+    ):
+        self.predicates = tuple(predicates)
+        self.params = dict(params or {})
+        self.prefix = prefix
+
+    def where(self, predicate: str, **params) -> "NotificationFilter":
+        """
+        Adds a predicate, its parameters written as `:name`.
+        """
+        for name in params:
+            predicate = re.sub(
+                rf":{name}\b", f":{self.prefix}{name}", predicate
+            )
+        params = {f"{self.prefix}{k}": v for k, v in params.items()}
+        reused = [k for k in params if k in self.params]
+        if reused:
+            raise ValueError(f"Parameters already bound: {reused}")
+        return NotificationFilter(
+            self.predicates + (predicate,),
+            {**self.params, **params},
+            self.prefix,
+        )
+
+    @property
+    def sql(self) -> str:
+        return " AND ".join(self.predicates) or "TRUE"
+
+    def uf(self, uf: str) -> "NotificationFilter":
+        # semi-join on the cities of the state instead of filtering the
+        # joined rows
+        return self.where(
+            """notif.municipio_geocodigo IN (
+                SELECT geocodigo
+                FROM "Dengue_global"."Municipio"
+                WHERE uf = :uf
+            )""",
+            uf=uf,
+        )
+
+    def diseases(self, disease: Optional[str] = None) -> "NotificationFilter":
+        """
+        :param disease: comma separated disease names, all by default.
+        """
+        if disease is None:
+            codes = list(CID10.values())
+        else:
+            codes = [CID10.get(d.lower(), "") for d in disease.split(",")]
+        return self.where(
+            "notif.cid10_codigo = ANY(:diseases)", diseases=codes
+        )
+
+    def genders(self, gender: Optional[str] = None) -> "NotificationFilter":
+        """
+        :param gender: comma separated "mulher"/"homem", both by default.
+        """
+        if gender is None:
+            codes = ["F", "M"]
+        else:
+            codes = [
+                "F" if g == "mulher" else "M"
+                for g in gender.lower().split(",")
+                if g in ("mulher", "homem")
+            ]
+        return self.where("notif.cs_sexo = ANY(:genders)", genders=codes)
+
+    def cities(self, city: Optional[str] = None) -> "NotificationFilter":
+        """
+        :param city: comma separated geocodes, all the cities by default.
+        """
+        if city is None:
+            return self
+        geocodes = [int(c) for c in city.split(",") if c.strip()]
+        return self.where(
+            "notif.municipio_geocodigo = ANY(:cities)", cities=geocodes
+        )
+
+    def ages(self, age: Optional[str] = None) -> "NotificationFilter":
+        """
+        :param age: comma separated age groups (AGE_RANGES keys, the "+" may
+            come as a space from the query string), any age by default.
+        """
+        if age is None:
+            return self.where("notif.nu_idade_n IS NOT NULL")
+
+        ranges = []
+        params = {}
+        for a in age.split(","):
+            age_range = self.AGE_RANGES.get(a.replace("  ", "+ "))
+            if age_range is None:
+                continue
+            i = len(ranges)
+            low, high = age_range
+            bounds = []
+            if low is not None:
+                bounds.append(f"notif.nu_idade_n >= :age_low_{i}")
+                params[f"age_low_{i}"] = low
+            if high is not None:
+                bounds.append(f"notif.nu_idade_n <= :age_high_{i}")
+                params[f"age_high_{i}"] = high
+            ranges.append(f"({' AND '.join(bounds)})")
+
+        return self.where(f"({' OR '.join(ranges) or 'FALSE'})", **params)
+
+    def period(
+        self,
+        initial_date: Optional[str] = None,
+        final_date: Optional[str] = None,
+    ) -> "NotificationFilter":
+        """
+        Notifications since the week of one year ago, optionally restricted
+        to [initial_date, final_date].
+        """
+        notif_filter = self.where(f"notif.dt_notific >= {self.PERIOD_START}")
+        if initial_date:
+            notif_filter = notif_filter.where(
+                "notif.dt_notific >= :initial_date", initial_date=initial_date
+            )
+        if final_date:
+            notif_filter = notif_filter.where(
+                "notif.dt_notific <= :final_date", final_date=final_date
+            )
+        return notif_filter
+
+
 class NotificationQueries:
     _age_field = """
         CASE
-        WHEN nu_idade_n <= 4004 THEN '00-04 anos'
-        WHEN nu_idade_n BETWEEN 4005 AND 4009 THEN '05-09 anos'
-        WHEN nu_idade_n BETWEEN 4010 AND 4019 THEN '10-19 anos'
-        WHEN nu_idade_n BETWEEN 4020 AND 4029 THEN '20-29 anos'
-        WHEN nu_idade_n BETWEEN 4030 AND 4039 THEN '30-39 anos'
-        WHEN nu_idade_n BETWEEN 4040 AND 4049 THEN '40-49 anos'
-        WHEN nu_idade_n BETWEEN 4050 AND 4059 THEN '50-59 anos'
-        WHEN nu_idade_n >=4060 THEN '60+ anos'
+        WHEN notif.nu_idade_n <= 4004 THEN '00-04 anos'
+        WHEN notif.nu_idade_n BETWEEN 4005 AND 4009 THEN '05-09 anos'
+        WHEN notif.nu_idade_n BETWEEN 4010 AND 4019 THEN '10-19 anos'
+        WHEN notif.nu_idade_n BETWEEN 4020 AND 4029 THEN '20-29 anos'
+        WHEN notif.nu_idade_n BETWEEN 4030 AND 4039 THEN '30-39 anos'
+        WHEN notif.nu_idade_n BETWEEN 4040 AND 4049 THEN '40-49 anos'
+        WHEN notif.nu_idade_n BETWEEN 4050 AND 4059 THEN '50-59 anos'
+        WHEN notif.nu_idade_n >=4060 THEN '60+ anos'
         ELSE NULL
-        END AS age"""
+        END"""
+
+    # the period chart counts the notifications by day, the days and these
+    # bounds are bucketed by epiweek (its Sunday) by _weekly_period
+    _period_bounds = """
+        CAST(CURRENT_DATE - INTERVAL '1 YEAR' AS DATE) AS dt_week_start,
+        CURRENT_DATE AS dt_week_end"""
 
     def __init__(
         self,
@@ -39,72 +217,48 @@ class NotificationQueries:
         final_date=None,
     ):
         self.uf = uf
-        self.dist_filters = [
-            ("uf", f"uf='{uf}'"),
-            ("", self._get_disease_filter(disease_values)),
-            ("", self._get_gender_filter(gender_values)),
-            ("", self._get_period_filter(initial_date, final_date)),
-            ("", self._get_age_filter(age_values)),
-            ("cities", self._get_city_filter(city_values)),
-        ]
-
-    def _process_filter(self, data_filter, exception_key=""):
-        filters = [v for k, v in data_filter if k != exception_key]
-        return " AND ".join(filter(None, filters))
-
-    def _get_gender_filter(self, gender):
-        if gender is None:
-            return "cs_sexo IN ('F', 'M')"
-        genders = [
-            "'F'" if g == "mulher" else "'M'" if g == "homem" else None
-            for g in gender.lower().split(",")
-        ]
-        return f"cs_sexo IN ({','.join(filter(None, genders))})"
-
-    def _get_city_filter(self, city):
-        return f"municipio_geocodigo IN ({city})" if city is not None else ""
-
-    def _get_age_filter(self, age):
-        if age is None:
-            return "age IS NOT NULL"
-        ages = [f"'{a.replace('  ', '+ ')}'" for a in age.split(",")]
-        return f"age IN ({','.join(ages)})"
-
-    def _get_period_filter(self, initial_date=None, final_date=None):
-        common_filter = """
-        dt_notific >= (CURRENT_DATE - INTERVAL '1 YEAR') - CAST(CONCAT(CAST(
-          EXTRACT(DOW FROM (CURRENT_DATE-INTERVAL '1 YEAR')) AS VARCHAR),'DAY'
-        ) AS INTERVAL) AND
-        """
-        if not initial_date and not final_date:
-            return common_filter + "1=1"
-        date_filter = (
-            f">= '{initial_date}'"
-            if not final_date
-            else f"<= '{final_date}'"
-            if not initial_date
-            else f"BETWEEN '{initial_date}' AND '{final_date}'"
+        self.dist_filter = (
+            NotificationFilter()
+            .uf(uf)
+            .diseases(disease_values)
+            .genders(gender_values)
+            .period(initial_date, final_date)
+            .ages(age_values)
+            .cities(city_values)
         )
-        return common_filter + f"dt_notific {date_filter}"
 
-    def _get_disease_filter(self, disease):
+    @property
+    def total_filter(self) -> NotificationFilter:
+        """
+        The filter of the state with the default values of the others.
         """
-        Generates a SQL filter condition for diseases based on input.
+        return (
+            NotificationFilter(prefix="total_")
+            .uf(self.uf)
+            .genders()
+            .diseases()
+            .ages()
+            .period()
+        )
 
-        Parameters:
-        - disease: A string of comma-separated disease codes or None.
+    @staticmethod
+    def _fetch(
+        sql: str, params: dict, db_engine: Engine, columns=None
+    ) -> pd.DataFrame:
+        with db_engine.connect() as conn:
+            result = conn.execute(text(sql), params)
+            return pd.DataFrame(result.fetchall(), columns=columns)
 
-        Returns:
-        - A string representing the SQL condition to filter by the specified diseases.
-        """
-        if disease is None:
-            diseases = "','".join(CID10.values())
-            return f"cid10_codigo IN ('{diseases}')"
-        else:
-            diseases = "','".join(
-                CID10.get(d.lower(), "") for d in disease.split(",")
-            )
-            return f"cid10_codigo IN ('{diseases}')"
+    @staticmethod
+    def count_query(notif_filter: NotificationFilter) -> Tuple[str, dict]:
+        sql = f"""
+            SELECT
+                count(notif.id) AS casos
+            FROM
+                "Municipio"."Notificacao" AS notif
+            WHERE {notif_filter.sql}
+            """
+        return sql, notif_filter.params
 
     def get_total_rows(self, db_engine: Engine = DB_ENGINE):
         """
@@ -113,37 +267,8 @@ class NotificationQueries:
         :param db_engine: Database engine to execute the query.
         :return: DataFrame containing the total number of rows.
         """
-        filters = [
-            "1=1",
-            self._get_gender_filter(None),
-            self._get_disease_filter(None),
-            self._get_age_filter(None),
-            self._get_period_filter(None, None),
-        ]
-        clean_filters = " uf='{}' AND ".format(self.uf) + " AND ".join(
-            filter(None, filters)
-        )
-
-        sql = """
-            SELECT
-                count(id) AS casos
-            FROM (
-                SELECT
-                    *,
-                    {}
-                FROM
-                    "Municipio"."Notificacao" AS notif
-                    INNER JOIN "Dengue_global"."Municipio" AS municipio
-                    ON notif.municipio_geocodigo = municipio.geocodigo
-            ) AS tb
-            WHERE {}
-            """.format(
-            self._age_field, clean_filters
-        )
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql, "casos")
-            return pd.DataFrame(result.fetchall())
+        sql, params = self.count_query(self.total_filter)
+        return self._fetch(sql, params, db_engine, ["casos"])
 
     def get_selected_rows(self, db_engine: Engine = DB_ENGINE):
         """
@@ -152,28 +277,19 @@ class NotificationQueries:
         :param db_engine: Database engine to execute the query.
         :return: DataFrame containing the number of selected rows.
         """
-        dist_filters = self._process_filter(self.dist_filters)
+        sql, params = self.count_query(self.dist_filter)
+        return self._fetch(sql, params, db_engine, ["casos"])
 
-        sql = """
-            SELECT
-                count(id) AS casos
-            FROM (
-                SELECT
-                    *,
-                    {}
-                FROM
-                    "Municipio"."Notificacao" AS notif
-                    INNER JOIN "Dengue_global"."Municipio" AS municipio
-                    ON notif.municipio_geocodigo = municipio.geocodigo
-            ) AS tb
-            WHERE {}
-            """.format(
-            self._age_field, dist_filters
-        )
+    @staticmethod
+    def _disease_label(column: str) -> str:
+        disease_label = " CASE "
 
-        with db_engine.connect() as conn:
-            result = conn.execute(sql, "casos")
-            return pd.DataFrame(result.fetchall())
+        for cid_label, cid_id in CID10.items():
+            disease_label += " WHEN {}='{}' THEN '{}' \n".format(
+                column, cid_id, cid_label.title()
+            )
+
+        return disease_label + f" ELSE {column} END "
 
     def get_disease_dist(self, db_engine: Engine = DB_ENGINE) -> pd.DataFrame:
         """
@@ -182,81 +298,54 @@ class NotificationQueries:
         :param db_engine: SQLAlchemy engine to connect to the database.
         :return: DataFrame with disease distribution.
         """
-        _dist_filters = self._process_filter(self.dist_filters, "disease")
-
-        disease_label = " CASE "
-
-        for cid_label, cid_id in CID10.items():
-            disease_label += " WHEN cid10.codigo='{}' THEN '{}' \n".format(
-                cid_id, cid_label.title()
-            )
-
-        disease_label += " ELSE cid10.codigo END AS cid10_nome "
-
         sql = f"""
         SELECT
-            COALESCE(cid10_nome, NULL) AS category,
-            count(id) AS casos
-        FROM (
-            SELECT
-                *,
-                {disease_label},
-                {self._age_field}
-            FROM
-                "Municipio"."Notificacao" AS notif
-            INNER JOIN "Dengue_global"."Municipio" AS municipio
-                ON notif.municipio_geocodigo = municipio.geocodigo
+            {self._disease_label("cid10.codigo")} AS category,
+            count(notif.id) AS casos
+        FROM
+            "Municipio"."Notificacao" AS notif
             LEFT JOIN "Dengue_global"."CID10" AS cid10
                 ON notif.cid10_codigo = cid10.codigo
-        ) AS tb
-        WHERE {_dist_filters}
-        GROUP BY cid10_nome;
+        WHERE {self.dist_filter.sql}
+        GROUP BY 1;
         """
 
-        with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            df_disease_dist = pd.DataFrame(result.fetchall())
-
+        df_disease_dist = self._fetch(
+            sql, self.dist_filter.params, db_engine, ["category", "casos"]
+        )
         return df_disease_dist.set_index("category", drop=True)
 
     def _get_age_distribution(
-        self, db_engine: Engine, gender_filter: str = ""
+        self, db_engine: Engine, gender: Optional[str] = None
     ) -> pd.DataFrame:
         """
         Helper function to fetch age distribution.
 
         :param db_engine: SQLAlchemy engine to connect to the database.
-        :param gender_filter: Filter for gender.
+        :param gender: Filter for gender, "F" or "M".
         :return: DataFrame with age distribution.
         """
-        _dist_filters = self._process_filter(self.dist_filters, "age")
+        notif_filter = self.dist_filter
+        if gender is not None:
+            notif_filter = notif_filter.where(
+                "notif.cs_sexo = :gender", gender=gender
+            )
 
-        sql = """
+        sql = f"""
         SELECT
-            age AS category,
-            count(age) AS casos
-        FROM (
-            SELECT
-                *,
-                {}
-            FROM
-                "Municipio"."Notificacao" AS notif
-                INNER JOIN "Dengue_global"."Municipio" AS municipio
-                  ON notif.municipio_geocodigo = municipio.geocodigo
-        ) AS tb
-        WHERE {}
-        {}
-        GROUP BY age
-        ORDER BY age
-        """.format(
-            self._age_field, _dist_filters, gender_filter
-        )
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            df_age_dist = pd.DataFrame(result.fetchall())
+            {self._age_field} AS category,
+            count(notif.nu_idade_n) AS casos
+        FROM
+            "Municipio"."Notificacao" AS notif
+        WHERE {notif_filter.sql}
+        GROUP BY 1
+        ORDER BY 1
+        """
 
-            return df_age_dist.set_index("category", drop=True)
+        df_age_dist = self._fetch(
+            sql, notif_filter.params, db_engine, ["category", "casos"]
+        )
+        return df_age_dist.set_index("category", drop=True)
 
     def get_age_dist(self, db_engine: Engine = DB_ENGINE) -> pd.DataFrame:
         """
@@ -276,34 +365,25 @@ class NotificationQueries:
         :param db_engine: SQLAlchemy engine to connect to the database.
         :return: DataFrame with age and gender distribution.
         """
-        _dist_filters = self._process_filter(self.dist_filters, "age")
-
-        sql = """
+        sql = f"""
         SELECT
-            age AS category,
-            COUNT(CASE WHEN cs_sexo='F' THEN 1 END) AS "Mulher",
-            COUNT(CASE WHEN cs_sexo='M' THEN 1 END) AS "Homem"
-        FROM (
-            SELECT
-                *,
-                {}
-            FROM
-                "Municipio"."Notificacao" AS notif
-                INNER JOIN "Dengue_global"."Municipio" AS municipio
-                  ON notif.municipio_geocodigo = municipio.geocodigo
-        ) AS tb
-        WHERE {}
-        GROUP BY age
-        ORDER BY age
-        """.format(
-            self._age_field, _dist_filters
-        )
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            df_age_gender_dist = pd.DataFrame(result.fetchall())
+            {self._age_field} AS category,
+            COUNT(CASE WHEN notif.cs_sexo='F' THEN 1 END) AS "Mulher",
+            COUNT(CASE WHEN notif.cs_sexo='M' THEN 1 END) AS "Homem"
+        FROM
+            "Municipio"."Notificacao" AS notif
+        WHERE {self.dist_filter.sql}
+        GROUP BY 1
+        ORDER BY 1
+        """
 
-            return df_age_gender_dist.set_index("category", drop=True)
+        df_age_gender_dist = self._fetch(
+            sql,
+            self.dist_filter.params,
+            db_engine,
+            ["category", "Mulher", "Homem"],
+        )
+        return df_age_gender_dist.set_index("category", drop=True)
 
     def get_age_male_dist(self, db_engine: Engine = DB_ENGINE) -> pd.DataFrame:
         """
@@ -312,7 +392,7 @@ class NotificationQueries:
         :param db_engine: SQLAlchemy engine to connect to the database.
         :return: DataFrame with age distribution for males.
         """
-        return self._get_age_distribution(db_engine, "AND cs_sexo = 'M'")
+        return self._get_age_distribution(db_engine, "M")
 
     def get_age_female_dist(
         self, db_engine: Engine = DB_ENGINE
@@ -323,7 +403,7 @@ class NotificationQueries:
         :param db_engine: SQLAlchemy engine to connect to the database.
         :return: DataFrame with age distribution for females.
         """
-        return self._get_age_distribution(db_engine, "AND cs_sexo = 'F'")
+        return self._get_age_distribution(db_engine, "F")
 
     def get_gender_dist(self, db_engine: Engine = DB_ENGINE) -> pd.DataFrame:
         """
@@ -332,36 +412,25 @@ class NotificationQueries:
         :param db_engine: SQLAlchemy engine to connect to the database.
         :return: DataFrame with gender distribution.
         """
-        _dist_filters = self._process_filter(self.dist_filters, "gender")
-
-        sql = """
+        sql = f"""
         SELECT
-            (CASE COALESCE(cs_sexo, NULL)
+            (CASE notif.cs_sexo
              WHEN 'M' THEN 'Homem'
              WHEN 'F' THEN 'Mulher'
              ELSE NULL
              END
             ) AS category,
-            COUNT(id) AS casos
-        FROM (
-            SELECT *,
-                {}
-            FROM
-                "Municipio"."Notificacao" AS notif
-                INNER JOIN "Dengue_global"."Municipio" AS municipio
-                  ON notif.municipio_geocodigo = municipio.geocodigo
-        ) AS tb
-        WHERE {} AND cs_sexo IN ('F', 'M')
-        GROUP BY cs_sexo;
-        """.format(
-            self._age_field, _dist_filters
-        )
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            df_gender_dist = pd.DataFrame(result.fetchall())
+            COUNT(notif.id) AS casos
+        FROM
+            "Municipio"."Notificacao" AS notif
+        WHERE {self.dist_filter.sql}
+        GROUP BY notif.cs_sexo;
+        """
 
-            return df_gender_dist.set_index("category", drop=True)
+        df_gender_dist = self._fetch(
+            sql, self.dist_filter.params, db_engine, ["category", "casos"]
+        )
+        return df_gender_dist.set_index("category", drop=True)
 
     def get_epiyears(
         self, state_name, disease=None, db_engine: Engine = DB_ENGINE
@@ -393,57 +462,67 @@ class NotificationQueries:
             ).T
 
     def get_period_dist(self, db_engine: Engine = DB_ENGINE):
-        _dist_filters = self._process_filter(self.dist_filters, "period")
-        _dist_filters += " AND {}".format(self._get_period_filter())
-
-        sql = """
+        sql = f"""
         SELECT
-            dt_week,
-            count(dt_week) AS Casos
-        FROM (
-            SELECT *,
-                dt_notific - CAST(
-                    CONCAT(CAST(EXTRACT(DOW FROM dt_notific) AS VARCHAR), 'DAY'
-                ) AS INTERVAL) AS dt_week,
-                {}
-            FROM
-                "Municipio"."Notificacao" AS notif
-                INNER JOIN "Dengue_global"."Municipio" AS municipio
-                    ON notif.municipio_geocodigo = municipio.geocodigo
-        ) AS tb
-        WHERE {}
-        GROUP BY dt_week
-        ORDER BY dt_week
-        """.format(
-            self._age_field, _dist_filters
+            notif.dt_notific,
+            count(*) AS Casos
+        FROM
+            "Municipio"."Notificacao" AS notif
+        WHERE {self.dist_filter.sql}
+        GROUP BY 1
+        """
+
+        df_days = self._fetch(
+            sql, self.dist_filter.params, db_engine, ["dt_notific", "Casos"]
         )
 
-        with db_engine.connect() as conn:
-            result = conn.execute(text(sql))
-            df_alert_period = pd.DataFrame(
-                result.fetchall(), columns=["dt_week", "Casos"]
-            )
-            df_alert_period.set_index("dt_week", inplace=True)
+        df_period_bounds = self._fetch(
+            f"SELECT {self._period_bounds}",
+            {},
+            db_engine,
+            ["dt_week_start", "dt_week_end"],
+        )
 
-        sql_bounds = """
-        SELECT
-        (CURRENT_DATE - INTERVAL '1 YEAR') - CAST(CONCAT(CAST(
-        EXTRACT(DOW FROM (CURRENT_DATE-INTERVAL '1 YEAR')) AS VARCHAR),'DAY'
-        ) AS INTERVAL) AS dt_week_start,
-        CURRENT_DATE - CAST(CONCAT(CAST(
-            EXTRACT(DOW FROM CURRENT_DATE) AS VARCHAR), 'DAY'
-        ) AS INTERVAL) AS dt_week_end
-        """
+        return self._weekly_period(
+            df_days,
+            df_period_bounds["dt_week_start"].iloc[0],
+            df_period_bounds["dt_week_end"].iloc[0],
+        )
 
-        with db_engine.connect() as conn:
-            result = conn.execute(text(sql_bounds))
-            df_period_bounds = pd.DataFrame(
-                result.fetchall(), columns=["dt_week_start", "dt_week_end"]
+    @classmethod
+    def _weekly_period(
+        cls, df_days: pd.DataFrame, start_day, end_day
+    ) -> pd.DataFrame:
+        """
+        Sums the cases (Casos) of each day (dt_notific) by epiweek, indexed
+        by its Sunday (dt_week), from the week of start_day to the week of
+        end_day.
+        """
+        days = np.array(df_days["dt_notific"].tolist(), dtype="datetime64[D]")
+        bounds = np.array([start_day, end_day], dtype="datetime64[D]")
+
+        df_alert_period = (
+            pd.Series(
+                df_days["Casos"].to_numpy(),
+                index=pd.DatetimeIndex(
+                    epicalendar.sundays(days), name="dt_week"
+                ),
             )
+            .groupby(level=0)
+            .sum()
+            .to_frame("Casos")
+        )
+        week_start, week_end = pd.DatetimeIndex(epicalendar.sundays(bounds))
+        return cls._pad_period(df_alert_period, week_start, week_end)
 
-        start_date = df_period_bounds["dt_week_start"].iloc[0]
-        end_date = df_period_bounds["dt_week_end"].iloc[0]
-
+    @staticmethod
+    def _pad_period(
+        df_alert_period: pd.DataFrame, start_date, end_date
+    ) -> pd.DataFrame:
+        """
+        Adds the first and the last weeks of the period if they have no
+        cases.
+        """
         if start_date not in df_alert_period.index:
             df_alert_period.loc[start_date] = 0
 
@@ -453,8 +532,240 @@ class NotificationQueries:
         df_alert_period.sort_index(inplace=True)
         return df_alert_period
 
+    def get_all_dists(
+        self, db_engine: Engine = DB_ENGINE
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Fetches all the distributions in a single pass over the
+        notifications of the state.
+
+        The rows of the default filter (total_cases) are read once, flagged
+        by the selection filter, and aggregated by GROUPING SETS.
+
+        :param db_engine: SQLAlchemy engine to connect to the database.
+        :return: dict with the DataFrames of the disease, age, age_gender,
+            age_male, age_female, gender, period, total_cases and
+            selected_cases charts, as returned by their get_*_dist methods.
+        """
+        total_filter = self.total_filter
+
+        sql = f"""
+        WITH notif_state AS (
+            SELECT
+                {self._disease_label("notif.cid10_codigo")} AS disease,
+                {self._age_field} AS age,
+                notif.cs_sexo,
+                notif.dt_notific,
+                ({self.dist_filter.sql}) AS selected
+            FROM
+                "Municipio"."Notificacao" AS notif
+            WHERE {total_filter.sql}
+        )
+        SELECT
+            GROUPING(disease, age, cs_sexo, dt_notific) AS grouping_set,
+            disease,
+            age,
+            cs_sexo,
+            dt_notific,
+            COUNT(*) FILTER (WHERE selected) AS casos,
+            COUNT(*) AS total,
+            {self._period_bounds}
+        FROM notif_state
+        GROUP BY GROUPING SETS (
+            (disease), (age, cs_sexo), (cs_sexo), (dt_notific), ()
+        )
+        """
+
+        df = self._fetch(
+            sql,
+            {**total_filter.params, **self.dist_filter.params},
+            db_engine,
+            [
+                "grouping_set",
+                "disease",
+                "age",
+                "cs_sexo",
+                "dt_notific",
+                "casos",
+                "total",
+                "dt_week_start",
+                "dt_week_end",
+            ],
+        )
+        # GROUPING() sets a bit for each column not grouped, the first
+        # column being the most significant bit
+        sets = {
+            name: df[df.grouping_set == bits]
+            for bits, name in (
+                (0b0111, "disease"),
+                (0b1001, "age_gender"),
+                (0b1101, "gender"),
+                (0b1110, "period"),
+                (0b1111, "total"),
+            )
+        }
+
+        def counts(name, column):
+            df_set = sets[name][sets[name].casos > 0]
+            return (
+                df_set[[column, "casos"]]
+                .rename(columns={column: "category"})
+                .set_index("category", drop=True)
+            )
+
+        df_age_gender = (
+            sets["age_gender"]
+            .pivot_table(
+                index="age",
+                columns="cs_sexo",
+                values="casos",
+                aggfunc="sum",
+                fill_value=0,
+            )
+            .reindex(columns=["F", "M"], fill_value=0)
+            .rename(columns={"F": "Mulher", "M": "Homem"})
+        )
+        df_age_gender.columns.name = None
+        df_age_gender.index.name = "category"
+        # every gender, not only the F and M columns of the pivot
+        df_age = sets["age_gender"].groupby("age").casos.sum().to_frame()
+        df_age.index.name = "category"
+
+        df_gender = counts("gender", "cs_sexo")
+        # the other genders are NULL in get_gender_dist, None here too
+        df_gender.index = pd.Index(
+            [{"M": "Homem", "F": "Mulher"}.get(v) for v in df_gender.index],
+            name="category",
+        )
+
+        df_days = sets["period"][sets["period"].casos > 0].rename(
+            columns={"casos": "Casos"}
+        )
+        total = sets["total"].iloc[0]
+
+        return {
+            "disease": counts("disease", "disease"),
+            "age": df_age[df_age.casos > 0],
+            "age_gender": df_age_gender[df_age.casos > 0],
+            "age_male": (
+                df_age_gender.loc[df_age_gender.Homem > 0, ["Homem"]].rename(
+                    columns={"Homem": "casos"}
+                )
+            ),
+            "age_female": (
+                df_age_gender.loc[df_age_gender.Mulher > 0, ["Mulher"]].rename(
+                    columns={"Mulher": "casos"}
+                )
+            ),
+            "gender": df_gender,
+            "period": self._weekly_period(
+                df_days, total.dt_week_start, total.dt_week_end
+            ),
+            "total_cases": pd.DataFrame({"casos": [total.total]}),
+            "selected_cases": pd.DataFrame({"casos": [total.casos]}),
+        }
+
 
 class AlertCity:
+    @staticmethod
+    def data_version(disease: str) -> Tuple[Optional[date], datetime]:
+        """
+        Version of the alerts of a disease: their latest `data_iniSE`, and
+        when this server first saw it, used as the Last-Modified of the
+        alertcity responses.
+        """
+        latest = cached_latest_alert_date(disease)
+        seen_key = f"latest_alert_date_seen_{disease}_{latest}"
+        cache.add(seen_key, timezone.now(), None)
+        return latest, cache.get(seen_key) or timezone.now()
+
+    @staticmethod
+    def search_many_query(
+        disease: str,
+        geocodes: Optional[List[int]] = None,
+        uf: Optional[str] = None,
+        regional: Optional[int] = None,
+        ew_start: Optional[int] = None,
+        ew_end: Optional[int] = None,
+    ) -> Tuple[str, dict]:
+        """
+        Query with the history of several cities for a given disease: the
+        cities in `geocodes`, in the state `uf` and/or in the health region
+        `regional`. Without a week range, the last 3 weeks of each city are
+        returned, as in `search`.
+
+        Parameters
+        ----------
+        disease : str, {'dengue', 'chikungunya', 'zika'}
+        geocodes : Optional[List[int]]
+        uf : Optional[str]
+            The state name, e.g.: Rio de Janeiro
+        regional : Optional[int]
+            The `id_regional` of the cities
+        ew_start : Optional[int]
+            The starting Year/Week, e.g.: 202202
+        ew_end : Optional[int]
+            The ending Year/Week, e.g.: 202205
+        Returns
+        -------
+        Tuple[str, dict]
+            The SQL and its parameters, rows sorted by city and by week,
+            latest first.
+        """
+        if disease not in CID10.keys():
+            raise Exception(
+                f"The diseases available are: {list(CID10.keys())}"
+            )
+
+        city_filters = []
+        params = {}
+        if geocodes is not None:
+            city_filters.append("geocodigo = ANY(:geocodes)")
+            params["geocodes"] = [int(g) for g in geocodes]
+        if uf is not None:
+            city_filters.append("uf = :uf")
+            params["uf"] = uf
+        if regional is not None:
+            city_filters.append("id_regional = :regional")
+            params["regional"] = int(regional)
+        if not city_filters:
+            raise Exception("No geocode, state or regional sent.")
+
+        if ew_start and ew_end:
+            week_filter = 'h."SE" BETWEEN :ew_start AND :ew_end'
+            params.update(ew_start=int(ew_start), ew_end=int(ew_end))
+            last_weeks = "TRUE"
+        else:
+            week_filter = "TRUE"
+            last_weeks = "week_rank <= 3"
+
+        table_name = f"Historico_alerta{get_disease_suffix(disease)}"
+        sql = f"""
+        SELECT
+            t.*,
+            SUM(t.casos) OVER (
+                PARTITION BY t.municipio_geocodigo
+            ) AS notif_accum_year
+        FROM (
+            SELECT
+                h.*,
+                ROW_NUMBER() OVER (
+                    PARTITION BY h.municipio_geocodigo
+                    ORDER BY h."SE" DESC
+                ) AS week_rank
+            FROM "Municipio"."{table_name}" AS h
+            WHERE h.municipio_geocodigo IN (
+                SELECT geocodigo
+                FROM "Dengue_global"."Municipio"
+                WHERE {" AND ".join(city_filters)}
+            )
+            AND {week_filter}
+        ) AS t
+        WHERE {last_weeks}
+        ORDER BY municipio_geocodigo, "SE" DESC
+        """
+        return sql, params
+
     @staticmethod
     def search(
         disease: str,
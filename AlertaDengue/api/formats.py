@@ -0,0 +1,68 @@
+"""
+Output formats of the alert API.
+
+Besides CSV and JSON records, the alerts can be downloaded as Parquet or
+as an Arrow IPC stream, which keep the column types (dates, integers,
+floats) and are faster to write and smaller than the text formats for
+long series.
+"""
+import io
+from decimal import Decimal
+from typing import Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORMATS = ["csv", "json", "parquet", "arrow"]
+
+CONTENT_TYPES = {
+    "csv": "text/plain",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def fix_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the PostgreSQL numeric columns, read as Decimal objects, to
+    floats.
+    """
+    decimals = [
+        column
+        for column in df.columns[df.dtypes == object]
+        if df[column].map(type).eq(Decimal).any()
+    ]
+    if decimals:
+        df[decimals] = df[decimals].astype(float)
+    return df
+
+
+def to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+    return pa.Table.from_pandas(
+        fix_dtypes(df), schema=schema, preserve_index=False
+    )
+
+
+def serialize(df: pd.DataFrame, format: str) -> Union[str, bytes]:
+    """
+    Serializes a DataFrame in one of the FORMATS.
+    """
+    if format == "json":
+        return df.to_json(orient="records")
+    if format == "csv":
+        return df.to_csv(index=False)
+
+    table = to_arrow(df)
+    sink = io.BytesIO()
+    if format == "parquet":
+        pq.write_table(table, sink)
+    elif format == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise Exception(
+            f"The output format available are: {', '.join(FORMATS)}."
+        )
+    return sink.getvalue()
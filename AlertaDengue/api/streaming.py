@@ -0,0 +1,194 @@
+"""
+Streamed exports of query results.
+
+The rows are fetched through a server-side cursor, `batch_size` rows at a
+time, and each batch is serialized and sent before the next one is
+fetched, so the memory used by an export is bounded by the batch size
+instead of the size of the result:
+
+    batches = iter_batches(sql, params)
+    return streaming_response(batches, "csv", "export.csv")
+"""
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from sqlalchemy import text
+from sqlalchemy.engine.base import Engine
+
+from .db import DB_ENGINE
+from .formats import CONTENT_TYPES, to_arrow
+
+
+def iter_batches(
+    sql: str,
+    params: dict,
+    batch_size: Optional[int] = None,
+    db_engine: Engine = DB_ENGINE,
+    prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the result of a query in DataFrames of up to `batch_size` rows.
+
+    Parameters
+    ----------
+    sql : str
+        The query, with `:name` bound parameters.
+    params : dict
+        The parameters of the query.
+    batch_size : Optional[int]
+        Rows fetched from the server-side cursor at a time, defaults to
+        API_STREAM_BATCH_SIZE.
+    db_engine : Engine
+        The database engine.
+    prepare : Optional[Callable[[pd.DataFrame], pd.DataFrame]]
+        Applied to each batch, e.g. to fix the dtypes of the columns.
+    """
+    if batch_size is None:
+        batch_size = settings.API_STREAM_BATCH_SIZE
+
+    with db_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            text(sql), params
+        )
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            df = pd.DataFrame(rows, columns=columns)
+            yield prepare(df) if prepare is not None else df
+
+
+def csv_chunks(batches: Iterable[pd.DataFrame]) -> Iterator[str]:
+    """
+    CSV of the batches, with the header in the first chunk.
+    """
+    header = True
+    for df in batches:
+        yield df.to_csv(index=False, header=header)
+        header = False
+
+
+def jsonl_chunks(batches: Iterable[pd.DataFrame]) -> Iterator[str]:
+    """
+    JSON lines (one record per line) of the batches.
+    """
+    for df in batches:
+        # pandas ends the lines output with a newline
+        yield df.to_json(orient="records", lines=True)
+
+
+class _ChunkSink:
+    """
+    Write-only file that keeps what was written until it is drained, so
+    the pyarrow writers can be streamed.
+    """
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_tables(batches: Iterable[pd.DataFrame]) -> Iterator[pa.Table]:
+    # every batch must have the schema of the first one; the columns that
+    # are all NULL in the first batch (e.g. Rt or the climate of the first
+    # cities of a state) would get the type null, they are read as floats
+    schema = None
+    for df in batches:
+        table = to_arrow(df, schema)
+        if schema is None:
+            schema = pa.schema(
+                [
+                    field.with_type(pa.float64())
+                    if pa.types.is_null(field.type)
+                    else field
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            table = table.cast(schema)
+        yield table
+
+
+def arrow_chunks(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Arrow IPC stream of the batches, one record batch per batch.
+    """
+    sink = _ChunkSink()
+    writer = None
+    for table in _arrow_tables(batches):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def parquet_chunks(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Parquet file of the batches, one row group per batch.
+    """
+    sink = _ChunkSink()
+    writer = None
+    for table in _arrow_tables(batches):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def streaming_response(
+    batches: Iterable[pd.DataFrame],
+    format: str,
+    filename: Optional[str] = None,
+) -> StreamingHttpResponse:
+    """
+    Streams the batches as CSV, JSON lines (format="json"), Parquet or an
+    Arrow IPC stream, as an attachment if `filename` is given.
+    """
+    chunks = {
+        "csv": csv_chunks,
+        "json": jsonl_chunks,
+        "parquet": parquet_chunks,
+        "arrow": arrow_chunks,
+    }[format]
+    content_type = (
+        "application/x-ndjson" if format == "json" else CONTENT_TYPES[format]
+    )
+    response = StreamingHttpResponse(
+        chunks(batches), content_type=content_type
+    )
+    if filename is not None:
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
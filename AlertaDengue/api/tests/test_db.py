@@ -0,0 +1,199 @@
+import json
+from unittest import TestCase
+
+from sqlalchemy import text
+
+# local
+from ..db import (
+    DB_ENGINE,
+    AlertCity,
+    NotificationFilter,
+    NotificationQueries,
+)
+
+
+def _index_conditions(plan: dict) -> list:
+    """
+    (index name, index condition) of the index scans of an EXPLAIN plan.
+    """
+    conditions = []
+    if "Index Name" in plan:
+        conditions.append((plan["Index Name"], plan.get("Index Cond", "")))
+    for child in plan.get("Plans", []):
+        conditions.extend(_index_conditions(child))
+    return conditions
+
+
+class TestNotificationFilter(TestCase):
+    def test_bound_parameters(self):
+        notif_filter = (
+            NotificationFilter()
+            .uf("Rio de Janeiro")
+            .diseases("dengue,zika")
+            .genders("mulher")
+            .cities("3304557,3303302")
+        )
+        self.assertEqual(notif_filter.params["uf"], "Rio de Janeiro")
+        self.assertEqual(notif_filter.params["diseases"], ["A90", "A928"])
+        self.assertEqual(notif_filter.params["genders"], ["F"])
+        self.assertEqual(notif_filter.params["cities"], [3304557, 3303302])
+        self.assertNotIn("Rio de Janeiro", notif_filter.sql)
+        self.assertNotIn("3304557", notif_filter.sql)
+
+    def test_ages_as_nu_idade_n_ranges(self):
+        # "60+ anos" comes as "60  anos" from the query string
+        notif_filter = NotificationFilter().ages("00-04 anos,60  anos")
+        self.assertNotIn("CASE", notif_filter.sql)
+        self.assertEqual(
+            notif_filter.params, {"age_high_0": 4004, "age_low_1": 4060}
+        )
+        self.assertEqual(NotificationFilter().ages("x").sql, "(FALSE)")
+
+    def test_filters_are_immutable(self):
+        base = NotificationFilter().uf("Paraná")
+        base.diseases()
+        self.assertEqual(len(base.predicates), 1)
+        self.assertEqual(base.sql.count(":uf"), 1)
+        self.assertEqual(NotificationFilter().sql, "TRUE")
+        with self.assertRaises(ValueError):
+            base.uf("Paraná")
+
+    def test_prefixed_parameters(self):
+        notif_filter = NotificationFilter(prefix="total_").uf("Paraná")
+        self.assertEqual(notif_filter.params, {"total_uf": "Paraná"})
+        self.assertIn(":total_uf", notif_filter.sql)
+        self.assertNotIn(":uf", notif_filter.sql)
+
+
+class TestAlertCitySearchMany(TestCase):
+    def test_cities_filters(self):
+        sql, params = AlertCity.search_many_query(
+            "zika",
+            geocodes=[3304557, 3303302],
+            uf="Rio de Janeiro",
+            ew_start=202401,
+            ew_end=202410,
+        )
+        self.assertIn('"Municipio"."Historico_alerta_zika"', sql)
+        self.assertEqual(
+            params,
+            {
+                "geocodes": [3304557, 3303302],
+                "uf": "Rio de Janeiro",
+                "ew_start": 202401,
+                "ew_end": 202410,
+            },
+        )
+        self.assertNotIn("3304557", sql)
+
+    def test_last_weeks_without_range(self):
+        sql, params = AlertCity.search_many_query("dengue", regional=1)
+        self.assertIn("week_rank <= 3", sql)
+        self.assertEqual(params, {"regional": 1})
+
+    def test_requires_cities(self):
+        with self.assertRaises(Exception):
+            AlertCity.search_many_query("dengue")
+        with self.assertRaises(Exception):
+            AlertCity.search_many_query("measles", geocodes=[3304557])
+
+
+class TestNotificationQueriesPlan(TestCase):
+    """
+    The filters must keep the notification indexes usable: the plans are
+    checked on seeded rows, rolled back at the end of each test.
+    """
+
+    def setUp(self):
+        self.conn = DB_ENGINE.connect()
+        self.transaction = self.conn.begin()
+        self.conn.execute(
+            text(
+                """
+                INSERT INTO "Municipio"."Notificacao" (
+                    dt_notific, se_notif, ano_notif, municipio_geocodigo,
+                    nu_notific, cid10_codigo, cs_sexo, nu_idade_n
+                )
+                SELECT
+                    CURRENT_DATE - (i % 730),
+                    1 + i % 52,
+                    EXTRACT(YEAR FROM CURRENT_DATE - (i % 730)),
+                    3304557,
+                    i,
+                    (ARRAY['A90', 'A92.0', 'A928'])[1 + i % 3],
+                    (ARRAY['F', 'M', 'F', 'M', 'I'])[1 + i % 5],
+                    4000 + i % 90
+                FROM generate_series(1, 20000) AS i
+                """
+            )
+        )
+        self.conn.execute(text('ANALYZE "Municipio"."Notificacao"'))
+        self.conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+    def tearDown(self):
+        self.transaction.rollback()
+        self.conn.close()
+
+    def explain(self, sql: str, params: dict) -> dict:
+        result = self.conn.execute(
+            text(f"EXPLAIN (FORMAT JSON) {sql}"), params
+        ).scalar()
+        plan = result if isinstance(result, list) else json.loads(result)
+        return plan[0]["Plan"]
+
+    def test_period_uses_date_index(self):
+        notif_filter = NotificationFilter().period("2023-01-01", "2023-06-30")
+        plan = self.explain(*NotificationQueries.count_query(notif_filter))
+        self.assertIn(
+            "Dengue_idx_data",
+            [name for name, cond in _index_conditions(plan) if cond],
+        )
+
+    def test_selected_rows_use_index(self):
+        queries = NotificationQueries(
+            "Rio de Janeiro",
+            disease_values="dengue",
+            age_values="20-29 anos",
+            gender_values="homem",
+            initial_date="2023-01-01",
+        )
+        plan = self.explain(*queries.count_query(queries.dist_filter))
+        conditions = [cond for _, cond in _index_conditions(plan)]
+        self.assertTrue(
+            any(
+                "dt_notific" in cond or "cid10_codigo" in cond
+                for cond in conditions
+            ),
+            conditions,
+        )
+
+    def test_all_dists_match_single_charts(self):
+        for queries in (
+            NotificationQueries(
+                "Rio de Janeiro",
+                gender_values="mulher",
+                age_values="20-29 anos",
+            ),
+            NotificationQueries("Rio de Janeiro", disease_values="dengue"),
+        ):
+            dists = queries.get_all_dists(self.conn)
+            self.assertEqual(
+                dists["selected_cases"].casos.iloc[0],
+                queries.get_selected_rows(self.conn).casos.iloc[0],
+            )
+            self.assertEqual(
+                dists["total_cases"].casos.iloc[0],
+                queries.get_total_rows(self.conn).casos.iloc[0],
+            )
+            for name, method in (
+                ("disease", queries.get_disease_dist),
+                ("age", queries.get_age_dist),
+                ("age_gender", queries.get_age_gender_dist),
+                ("age_male", queries.get_age_male_dist),
+                ("age_female", queries.get_age_female_dist),
+                ("gender", queries.get_gender_dist),
+                ("period", queries.get_period_dist),
+            ):
+                self.assertEqual(
+                    dists[name].to_dict(), method(self.conn).to_dict(), name
+                )
@@ -0,0 +1,136 @@
+import io
+import json
+from decimal import Decimal
+from unittest import TestCase
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# local
+from ..formats import serialize
+from ..streaming import (
+    arrow_chunks,
+    csv_chunks,
+    iter_batches,
+    jsonl_chunks,
+    parquet_chunks,
+    streaming_response,
+)
+
+
+class TestStreamingChunks(TestCase):
+    batches = [
+        pd.DataFrame({"SE": [202401, 202402], "casos": [1, 2]}),
+        pd.DataFrame({"SE": [202403], "casos": [3]}),
+    ]
+
+    def test_csv_header_once(self):
+        chunks = list(csv_chunks(self.batches))
+        self.assertEqual(len(chunks), 2)
+        df = pd.read_csv(io.StringIO("".join(chunks)))
+        pd.testing.assert_frame_equal(
+            df, pd.concat(self.batches, ignore_index=True)
+        )
+
+    def test_json_lines(self):
+        lines = "".join(jsonl_chunks(self.batches)).splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"SE": 202401, "casos": 1},
+                {"SE": 202402, "casos": 2},
+                {"SE": 202403, "casos": 3},
+            ],
+        )
+
+    def test_streaming_response(self):
+        response = streaming_response(self.batches, "csv", "export.csv")
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="export.csv"',
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(),
+            "SE,casos\n202401,1\n202402,2\n202403,3\n",
+        )
+
+        response = streaming_response(self.batches, "json")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertNotIn("Content-Disposition", response)
+
+    def test_iter_batches(self):
+        batches = list(
+            iter_batches(
+                "SELECT n FROM generate_series(1, :rows) AS n",
+                {"rows": 25},
+                batch_size=10,
+            )
+        )
+        self.assertEqual([len(df) for df in batches], [10, 10, 5])
+        self.assertEqual(batches[-1].n.tolist(), [21, 22, 23, 24, 25])
+
+
+class TestColumnarChunks(TestCase):
+    batches = [
+        pd.DataFrame(
+            {
+                "data_iniSE": pd.to_datetime(["2024-01-07", "2024-01-14"]),
+                "SE": [202402, 202403],
+                "casos_est": [1.5, 2.5],
+            }
+        ),
+        pd.DataFrame(
+            {
+                "data_iniSE": pd.to_datetime(["2024-01-21"]),
+                "SE": [202404],
+                "casos_est": [3.5],
+            }
+        ),
+    ]
+
+    def expected(self) -> pd.DataFrame:
+        return pd.concat(self.batches, ignore_index=True)
+
+    def test_arrow_stream(self):
+        data = b"".join(arrow_chunks(self.batches))
+        table = pa.ipc.open_stream(data).read_all()
+        pd.testing.assert_frame_equal(table.to_pandas(), self.expected())
+
+    def test_parquet(self):
+        data = b"".join(parquet_chunks(self.batches))
+        parquet_file = pq.ParquetFile(io.BytesIO(data))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        pd.testing.assert_frame_equal(
+            parquet_file.read().to_pandas(), self.expected()
+        )
+
+    def test_column_null_in_the_first_batch(self):
+        batches = [
+            pd.DataFrame({"SE": [202401, 202402], "Rt": [None, None]}),
+            pd.DataFrame({"SE": [202403], "Rt": [Decimal("1.1")]}),
+        ]
+        expected = pd.DataFrame(
+            {"SE": [202401, 202402, 202403], "Rt": [None, None, 1.1]}
+        ).astype({"Rt": float})
+
+        data = b"".join(arrow_chunks(batches))
+        pd.testing.assert_frame_equal(
+            pa.ipc.open_stream(data).read_all().to_pandas(), expected
+        )
+        data = b"".join(parquet_chunks(batches))
+        pd.testing.assert_frame_equal(
+            pq.read_table(io.BytesIO(data)).to_pandas(), expected
+        )
+
+    def test_serialize_keeps_dtypes(self):
+        df = self.expected()
+        df["Rt"] = [Decimal("1.1"), None, Decimal("0.9")]
+        table = pq.read_table(io.BytesIO(serialize(df, "parquet")))
+        self.assertEqual(table.schema.field("SE").type, pa.int64())
+        self.assertEqual(table.schema.field("Rt").type, pa.float64())
+        self.assertTrue(
+            pa.types.is_timestamp(table.schema.field("data_iniSE").type)
+        )
+        with self.assertRaises(Exception):
+            serialize(df, "xml")
@@ -1,11 +1,15 @@
+import datetime
 import io
 import os
 import unittest
+from unittest.mock import patch
 
 import django
 import pandas as pd
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 # local
 from .. import settings
@@ -27,6 +31,33 @@ class TestApiView(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_notification_reduced_all_view(self):
+        response = self.client.get(
+            reverse("api:notif_reduced"),
+            {"state_abv": "RJ", "chart_type": "all"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        result = response.json()
+        self.assertEqual(
+            set(result),
+            {
+                "disease",
+                "age",
+                "age_gender",
+                "age_male",
+                "age_female",
+                "gender",
+                "period",
+                "total_cases",
+                "selected_cases",
+            },
+        )
+        self.assertLessEqual(
+            result["selected_cases"][0]["casos"],
+            result["total_cases"][0]["casos"],
+        )
+
     @unittest.skip("Waiting data on database demo.")
     def test_notification_reduced_csv_404_view(self):
         """
@@ -144,6 +175,80 @@ class TestApiView(TestCase):
         assert all(201701 <= df["SE"]) and all(df["SE"] <= 201750)
 
 
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    },
+    # the site-wide cache middleware would answer before the view
+    CACHE_MIDDLEWARE_SECONDS=0,
+)
+@patch(
+    "api.db.AlertCity.data_version",
+    return_value=(
+        datetime.date(2024, 1, 7),
+        timezone.make_aware(datetime.datetime(2024, 1, 10, 12)),
+    ),
+)
+@patch("api.views.AlertCityView._search", return_value="[]")
+class TestAlertCityConditionalGet(SimpleTestCase):
+    params = {
+        "disease": "dengue",
+        "geocode": 3304557,
+        "format": "json",
+        "ew_start": 1,
+        "ew_end": 10,
+        "ey_start": 2024,
+        "ey_end": 2024,
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_response(self, search, data_version):
+        first = self.client.get(reverse("api:alertcity"), self.params)
+        second = self.client.get(reverse("api:alertcity"), self.params)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(search.call_count, 1)
+
+    def test_not_modified(self, search, data_version):
+        response = self.client.get(reverse("api:alertcity"), self.params)
+
+        not_modified = self.client.get(
+            reverse("api:alertcity"),
+            self.params,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+        not_modified = self.client.get(
+            reverse("api:alertcity"),
+            self.params,
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_version(self, search, data_version):
+        response = self.client.get(reverse("api:alertcity"), self.params)
+
+        data_version.return_value = (
+            datetime.date(2024, 1, 14),
+            timezone.make_aware(datetime.datetime(2024, 1, 17, 12)),
+        )
+        updated = self.client.get(
+            reverse("api:alertcity"),
+            self.params,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated["ETag"], response["ETag"])
+        self.assertEqual(search.call_count, 2)
+
+
 if __name__ == "__main__":
     django.setup()
     unittest.main()
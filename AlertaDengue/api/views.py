@@ -1,12 +1,20 @@
+import hashlib
 import json
 from datetime import datetime
+from typing import List, Optional
 
+import pandas as pd
+from dados.dbdata import cache_get_or_set
 from dados.episem import episem
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.generic.base import View
 
 # local
-from .db import STATE_NAME, AlertCity, NotificationQueries
+from .db import CID10, STATE_NAME, AlertCity, NotificationQueries
+from .formats import CONTENT_TYPES, FORMATS, fix_dtypes, serialize
+from .streaming import iter_batches, streaming_response
 
 
 class _GetMethod:
@@ -72,33 +80,52 @@ class NotificationReducedCSV_View(View, _GetMethod):
             final_date=self._get("final_date"),
         )
 
-        result = None
+        # the CSV is written straight to the response, without building
+        # the whole string first
+        response = HttpResponse(content_type="text/plain")
 
         if chart_type == "disease":
-            result = notifQuery.get_disease_dist().to_csv()
+            notifQuery.get_disease_dist().to_csv(response)
         elif chart_type == "age":
-            result = notifQuery.get_age_dist().to_csv()
+            notifQuery.get_age_dist().to_csv(response)
         elif chart_type == "age_gender":
-            result = notifQuery.get_age_gender_dist().to_csv()
+            notifQuery.get_age_gender_dist().to_csv(response)
         elif chart_type == "age_male":
-            result = notifQuery.get_age_male_dist().to_csv()
+            notifQuery.get_age_male_dist().to_csv(response)
         elif chart_type == "age_female":
-            result = notifQuery.get_age_female_dist().to_csv()
+            notifQuery.get_age_female_dist().to_csv(response)
         elif chart_type == "gender":
-            result = notifQuery.get_gender_dist().to_csv()
+            notifQuery.get_gender_dist().to_csv(response)
         elif chart_type == "period":
-            result = notifQuery.get_period_dist().to_csv(
-                date_format="%Y-%m-%d"
+            notifQuery.get_period_dist().to_csv(
+                response, date_format="%Y-%m-%d"
             )
         elif chart_type == "epiyears":
             # just filter by one disease
-            result = notifQuery.get_epiyears(uf, self._get("disease")).to_csv()
+            notifQuery.get_epiyears(uf, self._get("disease")).to_csv(response)
         elif chart_type == "total_cases":
-            result = notifQuery.get_total_rows().to_csv()
+            notifQuery.get_total_rows().to_csv(response)
         elif chart_type == "selected_cases":
-            result = notifQuery.get_selected_rows().to_csv()
+            notifQuery.get_selected_rows().to_csv(response)
+        elif chart_type == "all":
+            # the records of each of the charts above, in a single query
+            dists = notifQuery.get_all_dists()
+            dists["period"].index = pd.to_datetime(
+                dists["period"].index
+            ).strftime("%Y-%m-%d")
+            result = json.dumps(
+                {
+                    name: json.loads(
+                        df.reset_index(drop=df.index.name is None).to_json(
+                            orient="records"
+                        )
+                    )
+                    for name, df in dists.items()
+                }
+            )
+            return HttpResponse(result, content_type="application/json")
 
-        return HttpResponse(result, content_type="text/plain")
+        return response
 
 
 class AlertCityView(View, _GetMethod):
@@ -106,6 +133,80 @@ class AlertCityView(View, _GetMethod):
 
     request = None
 
+    @staticmethod
+    def _search(
+        disease: str,
+        geocode: int,
+        format: str,
+        eyw_start: int,
+        eyw_end: int,
+        ew_range: str,
+    ) -> str:
+        """
+        The serialized alerts of a city.
+        """
+        if ew_range != "last":
+            # Use the keyword arguments for infodengue website
+            df = AlertCity.search(
+                geocode=geocode,
+                disease=disease,
+                ew_start=eyw_start,
+                ew_end=eyw_end,
+            ).execute()
+        else:
+            # Use the keyword arguments for mobile app
+            df = AlertCity.search(
+                geocode=geocode,
+                disease=disease,
+            ).execute()
+
+        df.drop(
+            columns=["municipio_geocodigo", "municipio_nome"],
+            inplace=True,
+        )
+
+        return serialize(df, format)
+
+    @staticmethod
+    def _prepare_batch(df: pd.DataFrame) -> pd.DataFrame:
+        df = fix_dtypes(df.drop(columns=["week_rank"]))
+        df["data_iniSE"] = pd.to_datetime(df["data_iniSE"])
+        return df
+
+    def _stream_many(
+        self,
+        disease: str,
+        format: str,
+        geocodes: Optional[List[int]],
+        uf: Optional[str],
+        regional: Optional[int],
+        eyw_start: Optional[int],
+        eyw_end: Optional[int],
+    ) -> StreamingHttpResponse:
+        """
+        Streams the alerts of several cities, as CSV, JSON lines, Parquet
+        or an Arrow IPC stream.
+        """
+        state_name = None
+        if uf is not None:
+            if uf.upper() not in STATE_NAME:
+                raise Exception(
+                    f"The state {uf} was not found. "
+                    "This parameter must have 2 letters (e.g. RJ)."
+                )
+            state_name = STATE_NAME[uf.upper()]
+
+        sql, params = AlertCity.search_many_query(
+            disease, geocodes, state_name, regional, eyw_start, eyw_end
+        )
+        batches = iter_batches(sql, params, prepare=self._prepare_batch)
+        ew_range = f"{eyw_start}-{eyw_end}" if eyw_start else "last"
+        return streaming_response(
+            batches,
+            format,
+            None if format == "json" else f"{disease}_{ew_range}.{format}",
+        )
+
     def get(self, request):
         self.request = request
         format = ""
@@ -114,8 +215,20 @@ class AlertCityView(View, _GetMethod):
             disease = self._get(
                 "disease", error_message="Disease sent is empty."
             ).lower()
-            geocode = self._get(
-                "geocode", cast=int, error_message="GEO-Code sent is empty."
+            uf = self._get("uf")
+            regional = self._get("regional", cast=int)
+            geocodes = self._get(
+                "geocode",
+                error_message=(
+                    "GEO-Code sent is empty."
+                    if uf is None and regional is None
+                    else None
+                ),
+            )
+            geocodes = (
+                None
+                if geocodes is None
+                else [int(g) for g in geocodes.split(",")]
             )
             format = self._get(
                 "format", error_message="Format sent is empty."
@@ -146,48 +259,79 @@ class AlertCityView(View, _GetMethod):
                 error_message="Epidemic end year sent is empty.",
             )
 
-            if format not in ["csv", "json"]:
+            if format not in FORMATS:
                 raise Exception(
-                    "The output format available are: `csv` or `json`."
+                    "The output format available are: "
+                    + ", ".join(f"`{f}`" for f in FORMATS)
+                    + "."
                 )
 
             eyw_start = ey_start * 100 + ew_start
             eyw_end = ey_end * 100 + ew_end
 
-            if self._get("ew_end"):
-                # Use the keyword arguments for infodengue website
-                df = AlertCity.search(
-                    geocode=geocode,
-                    disease=disease,
-                    ew_start=eyw_start,
-                    ew_end=eyw_end,
-                ).execute()
-            else:
-                # Use the keyword arguments for mobile app
-                df = AlertCity.search(
-                    geocode=geocode,
-                    disease=disease,
-                ).execute()
+            if disease not in CID10:
+                raise Exception(
+                    f"The diseases available are: {list(CID10.keys())}"
+                )
+
+            if uf is not None or regional is not None or len(geocodes) > 1:
+                return self._stream_many(
+                    disease,
+                    format,
+                    geocodes,
+                    uf,
+                    regional,
+                    eyw_start if self._get("ew_end") else None,
+                    eyw_end if self._get("ew_end") else None,
+                )
+            geocode = geocodes[0]
 
-            df.drop(
-                columns=["municipio_geocodigo", "municipio_nome"],
-                inplace=True,
+            # the website sends the week range, the mobile app asks for the
+            # latest weeks
+            ew_range = (
+                f"{eyw_start}-{eyw_end}" if self._get("ew_end") else "last"
             )
+            version, modified = AlertCity.data_version(disease)
+            cache_key = (
+                f"alertcity_{disease}_{geocode}_{ew_range}_{format}_{version}"
+            )
+            etag = quote_etag(hashlib.md5(cache_key.encode()).hexdigest())
+            last_modified = int(modified.timestamp())
 
-            if format == "json":
-                result = df.to_json(orient="records")
-            else:
-                result = df.to_csv(index=False)
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if not_modified is not None:
+                not_modified["ETag"] = etag
+                not_modified["Last-Modified"] = http_date(last_modified)
+                return not_modified
+
+            result = cache_get_or_set(
+                cache_key,
+                lambda: self._search(
+                    disease, geocode, format, eyw_start, eyw_end, ew_range
+                ),
+            )
         except Exception as e:
+            etag = None
             if format == "json":
                 result = '{"error_message": "%s"}' % e
             else:
                 result = "[EE] error_message: %s" % e
 
-        content_type = "application/json" if format == "json" else "text/plain"
+        if etag is None:
+            content_type = (
+                "application/json" if format == "json" else "text/plain"
+            )
+        else:
+            content_type = CONTENT_TYPES[format]
         response = HttpResponse(result, content_type=content_type)
 
-        if format == "csv":
+        if etag is not None:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+
+        if format in ("csv", "parquet", "arrow"):
             response["Content-Disposition"] = (
                 "attachment;"
                 f' filename="{disease}_{ew_start}-{ew_end}.{format}"'
@@ -0,0 +1,7 @@
+"""
+Standalone performance benchmarks.
+
+Each module is a script meant to be run from the AlertaDengue directory,
+e.g. ``python -m benchmarks.upload_loader``. They are not collected by
+the test suite.
+"""
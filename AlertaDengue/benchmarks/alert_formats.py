@@ -0,0 +1,48 @@
+"""
+Compares the output formats of the alertcity API (api.formats.serialize):
+serialization time and payload size of a 10 year weekly series of one
+city (and of --cities cities, as a multi-city export).
+
+Usage:
+    python -m benchmarks.alert_formats --repeat 5 --cities 100
+"""
+import argparse
+import time
+
+import pandas as pd
+from api.formats import FORMATS, serialize
+from benchmarks.synthetic import synthetic_alerts
+
+WEEKS = 520
+
+
+def timeit(df: pd.DataFrame, format: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        st = time.perf_counter()
+        payload = serialize(df, format)
+        best = min(best, time.perf_counter() - st)
+    size = len(payload.encode() if isinstance(payload, str) else payload)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cities", type=int, default=100)
+    args = parser.parse_args()
+
+    for cities in (1, args.cities):
+        df = pd.concat(
+            [synthetic_alerts(WEEKS, seed=seed) for seed in range(cities)],
+            ignore_index=True,
+        )
+        print(f"{cities} cities x {WEEKS} weeks ({len(df)} rows)")
+        print(f"{'format':>8} {'time (ms)':>10} {'size (KiB)':>11}")
+        for format in FORMATS:
+            elapsed, size = timeit(df, format, args.repeat)
+            print(f"{format:>8} {elapsed * 1000:>10.2f} {size / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the records/second of the single pass DBFReader against the
+previous upload path, which re-opened the DBF through GDAL/Fiona with
+``gpd.read_file(rows=slice(...))`` for every chunk.
+
+Usage:
+    python -m benchmarks.dbf_reader path/to/file.dbf --chunksize 100000
+"""
+import argparse
+import time
+
+import geopandas as gpd
+from benchmarks.synthetic import SINAN_COLUMNS
+from dbf.reader import DBFReader
+
+
+def read_sliced(fname: str, columns: list, chunksize: int) -> int:
+    records = 0
+    for lowerbound in range(0, DBFReader(fname).numrec, chunksize):
+        records += len(
+            gpd.read_file(
+                fname,
+                include_fields=columns,
+                rows=slice(lowerbound, lowerbound + chunksize),
+                ignore_geometry=True,
+            )
+        )
+    return records
+
+
+def read_single_pass(fname: str, columns: list, chunksize: int) -> int:
+    reader = DBFReader(fname, columns=columns)
+    return sum(len(df) for df in reader.iter_batches(chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fname")
+    parser.add_argument("--chunksize", type=int, default=100000)
+    args = parser.parse_args()
+
+    field_names = DBFReader(args.fname).field_names
+    columns = [col for col in SINAN_COLUMNS if col in field_names]
+
+    for name, read in [
+        ("gpd.read_file", read_sliced),
+        ("DBFReader", read_single_pass),
+    ]:
+        st = time.perf_counter()
+        records = read(args.fname, columns, args.chunksize)
+        elapsed = time.perf_counter() - st
+        print(
+            f"{name:<14} {records:>9} records {elapsed:>8.2f}s "
+            f"{records / elapsed:>10.0f} records/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
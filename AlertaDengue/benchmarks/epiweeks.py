@@ -0,0 +1,68 @@
+"""
+Per-row cost of the epidemiological week conversions (dados.episem): the
+scalar episem/episem2date applied row by row against episem_array and
+episem2date_array, over --rows random dates (and their weeks).
+
+The scalar functions are timed on a --sample of the rows and extrapolated.
+
+Usage:
+    python -m benchmarks.epiweeks --rows 1000000 --sample 20000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from dados.episem import episem, episem2date, episem2date_array, episem_array
+
+
+def per_row(func, rows: int) -> float:
+    st = time.perf_counter()
+    func()
+    return (time.perf_counter() - st) / rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    dates = np.datetime64("2000-01-01") + rng.integers(
+        0, 365 * 30, args.rows
+    ).astype("timedelta64[D]")
+    series = pd.Series(dates)
+    yearweeks = episem_array(dates)
+    sample_dates = pd.to_datetime(dates[: args.sample]).to_pydatetime()
+    sample_yearweeks = yearweeks[: args.sample].tolist()
+
+    results = {
+        "episem (scalar)": per_row(
+            lambda: [episem(d, sep="") for d in sample_dates], args.sample
+        ),
+        "episem_array": per_row(lambda: episem_array(dates), args.rows),
+        "episem_array (Series)": per_row(
+            lambda: episem_array(series), args.rows
+        ),
+        "episem2date (scalar)": per_row(
+            lambda: [episem2date(yw) for yw in sample_yearweeks],
+            args.sample,
+        ),
+        "episem2date_array": per_row(
+            lambda: episem2date_array(yearweeks), args.rows
+        ),
+    }
+
+    print(f"{args.rows} rows")
+    print(f"{'conversion':>22} {'ns/row':>10} {'total (s)':>10}")
+    for name, elapsed in results.items():
+        print(
+            f"{name:>22} {elapsed * 1e9:>10.1f}"
+            f" {elapsed * args.rows:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
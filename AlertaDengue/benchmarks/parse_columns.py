@@ -0,0 +1,66 @@
+"""
+Per-column timing of the SINAN column converters: the old np.vectorize
+implementations against the columnar ones in dbf.utils.
+
+Usage:
+    python -m benchmarks.parse_columns --rows 1000000
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ad_main.settings")
+django.setup()
+
+from benchmarks.synthetic import synthetic_sinan  # noqa: E402
+from dbf import utils  # noqa: E402
+from dbf.tests import legacy  # noqa: E402
+
+# (converter name, column, extra args)
+CONVERTERS = [
+    ("fix_nu_notif", "NU_NOTIFIC", ()),
+    ("add_dv", "ID_MUNICIP", ()),
+    ("convert_date", "DT_NOTIFIC", ()),
+    ("fill_id_agravo", "ID_AGRAVO", ("A90",)),
+    ("convert_sem_pri", "SEM_PRI", ()),
+    ("convert_sem_not", "SEM_NOT", ()),
+]
+
+
+def timeit(func, *args) -> float:
+    st = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = synthetic_sinan(args.rows)
+
+    print(
+        f"{'converter':<16} {'column':<11} {'vectorize (s)':>14} "
+        f"{'columnar (s)':>13} {'speedup':>8}"
+    )
+    for name, column, extra in CONVERTERS:
+        old = timeit(getattr(legacy, name), df[column], *extra)
+        new = timeit(getattr(utils, name), df[column], *extra)
+        print(
+            f"{name:<16} {column:<11} {old:>14.3f} {new:>13.3f} "
+            f"{old / new:>7.1f}x"
+        )
+
+    old = timeit(legacy.convert_nu_ano, "2023", df["NU_ANO"])
+    new = timeit(utils.convert_nu_ano, "2023", df["NU_ANO"])
+    print(
+        f"{'convert_nu_ano':<16} {'NU_ANO':<11} {old:>14.3f} {new:>13.3f} "
+        f"{old / new:>7.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
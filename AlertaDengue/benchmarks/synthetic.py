@@ -0,0 +1,114 @@
+"""
+Synthetic datasets shared by the benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+# Raw SINAN columns, as in upload.models.SINANUpload.COLUMNS
+SINAN_COLUMNS = [
+    "DT_NOTIFIC",
+    "SEM_NOT",
+    "NU_ANO",
+    "DT_SIN_PRI",
+    "SEM_PRI",
+    "DT_DIGITA",
+    "ID_MUNICIP",
+    "NU_NOTIFIC",
+    "ID_AGRAVO",
+    "DT_NASC",
+    "CS_SEXO",
+    "NU_IDADE_N",
+    "RESUL_PCR_",
+    "CRITERIO",
+    "CLASSI_FIN",
+    "DT_CHIK_S1",
+    "DT_CHIK_S2",
+    "DT_PRNT",
+    "RES_CHIKS1",
+    "RES_CHIKS2",
+    "RESUL_PRNT",
+    "DT_SORO",
+    "RESUL_SORO",
+    "DT_NS1",
+    "RESUL_NS1",
+    "DT_VIRAL",
+    "RESUL_VI_N",
+    "DT_PCR",
+    "SOROTIPO",
+    "ID_DISTRIT",
+    "ID_BAIRRO",
+    "NM_BAIRRO",
+    "ID_UNIDADE",
+]
+
+
+def synthetic_sinan(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    days = pd.to_datetime("2023-01-01") + pd.to_timedelta(
+        rng.integers(0, 365, rows), unit="D"
+    )
+    dates = pd.Series(days.strftime("%Y-%m-%d"))
+    df = pd.DataFrame({col: None for col in SINAN_COLUMNS}, index=range(rows))
+    df["ID_MUNICIP"] = rng.choice(["330455", "355030", "310620"], rows)
+    df["NU_NOTIFIC"] = np.arange(1000000, 1000000 + rows).astype(str)
+    df["ID_AGRAVO"] = "A90"
+    df["NU_ANO"] = "2023"
+    df["DT_NOTIFIC"] = dates
+    df["DT_SIN_PRI"] = dates
+    df["DT_DIGITA"] = dates
+    df["DT_NASC"] = "1990-05-17"
+    df["SEM_NOT"] = "2023" + pd.Series(rng.integers(1, 53, rows)).astype(
+        str
+    ).str.zfill(2)
+    df["SEM_PRI"] = df["SEM_NOT"]
+    df["CS_SEXO"] = rng.choice(["M", "F", "I"], rows)
+    df["NU_IDADE_N"] = "4033"
+    df["RESUL_PCR_"] = "1"
+    df["CRITERIO"] = "1"
+    df["CLASSI_FIN"] = "10"
+    df["NM_BAIRRO"] = "CENTRO"
+    return df
+
+
+def synthetic_alerts(weeks: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Weekly alerts of one city, with the columns returned by the alertcity
+    API (Historico_alerta without the city columns).
+    """
+    rng = np.random.default_rng(seed)
+    data_ini = pd.date_range("2014-01-05", periods=weeks, freq="7D")
+    casos = rng.poisson(50, weeks)
+    casos_est = casos * rng.uniform(1.0, 1.5, weeks)
+    return pd.DataFrame(
+        {
+            "data_iniSE": data_ini,
+            "SE": data_ini.year * 100 + (np.arange(weeks) % 52) + 1,
+            "casos_est": casos_est,
+            "casos_est_min": (casos_est * 0.8).astype(int),
+            "casos_est_max": (casos_est * 1.2).astype(int),
+            "casos": casos,
+            "p_rt1": rng.uniform(0, 1, weeks),
+            "p_inc100k": rng.uniform(0, 100, weeks),
+            "Localidade_id": 0,
+            "nivel": rng.integers(1, 5, weeks),
+            "id": np.arange(weeks),
+            "versao_modelo": "2024-01-01",
+            "Rt": rng.uniform(0, 3, weeks),
+            "pop": 6747815.0,
+            "tempmin": rng.uniform(15, 25, weeks),
+            "umidmax": rng.uniform(60, 100, weeks),
+            "receptivo": rng.integers(0, 2, weeks),
+            "transmissao": rng.integers(0, 2, weeks),
+            "nivel_inc": rng.integers(0, 3, weeks),
+            "umidmed": rng.uniform(50, 90, weeks),
+            "umidmin": rng.uniform(30, 70, weeks),
+            "tempmed": rng.uniform(20, 30, weeks),
+            "tempmax": rng.uniform(25, 38, weeks),
+            "casprov": casos,
+            "casprov_est": casos_est,
+            "casprov_est_min": (casos_est * 0.8).astype(int),
+            "casprov_est_max": (casos_est * 1.2).astype(int),
+            "casconf": casos // 2,
+            "notif_accum_year": casos.sum(),
+        }
+    )
@@ -0,0 +1,61 @@
+"""
+Compares NotificationResume.tail_estimated_cases (one query with
+ROW_NUMBER() over the geocode array) with the previous version (one
+UNION branch per geocode) for 10, 100 and 1000 geocodes.
+
+Usage:
+    python -m benchmarks.tail_estimated_cases --repeat 5
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ad_main.settings")
+django.setup()
+
+from dados.dbdata import DB_ENGINE, NotificationResume  # noqa: E402
+from dados.tests.legacy import OldNotificationResume  # noqa: E402
+
+SIZES = [10, 100, 1000]
+
+
+def timeit(func, geo_ids, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        st = time.perf_counter()
+        func(geo_ids, 12)
+        best = min(best, time.perf_counter() - st)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with DB_ENGINE.connect() as conn:
+        geocodes = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT municipio_geocodigo "
+                'FROM "Municipio".historico_casos '
+                f"ORDER BY 1 LIMIT {max(SIZES)}"
+            )
+        ]
+
+    print(f"{'geocodes':>8} {'union (s)':>10} {'window (s)':>11} {'x':>6}")
+    for size in SIZES:
+        geo_ids = geocodes[:size]
+        old = timeit(
+            OldNotificationResume.tail_estimated_cases, geo_ids, args.repeat
+        )
+        new = timeit(
+            NotificationResume.tail_estimated_cases, geo_ids, args.repeat
+        )
+        print(f"{len(geo_ids):>8} {old:>10.3f} {new:>11.3f} {old / new:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
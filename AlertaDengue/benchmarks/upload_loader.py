@@ -0,0 +1,90 @@
+"""
+Compares the rows/second of the SINAN upload temp table loaders
+(``executemany`` vs ``COPY FROM STDIN``) on a synthetic parquet file.
+
+Usage:
+    python -m benchmarks.upload_loader --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ad_main.settings")
+django.setup()
+
+import pyarrow.parquet as pq  # noqa: E402
+from benchmarks.synthetic import synthetic_sinan  # noqa: E402
+from upload.models import SINANUpload  # noqa: E402
+from upload.tasks import (  # noqa: E402
+    ENGINE,
+    LOADERS,
+    create_temp_table,
+    drop_temp_table,
+    parse_chunk,
+)
+
+CHUNKSIZE = 100000
+
+
+def run(loader: str, parquet_file: Path) -> tuple[int, float, float]:
+    # the arguments of parse_chunk for a dengue upload of the synthetic year
+    parse_args = (
+        "A90",
+        2023,
+        SINANUpload.COLUMNS,
+        list(SINANUpload.REQUIRED_COLS),
+    )
+    tablename = f"bench_sinan_{loader}"
+    rows = parse_time = load_time = 0
+    conn = ENGINE.raw_connection()
+    try:
+        cursor = conn.cursor()
+        create_temp_table(cursor, tablename)
+        for batch in pq.ParquetFile(str(parquet_file)).iter_batches(
+            batch_size=CHUNKSIZE
+        ):
+            st = time.perf_counter()
+            df, _ = parse_chunk(batch.to_pandas(), *parse_args)
+            parse_time += time.perf_counter() - st
+
+            st = time.perf_counter()
+            LOADERS[loader](cursor, df, tablename)
+            load_time += time.perf_counter() - st
+            rows += len(df)
+        drop_temp_table(cursor, tablename)
+    finally:
+        conn.rollback()
+        conn.close()
+    return rows, parse_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument(
+        "--loaders", nargs="+", default=list(LOADERS), choices=list(LOADERS)
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_file = Path(tmp) / "sinan.parquet"
+        synthetic_sinan(args.rows).to_parquet(parquet_file, index=False)
+
+        print(
+            f"{'loader':<12} {'rows':>9} {'parse (s)':>10} "
+            f"{'load (s)':>10} {'rows/s':>12}"
+        )
+        for loader in args.loaders:
+            rows, parse_time, load_time = run(loader, parquet_file)
+            print(
+                f"{loader:<12} {rows:>9} {parse_time:>10.2f} "
+                f"{load_time:>10.2f} {rows / load_time:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import json
 from time import mktime
+from typing import List
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
 
@@ -13,12 +15,35 @@ def int_or_none(x):
     return None if x is None else int(x)
 
 
+def alert_bands(alerta: list, casos: list) -> List[list]:
+    """
+    Cases by alert level (green, yellow, orange, red), None out of the
+    level. The week after a level ends keeps its cases, closing the area
+    of the level in the chart.
+    """
+    alerta = np.asarray(alerta)
+    casos = np.asarray(casos, dtype=int).astype(object)
+    bands = []
+    for level in range(4):
+        in_level = alerta == level
+        in_level |= np.roll(in_level, 1)
+        bands.append(np.where(in_level, casos, None).tolist())
+    return bands
+
+
 class AlertCitiesCharts:
     @classmethod
     def prepare_data(
-        cls, geocode, nome, disease_label, disease="dengue", epiweek=0
+        cls,
+        geocode,
+        nome,
+        disease_label,
+        disease="dengue",
+        epiweek=0,
+        dados=None,
     ):
-        dados = load_series(geocode, disease, epiweek)[geocode]
+        if dados is None:
+            dados = load_series(geocode, disease, epiweek)[geocode]
         if dados is None:
             return {
                 "nome": nome,
@@ -30,51 +55,9 @@ class AlertCitiesCharts:
                 "vermelho": {},
                 "disease_label": disease_label,
             }
+        dados = dict(dados)
         dados["dia"] = [int(mktime(d.timetuple())) for d in dados["dia"]]
-        # green alert
-        ga = [
-            int(c) if a == 0 else None
-            for a, c in zip(dados["alerta"], dados["casos"])
-        ]
-        ga = [
-            int_or_none(dados["casos"][n])
-            if i is None and ga[n - 1] is not None
-            else int_or_none(i)
-            for n, i in enumerate(ga)
-        ]
-        # yellow alert
-        ya = [
-            int(c) if a == 1 else None
-            for a, c in zip(dados["alerta"], dados["casos"])
-        ]
-        ya = [
-            int_or_none(dados["casos"][n])
-            if i is None and ya[n - 1] is not None
-            else int_or_none(i)
-            for n, i in enumerate(ya)
-        ]
-        # orange alert
-        oa = [
-            int(c) if a == 2 else None
-            for a, c in zip(dados["alerta"], dados["casos"])
-        ]
-        oa = [
-            int_or_none(dados["casos"][n])
-            if i is None and oa[n - 1] is not None
-            else int_or_none(i)
-            for n, i in enumerate(oa)
-        ]
-        # red alert
-        ra = [
-            int(c) if a == 3 else None
-            for a, c in zip(dados["alerta"], dados["casos"])
-        ]
-        ra = [
-            int_or_none(dados["casos"][n])
-            if i is None and ra[n - 1] is not None
-            else int_or_none(i)
-            for n, i in enumerate(ra)
-        ]
+        ga, ya, oa, ra = alert_bands(dados["alerta"], dados["casos"])
 
         result = {
             "nome": nome,
@@ -93,9 +76,22 @@ class AlertCitiesCharts:
     def create_alert_chart(
         cls, geocode, nome, disease_label, disease_code="dengue", epiweek=0
     ):
+        return cls.create_alert_figure(
+            geocode, nome, disease_label, disease_code, epiweek
+        ).to_html()
 
+    @classmethod
+    def create_alert_figure(
+        cls,
+        geocode,
+        nome,
+        disease_label,
+        disease_code="dengue",
+        epiweek=0,
+        dados=None,
+    ) -> go.Figure:
         result = cls.prepare_data(
-            geocode, nome, disease_label, disease_code, epiweek
+            geocode, nome, disease_label, disease_code, epiweek, dados
         )
 
         df_dados = pd.DataFrame(result["dados"])
@@ -301,4 +297,4 @@ class AlertCitiesCharts:
                 "bgcolor": "rgba(255 ,255 ,255 ,0.7)",
             },
         )
-        return fig.to_html()
+        return fig
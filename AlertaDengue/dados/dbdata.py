@@ -2,12 +2,15 @@
 This module contains functions to interact with the main database of the
 Alertadengue project.
 """
+import io
 import json
 import logging
+import threading
+import time
 import unicodedata
-from collections import defaultdict
-from datetime import datetime
-from typing import List, Optional, Tuple
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Tuple, Union
 
 import ibis
 import numpy as np
@@ -21,6 +24,7 @@ from sqlalchemy.engine.base import Engine
 
 # local
 from .episem import episem
+from .localcache import local_cache
 from .models import City
 
 logger = logging.getLogger(__name__)
@@ -30,6 +34,11 @@ IBIS_CONN = get_ibis_conn()
 
 
 CID10 = {"dengue": "A90", "chikungunya": "A92.0", "zika": "A928"}
+DISEASE_LABEL = {
+    "dengue": "Dengue",
+    "chikungunya": "Chikungunya",
+    "zika": "Zika",
+}
 DISEASES_SHORT = ["dengue", "chik", "zika"]
 DISEASES_NAME = CID10.keys()
 ALERT_COLOR = {1: "verde", 2: "amarelo", 3: "laranja", 4: "vermelho"}
@@ -77,6 +86,95 @@ with open(APPS_DIR / "data" / "municipalities.json", "r") as muns:
 # Ibis utils
 
 
+_CACHE_MISS = object()
+_cache_stats = threading.local()
+
+
+def cache_stats() -> Counter:
+    """
+    The "hits" and "misses" of cache_get_or_set and load_series_many in
+    the current thread.
+    """
+    if not hasattr(_cache_stats, "counter"):
+        _cache_stats.counter = Counter()
+    return _cache_stats.counter
+
+
+def cache_get_or_set(
+    cache_key: str,
+    compute: Callable[[], Any],
+    timeout: Optional[int] = None,
+    local: bool = False,
+) -> Any:
+    """
+    Returns the cached value of `cache_key`, computing and caching it on a
+    miss. Only one worker computes a missing key at a time (the one that
+    acquires the `<cache_key>:lock` key, as memcached's add is atomic); the
+    others wait for its value instead of running the same query, up to
+    QUERY_CACHE_LOCK_TIMEOUT seconds.
+
+    Parameters
+    ----------
+    cache_key : str
+        The cache key.
+    compute : Callable[[], Any]
+        Computes the value on a cache miss.
+    timeout : Optional[int]
+        The cache timeout, defaults to QUERY_CACHE_TIMEOUT.
+    local : bool
+        Also keep the value in the in-process cache (dados.localcache) for
+        LOCAL_CACHE_TIMEOUT seconds, for small and hot lookups. The value
+        is shared by the requests of the process and must not be mutated.
+
+    Returns
+    -------
+    Any
+        The cached or computed value.
+    """
+    if local:
+        res = local_cache.get(cache_key, _CACHE_MISS)
+        if res is not _CACHE_MISS:
+            cache_stats()["hits"] += 1
+            return res
+        res = cache_get_or_set(cache_key, compute, timeout)
+        local_cache.set(cache_key, res)
+        return res
+
+    res = cache.get(cache_key, _CACHE_MISS)
+    if res is not _CACHE_MISS:
+        cache_stats()["hits"] += 1
+        return res
+
+    cache_stats()["misses"] += 1
+    if timeout is None:
+        timeout = settings.QUERY_CACHE_TIMEOUT
+
+    lock_key = f"{cache_key}:lock"
+    lock_timeout = settings.QUERY_CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + lock_timeout
+    locked = cache.add(lock_key, 1, lock_timeout)
+
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.1)
+        res = cache.get(cache_key, _CACHE_MISS)
+        if res is not _CACHE_MISS:
+            return res
+        locked = cache.add(lock_key, 1, lock_timeout)
+
+    if not locked:
+        logger.warning("Timeout waiting for the cache key: %s", cache_key)
+
+    try:
+        res = cache.get(cache_key, _CACHE_MISS)
+        if res is _CACHE_MISS:
+            res = compute()
+            cache.set(cache_key, res, timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return res
+
+
 def data_hist_uf(state_abbv: str, disease: str = "dengue") -> pd.DataFrame:
     """
     PostgreSQLTable[table]
@@ -100,25 +198,17 @@ def data_hist_uf(state_abbv: str, disease: str = "dengue") -> pd.DataFrame:
 
     cache_name = "data_hist" + "_" + str(state_abbv) + "_" + str(disease)
 
-    res = cache.get(cache_name)
-
-    if res is None:
+    def _data_hist_uf() -> pd.DataFrame:
         _disease = get_disease_suffix(disease, empty_for_dengue=False)
         table_hist_uf = IBIS_CONN.table(f"hist_uf{_disease}_materialized_view")
 
-        res = (
+        return (
             table_hist_uf[table_hist_uf.state_abbv == state_abbv]
             .order_by("SE")
             .execute()
         )
 
-        cache.set(
-            cache_name,
-            res,
-            settings.QUERY_CACHE_TIMEOUT,
-        )
-
-    return res
+    return cache_get_or_set(versioned_key(cache_name, disease), _data_hist_uf)
 
 
 class RegionalParameters:
@@ -150,11 +240,8 @@ class RegionalParameters:
         cache_name = (
             "regional_names_to" + "_" + str(state_name).replace(" ", "_")
         )
-        res = cache.get(cache_name)
-
-        if res is None:
-            # print(f"add cache_name {cache_name}: ", res)
 
+        def _regional_names() -> list:
             municipio_uf_filter = cls.t_municipio[
                 cls.t_municipio.uf == state_name
             ]
@@ -163,15 +250,9 @@ class RegionalParameters:
             )[cls.t_regional.nome].distinct()
             df_regional_names = t_joined.execute()
 
-            res = df_regional_names["nome"].to_list()
+            return df_regional_names["nome"].to_list()
 
-            cache.set(
-                cache_name,
-                res,
-                settings.QUERY_CACHE_TIMEOUT,
-            )
-
-        return res
+        return cache_get_or_set(cache_name, _regional_names, local=True)
 
     @classmethod
     def get_var_climate_info(cls, geocodes: list) -> Tuple[str]:
@@ -204,23 +285,14 @@ class RegionalParameters:
         Returns
         ----------
         """
-        cities_by_region = {}
-
         if regional_name is not None and state_name is not None:
             cache_name = (
                 str(regional_name).replace(" ", "_")
                 + "_"
                 + str(state_name).replace(" ", "_")
             )
-            # print('cache_name: ', cache_name)
-            res = cache.get(cache_name)
 
-            if res:
-                # print(f'cache_name {cache_name} found: ', res)
-                return res
-
-            else:
-                # print(f'Add new cache_name: {cache_name}')
+            def _cities() -> dict:
                 municipio_proj = cls.t_municipio[
                     "geocodigo", "nome", "uf", "id_regional"
                 ]
@@ -241,36 +313,20 @@ class RegionalParameters:
                     .execute()
                 )
 
-                for row in cities_expr.to_dict(orient="records"):
-                    cities_by_region[row["geocodigo"]] = row["nome"]
-
-                res = cities_by_region
-
-                cache.set(
-                    cache_name,
-                    res,
-                    settings.QUERY_CACHE_TIMEOUT,
-                )
-
-                return res
+                return {
+                    row["geocodigo"]: row["nome"]
+                    for row in cities_expr.to_dict(orient="records")
+                }
 
         else:
             cache_name = (
                 "all_cities_from" + "_" + str(state_name).replace(" ", "_")
             )
-            res = cache.get(cache_name)
-            if res:
-                # print(f'Fetch {cache_name}', res)
-                return res
-            else:
-                # print(f'Add cache_name {cache_name}')
-                if state_name is None:
-                    state_names = [f"{state_name}"]
-
-                else:
-                    state_names = [f"{state_name}"]
 
-                t_municipio_uf_expr = cls.t_municipio.uf.isin(state_names)
+            def _cities() -> dict:
+                t_municipio_uf_expr = cls.t_municipio.uf.isin(
+                    [f"{state_name}"]
+                )
 
                 cities_expr = (
                     cls.t_municipio[t_municipio_uf_expr]["geocodigo", "nome"]
@@ -278,18 +334,12 @@ class RegionalParameters:
                     .execute()
                 )
 
-                for row in cities_expr.to_dict(orient="records"):
-                    cities_by_region[row["geocodigo"]] = row["nome"]
-
-                res = cities_by_region
-
-                cache.set(
-                    cache_name,
-                    res,
-                    settings.QUERY_CACHE_TIMEOUT,
-                )
+                return {
+                    row["geocodigo"]: row["nome"]
+                    for row in cities_expr.to_dict(orient="records")
+                }
 
-                return res
+        return cache_get_or_set(cache_name, _cities, local=True)
 
     @classmethod
     def get_station_data(cls, geocode: int, disease: str) -> pd:
@@ -372,6 +422,61 @@ def get_disease_suffix(disease: str, empty_for_dengue: bool = True):
     )
 
 
+def latest_alert_date(
+    disease: str, db_engine: Engine = DB_ENGINE
+) -> Optional[date]:
+    """
+    Latest `data_iniSE` of the Historico_alerta table of the disease.
+    """
+    table_name = "Historico_alerta" + get_disease_suffix(disease)
+    with db_engine.connect() as conn:
+        return conn.execute(
+            f'SELECT MAX("data_iniSE") FROM "Municipio"."{table_name}"'
+        ).scalar()
+
+
+def cached_latest_alert_date(disease: str) -> Optional[date]:
+    """
+    latest_alert_date, cached until the next alert snapshots task run
+    (dados.tasks.precompute_alert_snapshots calls renew_data_version), plus
+    up to LOCAL_CACHE_TIMEOUT seconds in each of the other processes.
+    """
+    return cache_get_or_set(
+        f"latest_alert_date_{disease}",
+        lambda: latest_alert_date(disease),
+        local=True,
+    )
+
+
+def renew_data_version(disease: str) -> None:
+    """
+    Forgets the cached latest alert date of the disease, in the Django cache
+    and in the local cache of this process, so the next data_version reads
+    it from the database. The other processes read it again within
+    LOCAL_CACHE_TIMEOUT seconds.
+    """
+    cache.delete(f"latest_alert_date_{disease}")
+    local_cache.delete(f"latest_alert_date_{disease}")
+
+
+def data_version(disease: str) -> str:
+    """
+    Token of the alert data of the disease: the date of its latest alert,
+    which changes when the alerts of a new week are published.
+    """
+    latest = cached_latest_alert_date(disease)
+    return "none" if latest is None else latest.strftime("%Y%m%d")
+
+
+def versioned_key(cache_key: str, disease: str) -> str:
+    """
+    Namespaces a cache key that depends on the alerts of the disease by
+    data_version. A new publication only changes the keys of its disease,
+    the keys of the previous version are never read again and expire.
+    """
+    return f"{cache_key}@{data_version(disease)}"
+
+
 # TODO: check if this works and is necessary
 
 '''
@@ -421,11 +526,8 @@ def get_all_active_cities_state(
     List[Tuple[str, str, str, str]]
         A list of tuples containing municipality geocode, start date, city name, and state.
     """
-    # Check if the result is cached
-    res = cache.get("get_all_active_cities_state")
 
-    if res is None:
-        # If not cached, fetch the data from the database
+    def _active_cities_state() -> list:
         with db_engine.connect() as conn:
             res = conn.execute(
                 """
@@ -444,14 +546,13 @@ def get_all_active_cities_state(
                 ORDER BY hist."data_iniSE";
                 """
             )
-            res = res.fetchall()
-            # Cache the result with a timeout
-            cache.set(
-                "get_all_active_cities_state",
-                res,
-                settings.QUERY_CACHE_TIMEOUT,
-            )
-    return res
+            return res.fetchall()
+
+    return cache_get_or_set(
+        versioned_key("get_all_active_cities_state", "dengue"),
+        _active_cities_state,
+        local=True,
+    )
 
 
 def get_last_alert(geo_id, disease, db_engine: Engine = DB_ENGINE):
@@ -487,119 +588,271 @@ def get_last_alert(geo_id, disease, db_engine: Engine = DB_ENGINE):
         return pd.read_sql_query(sql, conn)
 
 
-def load_series(
-    cidade,
+def _load_series_cache_key(cidade, disease: str, epiweek, version: str) -> str:
+    # the series depend on the forecast epiweek (None: without forecasts)
+    # and on the data_version of the disease
+    epiweek = "none" if epiweek is None else int(epiweek)
+    return "load_series-{}-{}-{}@{}".format(cidade, disease, epiweek, version)
+
+
+def _series_from_cases(dados_alerta: pd.DataFrame) -> dict:
+    """
+    Builds the series of a city (as returned by load_series) from its
+    alert rows, joined with the forecast columns if any.
+    """
+    series = defaultdict(lambda: [])
+
+    series["dia"] = dados_alerta.data_iniSE.tolist()
+    series["casos_est_min"] = _nan_to_num_int_list(dados_alerta.casos_est_min)
+    series["casos_est"] = _nan_to_num_int_list(dados_alerta.casos_est)
+    series["casos_est_max"] = _nan_to_num_int_list(dados_alerta.casos_est_max)
+    series["casos"] = _nan_to_num_int_list(dados_alerta.casos)
+    # (1,4)->(0,3)
+    series["alerta"] = (dados_alerta.nivel.fillna(1).astype(int) - 1).tolist()
+    series["SE"] = (dados_alerta.SE.astype(int)).tolist()
+    series["prt1"] = dados_alerta.p_rt1.astype(float).tolist()
+
+    for k in dados_alerta.keys():
+        if k.startswith("forecast_"):
+            series[k] = dados_alerta[k].astype(float).tolist()
+
+    return dict(series)
+
+
+def _join_forecasts(
+    alerts: pd.DataFrame, forecasts: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Pandas version of the FULL OUTER JOINs of the old Forecast.load_cases
+    (dados/tests/legacy.py): one `forecast_<model>_cases` column per model,
+    in model id order, matched by epiweek, with the forecast weeks after
+    the last alert appended.
+    """
+    cases = alerts.astype({"SE": "Int64"})
+    for _, model in forecasts.groupby("forecast_model_id", sort=True):
+        column = f"forecast_{model.forecast_model_name.iloc[0]}_cases".lower()
+        model = model.dropna(subset=["epiweek"]).rename(
+            columns={
+                "epiweek": "SE",
+                "init_date_epiweek": "_init_date_epiweek",
+                "cases": column,
+            }
+        )
+        model["SE"] = model["SE"].astype("Int64")
+        cases = cases.merge(
+            model[["SE", "_init_date_epiweek", column]], on="SE", how="outer"
+        )
+        cases["data_iniSE"] = cases["data_iniSE"].fillna(
+            cases.pop("_init_date_epiweek")
+        )
+    return cases.sort_values(
+        "data_iniSE", kind="stable", na_position="last"
+    ).reset_index(drop=True)
+
+
+def load_series_many(
+    geocodes: List[int],
     disease: str = "dengue",
-    epiweek: int = 0,
+    epiweek: Optional[int] = 0,
     db_engine: Engine = DB_ENGINE,
-):
+) -> dict:
     """
-    Loads the alert series for visualization on the website.
+    Loads the alert series of several cities, with one query for the alerts
+    and one for the forecasts of all the cities not found in the cache.
+    The series are cached per city (and forecast epiweek), under the same
+    keys as load_series.
 
     Parameters
     ----------
-    cidade : int
-        The city code for which to retrieve the alert series.
+    geocodes : List[int]
+        The city codes for which to retrieve the alert series.
     disease : str, optional
-        The disease code (CID10) for which to retrieve the alert series. Defaults to "dengue".
+        The disease for which to retrieve the alert series.
+        Defaults to "dengue".
     epiweek: int, optional
-        The epidemiological week for which to retrieve the alert series. Defaults to 0.
+        The forecast epidemiological week, None for the series without
+        forecasts. Defaults to 0.
     db_engine : Engine, optional
         The database engine to use for the query. Defaults to DB_ENGINE.
 
     Returns
     -------
     dictionary
-        The alert series data.
+        The alert series data by geocode (str), None for cities without data.
     """
+    version = data_version(disease)
+    keys = {
+        str(geocode): _load_series_cache_key(
+            geocode, disease, epiweek, version
+        )
+        for geocode in geocodes
+    }
+    cached = cache.get_many(list(keys.values()))
 
-    cache_key = "load_series-{}-{}".format(cidade, disease)
-    result = cache.get(cache_key)
-
-    if result is None:
-        ap = str(cidade)
-
-        if epiweek is not None:
-            dados_alerta = Forecast.load_cases(
-                geocode=cidade, disease=disease, epiweek=epiweek
-            )
+    result = {}
+    missing = []
+    for geocode, key in keys.items():
+        if key in cached:
+            result.update(cached[key])
         else:
-            dados_alerta = load_cases_without_forecast(
-                geocode=cidade, disease=disease
-            )
-
-        if len(dados_alerta) == 0:
-            return {ap: None}
-
-        series = defaultdict(lambda: defaultdict(lambda: []))
-
-        series[ap]["dia"] = dados_alerta.data_iniSE.tolist()
+            missing.append(int(geocode))
+    cache_stats().update(hits=len(result), misses=len(missing))
 
-        series[ap]["casos_est_min"] = _nan_to_num_int_list(
-            dados_alerta.casos_est_min
+    if missing:
+        loaded = _load_series_uncached(missing, disease, epiweek, db_engine)
+        cache.set_many(
+            {keys[ap]: {ap: series} for ap, series in loaded.items()},
+            settings.QUERY_CACHE_TIMEOUT,
         )
+        result.update(loaded)
 
-        series[ap]["casos_est"] = _nan_to_num_int_list(dados_alerta.casos_est)
-
-        series[ap]["casos_est_max"] = _nan_to_num_int_list(
-            dados_alerta.casos_est_max
-        )
+    return result
 
-        series[ap]["casos"] = _nan_to_num_int_list(dados_alerta.casos)
-        # (1,4)->(0,3)
-        series[ap]["alerta"] = (
-            dados_alerta.nivel.fillna(1).astype(int) - 1
-        ).tolist()
-        series[ap]["SE"] = (dados_alerta.SE.astype(int)).tolist()
-        series[ap]["prt1"] = dados_alerta.p_rt1.astype(float).tolist()
 
-        k_forecast = [
-            k for k in dados_alerta.keys() if k.startswith("forecast_")
-        ]
+def _load_series_uncached(
+    geocodes: List[int],
+    disease: str,
+    epiweek: Optional[int],
+    db_engine: Engine,
+) -> dict:
+    table_name = "Historico_alerta" + get_disease_suffix(disease)
+    sql_alert = f"""
+    SELECT
+        municipio_geocodigo, "data_iniSE", casos_est_min, casos_est,
+        casos_est_max, casos, nivel, "SE", p_rt1
+    FROM "Municipio"."{table_name}"
+    WHERE municipio_geocodigo = ANY(:geocodes)
+    ORDER BY municipio_geocodigo, "data_iniSE" ASC
+    """
 
-        if k_forecast:
-            for k in k_forecast:
-                series[ap][k] = dados_alerta[k].astype(float).tolist()
+    # Latest forecast published for the epiweek, by city and model; the
+    # models without active cases still get their (empty) column
+    sql_forecast = """
+    WITH latest AS (
+        SELECT DISTINCT ON (geocode, forecast_model_id)
+            geocode, forecast_model_id, published_date
+        FROM forecast.forecast_cases
+        WHERE
+            cid10 = :cid10
+            AND geocode = ANY(:geocodes)
+            AND epiweek = :epiweek
+        ORDER BY geocode, forecast_model_id, published_date DESC
+    )
+    SELECT
+        latest.geocode,
+        latest.forecast_model_id,
+        forecast_model.name AS forecast_model_name,
+        active_cases.epiweek,
+        active_cases.init_date_epiweek,
+        active_cases.cases
+    FROM latest
+    INNER JOIN forecast.forecast_model
+        ON (forecast_model.id = latest.forecast_model_id)
+    LEFT JOIN (
+        SELECT
+            forecast_cases.geocode,
+            forecast_cases.forecast_model_id,
+            forecast_cases.published_date,
+            forecast_cases.epiweek,
+            forecast_cases.init_date_epiweek,
+            forecast_cases.cases
+        FROM
+            forecast.forecast_cases
+            INNER JOIN forecast.forecast_model
+              ON (
+                forecast_cases.forecast_model_id = forecast_model.id
+                AND forecast_model.active=TRUE
+              )
+            INNER JOIN forecast.forecast_city
+              ON (
+                forecast_city.geocode = forecast_cases.geocode
+                AND forecast_cases.forecast_model_id =
+                  forecast_city.forecast_model_id
+                AND forecast_city.active=TRUE
+              )
+        WHERE
+            cid10 = :cid10
+            AND forecast_cases.geocode = ANY(:geocodes)
+    ) AS active_cases ON (
+        active_cases.geocode = latest.geocode
+        AND active_cases.forecast_model_id = latest.forecast_model_id
+        AND active_cases.published_date = latest.published_date
+    )
+    """
 
-        series[ap] = dict(series[ap])
+    with db_engine.connect() as conn:
+        query = conn.execute(text(sql_alert), {"geocodes": geocodes})
+        alerts = pd.DataFrame(query.fetchall(), columns=query.keys())
 
-        result = dict(series)
-        cache.set(cache_key, result, settings.QUERY_CACHE_TIMEOUT)
+        if epiweek is not None:
+            query = conn.execute(
+                text(sql_forecast),
+                {
+                    "cid10": CID10[disease],
+                    "geocodes": geocodes,
+                    "epiweek": epiweek,
+                },
+            )
+            forecasts = pd.DataFrame(query.fetchall(), columns=query.keys())
+        else:
+            alerts["data_iniSE"] = pd.to_datetime(alerts["data_iniSE"])
+            forecasts = pd.DataFrame(columns=["geocode", "forecast_model_id"])
+
+    alerts_by_city = dict(tuple(alerts.groupby("municipio_geocodigo")))
+    forecasts_by_city = dict(tuple(forecasts.groupby("geocode")))
+
+    result = {}
+    for geocode in geocodes:
+        dados_alerta = alerts_by_city.get(geocode, alerts.iloc[:0])
+        dados_alerta = dados_alerta.drop(columns="municipio_geocodigo")
+        if geocode in forecasts_by_city:
+            dados_alerta = _join_forecasts(
+                dados_alerta, forecasts_by_city[geocode]
+            )
 
+        result[str(geocode)] = (
+            _series_from_cases(dados_alerta.reset_index(drop=True))
+            if len(dados_alerta)
+            else None
+        )
     return result
 
 
-def load_cases_without_forecast(
-    geocode: int, disease, db_engine: Engine = DB_ENGINE
+def load_series(
+    cidade,
+    disease: str = "dengue",
+    epiweek: int = 0,
+    db_engine: Engine = DB_ENGINE,
 ):
     """
+    Loads the alert series for visualization on the website.
+
     Parameters
     ----------
-    geocode : int
-        The geocode for which to retrieve forecast dates.
-    disease : str
-        The disease code (CID10) for which to retrieve forecast dates.
-    db_engine : Engine
-        The database engine to use for the query.
-    """
-
-    with db_engine.connect() as conn:
-        table_name = "Historico_alerta" + get_disease_suffix(disease)
-
-        result = conn.execute(
-            f"""
-            SELECT * FROM "Municipio"."{table_name}"
-            WHERE municipio_geocodigo={geocode} ORDER BY "data_iniSE" ASC
-            """
-        )
-
-        data_alert = pd.DataFrame(result.fetchall(), columns=result.keys())
-
-        # Convert relevant columns to datetime
-        data_alert["data_iniSE"] = pd.to_datetime(data_alert["data_iniSE"])
-        # Add more columns if needed
+    cidade : int
+        The city code for which to retrieve the alert series.
+    disease : str, optional
+        The disease code (CID10) for which to retrieve the alert series. Defaults to "dengue".
+    epiweek: int, optional
+        The epidemiological week for which to retrieve the alert series. Defaults to 0.
+    db_engine : Engine, optional
+        The database engine to use for the query. Defaults to DB_ENGINE.
 
-    return data_alert
+    Returns
+    -------
+    dictionary
+        The alert series data.
+    """
+    ap = str(cidade)
+    version = data_version(disease)
+    return cache_get_or_set(
+        _load_series_cache_key(cidade, disease, epiweek, version),
+        lambda: {
+            ap: _load_series_uncached(
+                [int(cidade)], disease, epiweek, db_engine
+            )[ap]
+        },
+    )
 
 
 def get_city_alert(cidade, disease="dengue"):
@@ -611,8 +864,14 @@ def get_city_alert(cidade, disease="dengue"):
         obs_case_series, min_max_est, dia, prt1
     """
     series = load_series(cidade, disease)
-    series_city = series[str(cidade)]
+    return city_alert_from_series(series[str(cidade)])
+
 
+def city_alert_from_series(series_city: Optional[dict]) -> tuple:
+    """
+    Indicadores de alerta de get_city_alert a partir da série da cidade
+    (load_series).
+    """
     if series_city is None:
         return ([], None, [0], 0, [0], [0, 0], datetime.now(), 0)
 
@@ -661,6 +920,95 @@ def calculate_digit(dig):
     return dv
 
 
+def calculate_digits(geocodigos: np.ndarray) -> np.ndarray:
+    """
+    Calcula o digito verificador de um array de geocódigos de município
+    :param geocodigos: array de geocódigos com 6 dígitos
+    :return: array de dígitos verificadores
+    """
+    geocodigos = np.asarray(geocodigos, dtype=np.int64)
+    digitos = (geocodigos[:, None] // 10 ** np.arange(5, -1, -1)) % 10
+    valor = digitos * np.array([1, 2, 1, 2, 1, 2])
+    # valor <= 18, somar os seus dígitos é o mesmo que subtrair 9
+    soma = np.where(valor > 9, valor - 9, valor).sum(axis=1)
+    return (10 - soma % 10) % 10
+
+
+def to_nullable_int(values: pd.Series) -> np.ndarray:
+    """
+    Returns an int64 array, or an object array with None in place of the
+    missing values, as np.vectorize would
+    """
+    if values.isna().any():
+        return values.to_numpy(dtype=object, na_value=None)
+    return values.to_numpy(dtype=np.int64)
+
+
+def fix_nu_notif(value: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    """
+    Formats NU_NOTIF field values, removing the "," "'" and "." characters.
+    Parameters
+    ----------
+        value: Union[pd.Series, np.ndarray]
+            Values of NU_NOTIF field.
+    Returns
+    -------
+        np.ndarray: Formatted NU_NOTIF field values, None for the values
+        that can't be converted to int.
+    """
+    values = pd.Series(value, copy=False)
+
+    if pd.api.types.is_numeric_dtype(values):
+        return to_nullable_int(
+            np.trunc(values.astype("float64")).astype("Int64")
+        )
+
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        is_str = values.notna()
+    else:
+        is_str = values.map(type, na_action="ignore") == str
+    cleaned = (
+        values.where(is_str)
+        .astype("string")
+        .str.replace(r"[,'.]", "", regex=True)
+        .str.strip()
+    )
+    is_int = cleaned.str.fullmatch(r"[+-]?\d+").fillna(False)
+    result = pd.to_numeric(cleaned.where(is_int), errors="coerce")
+
+    # Non string values, such as ints mixed in an object column
+    others = values.notna() & ~is_str
+    if others.any():
+        result[others] = np.trunc(pd.to_numeric(values[others]))
+
+    invalid = values.notna() & result.isna()
+    if invalid.any():
+        logger.error(
+            f"Invalid NU_NOTIF values ({invalid.sum()}): "
+            f"{list(values[invalid].unique()[:10])}"
+        )
+
+    return to_nullable_int(result.astype("Int64"))
+
+
+def to_datetime(col: pd.Series, errors: str = "coerce") -> pd.Series:
+    """
+    Parses a whole column to datetime at once. The values that don't match
+    the format inferred for the column are parsed again one by one, so mixed
+    formats are handled as per-value `pd.to_datetime` calls would
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+
+    dates = pd.to_datetime(col, errors="coerce")
+    retry = dates.isna() & col.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(
+            col[retry].astype(str), errors=errors, format="mixed"
+        )
+    return dates
+
+
 @np.vectorize
 def add_dv(geocodigo):
     """
@@ -693,6 +1041,26 @@ def add_dv(geocodigo):
     raise ValueError("geocode does not match!")
 
 
+def to_copy_buffer(df: pd.DataFrame) -> io.StringIO:
+    """
+    Writes the dataframe as CSV into an in-memory buffer for COPY, using \\N
+    as NULL so empty strings are kept as empty strings. The float columns
+    with integral values (int columns with nulls) are written as integers
+    """
+    df = df.copy()
+    for col in df.columns:
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred in ("floating", "mixed-integer-float"):
+            values = pd.to_numeric(df[col])
+            if (values.dropna() == values.dropna().round()).all():
+                # 1.0 is not a valid INTEGER literal for COPY
+                df[col] = values.astype("Int64")
+    buffer = io.StringIO()
+    df.to_csv(buffer, header=False, index=False, na_rep="\\N")
+    buffer.seek(0)
+    return buffer
+
+
 def get_epiyears(
     state_name: str,
     disease: Optional[str] = None,
@@ -778,14 +1146,20 @@ class NotificationResume:
 
         cache_key = (
             f"cities_alert_{slugify(state_name, allow_unicode=True)}_{disease}"
+            f"_{epi_year_week}"
+        )
+        return cache_get_or_set(
+            versioned_key(cache_key, disease),
+            lambda: NotificationResume._get_cities_alert_by_state(
+                state_name, _disease, db_engine, epi_year_week
+            ),
         )
-        cities_alert = cache.get(cache_key)
-
-        if cities_alert is not None:
-            logger.info("Cache found for key: %s", cache_key)
-            return cities_alert
 
-        logger.info("Cache NOT found for key: %s", cache_key)
+    @staticmethod
+    def _get_cities_alert_by_state(
+        state_name, _disease, db_engine: Engine, epi_year_week: int = None
+    ):
+        logger.info("Loading cities alert: %s%s", state_name, _disease)
 
         sql = """
         SELECT
@@ -833,12 +1207,7 @@ class NotificationResume:
 
         with db_engine.connect() as conn:
             result = conn.execute(sql, "id", parse_dates=True)
-            cities_alert = pd.DataFrame(result.fetchall())
-
-        cache.set(cache_key, cities_alert, settings.QUERY_CACHE_TIMEOUT)
-        logger.info("Cache set for key: %s", cache_key)
-
-        return cities_alert
+            return pd.DataFrame(result.fetchall())
 
     @staticmethod
     def tail_estimated_cases(geo_ids, n=12, db_engine: Engine = DB_ENGINE):
@@ -851,34 +1220,39 @@ class NotificationResume:
         if len(geo_ids) < 1:
             raise Exception("GEO id list should have at least 1 code.")
 
-        sql_template = (
-            """(
-        SELECT
-            municipio_geocodigo, "data_iniSE", casos_est
-        FROM
-            "Municipio".historico_casos
-        WHERE
-            municipio_geocodigo={}
-        ORDER BY
-            "data_iniSE" DESC
-        LIMIT """
-            + str(n)
-            + ")"
+        # the n latest weeks of each city, in a single scan of the table
+        sql = text(
+            """
+            SELECT municipio_geocodigo, "data_iniSE", casos_est
+            FROM (
+                SELECT
+                    municipio_geocodigo,
+                    "data_iniSE",
+                    casos_est,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY municipio_geocodigo
+                        ORDER BY "data_iniSE" DESC
+                    ) AS week_rank
+                FROM "Municipio".historico_casos
+                WHERE municipio_geocodigo = ANY(:geo_ids)
+            ) AS ranked
+            WHERE week_rank <= :n
+            ORDER BY municipio_geocodigo, "data_iniSE"
+            """
         )
 
-        sql = " UNION ".join([sql_template.format(gid) for gid in geo_ids])
-
-        if len(geo_ids) > 1:
-            sql += ' ORDER BY municipio_geocodigo, "data_iniSE"'
-
         with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            df_case_series = pd.DataFrame(result.fetchall())
+            result = conn.execute(
+                sql, {"geo_ids": [int(gid) for gid in geo_ids], "n": int(n)}
+            )
+            df_case_series = pd.DataFrame(
+                result.fetchall(), columns=result.keys()
+            )
 
-            return {
-                k: v.casos_est.values.tolist()
-                for k, v in df_case_series.groupby(by="municipio_geocodigo")
-            }
+        return {
+            k: v.casos_est.values.tolist()
+            for k, v in df_case_series.groupby(by="municipio_geocodigo")
+        }
 
 
 class Forecast:
@@ -923,174 +1297,6 @@ class Forecast:
 
         return values[0], values[1]
 
-    @staticmethod
-    def load_cases(
-        geocode: int, disease: str, epiweek: int, db_engine: Engine = DB_ENGINE
-    ):
-        """
-        :param geocode:
-        :param disease:
-        :param epiweek:
-        :return:
-        """
-
-        # sql settings
-        cid10 = CID10[disease]
-
-        sql = """
-        SELECT DISTINCT ON (forecast_cases.forecast_model_id)
-        forecast_cases.forecast_model_id,
-        forecast_model.name AS forecast_model_name,
-        forecast_cases.published_date
-        FROM
-        forecast.forecast_cases
-        INNER JOIN forecast.forecast_model
-            ON (
-            forecast_cases.forecast_model_id =
-            forecast_model.id
-            )
-        WHERE
-        cid10 = %s
-        AND geocode = %s
-        AND epiweek = %s
-        ORDER BY forecast_model_id, published_date DESC
-        """
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql, (cid10, geocode, epiweek))
-            df_forecast_model = pd.DataFrame(
-                result.fetchall(), columns=result.keys()
-            )
-
-        # return df_forecast_model
-
-        table_name = "Historico_alerta" + get_disease_suffix(disease)
-
-        sql_alert = """
-        SELECT * FROM "Municipio"."{}"
-        WHERE municipio_geocodigo={} ORDER BY "data_iniSE" ASC
-        """.format(
-            table_name, geocode
-        )
-
-        sql = """
-        SELECT
-            (CASE
-             WHEN tb_cases."data_iniSE" IS NOT NULL
-               THEN tb_cases."data_iniSE"
-             %(forecast_date_ini_epiweek)s
-             ELSE NULL
-             END
-            ) AS "data_iniSE",
-            tb_cases.casos_est_min,
-            tb_cases.casos_est,
-            tb_cases.casos_est_max,
-            tb_cases.casos,
-            tb_cases.nivel,
-            (CASE
-             WHEN tb_cases."SE" IS NOT NULL THEN tb_cases."SE"
-             %(forecast_epiweek)s
-             ELSE NULL
-             END
-            ) AS "SE",
-            tb_cases.p_rt1
-            %(forecast_models_cases)s
-        FROM
-            (%(sql_alert)s) AS tb_cases %(forecast_models_joins)s
-        ORDER BY "data_iniSE" ASC
-        """
-
-        sql_forecast_by_model = """
-        FULL OUTER JOIN (
-          SELECT
-            epiweek,
-            init_date_epiweek,
-            cases AS forecast_%(model_name)s_cases
-          FROM
-            forecast.forecast_cases
-            INNER JOIN forecast.forecast_model
-              ON (
-                forecast_cases.forecast_model_id = forecast_model.id
-                AND forecast_model.active=TRUE
-              )
-            INNER JOIN forecast.forecast_city
-              ON (
-                forecast_city.geocode = forecast_cases.geocode
-                AND forecast_cases.forecast_model_id =
-                  forecast_city.forecast_model_id
-                AND forecast_city.active=TRUE
-              )
-          WHERE
-            cid10='%(cid10)s'
-            AND forecast_cases.geocode=%(geocode)s
-            AND published_date='%(published_date)s'
-            AND forecast_cases.forecast_model_id=%(model_id)s
-        ) AS forecast%(model_id)s ON (
-          tb_cases."SE" = forecast%(model_id)s.epiweek
-        )
-        """
-
-        forecast_date_ini_epiweek = ""
-        forecast_models_cases = ""
-        forecast_models_joins = ""
-        forecast_epiweek = ""
-        forecast_config = {
-            "geocode": geocode,
-            "cid10": cid10,
-            "published_date": None,
-            "model_name": None,
-            "model_id": None,
-        }
-
-        for i, row in df_forecast_model.iterrows():
-            forecast_config.update(
-                {
-                    "published_date": row.published_date,
-                    "model_name": row.forecast_model_name,
-                    "model_id": row.forecast_model_id,
-                }
-            )
-            # forecast models join sql
-            forecast_models_joins += sql_forecast_by_model % forecast_config
-
-            # forecast date ini selection
-            forecast_date_ini_epiweek += (
-                """
-            WHEN forecast%(model_id)s.init_date_epiweek IS NOT NULL
-               THEN forecast%(model_id)s.init_date_epiweek
-            """
-                % forecast_config
-            )
-
-            # forecast epiweek selection
-            forecast_epiweek += (
-                """
-            WHEN forecast%(model_id)s.epiweek IS NOT NULL
-               THEN forecast%(model_id)s.epiweek
-            """
-                % forecast_config
-            )
-
-            # forecast models cases selection
-            forecast_models_cases += (
-                ",forecast_%(model_name)s_cases" % forecast_config
-            )
-
-        if forecast_models_cases == "":
-            forecast_models_cases = ",1"
-
-        sql = sql % {
-            "forecast_models_joins": forecast_models_joins,
-            "forecast_models_cases": forecast_models_cases,
-            "forecast_date_ini_epiweek": forecast_date_ini_epiweek,
-            "forecast_epiweek": forecast_epiweek,
-            "sql_alert": sql_alert,
-        }
-
-        with db_engine.connect() as conn:
-            result = conn.execute(sql)
-            return pd.DataFrame(result.fetchall(), columns=result.keys())
-
 
 class ReportCity:
     @classmethod
@@ -1187,9 +1393,8 @@ class ReportState:
         # TODO: Export CSV to JSON file: see #
 
         cache_name = "regional_by_state_" + "_" + str(state)
-        res = cache.get(cache_name)
 
-        if res is None:
+        def _regional_by_state() -> pd.DataFrame:
             uf_name = ALL_STATE_NAMES[state][0]
 
             data = City.objects.filter(state=uf_name)
@@ -1198,22 +1403,15 @@ class ReportState:
                 list(data.values("id_regional", "regional", "geocode", "name"))
             )
 
-            res.rename(
+            return res.rename(
                 columns={
                     "regional": "nome_regional",
                     "geocode": "municipio_geocodigo",
                     "name": "municipio_nome",
                 },
-                inplace=True,
-            )
-
-            cache.set(
-                cache_name,
-                res,
-                settings.QUERY_CACHE_TIMEOUT,
             )
 
-        return res
+        return cache_get_or_set(cache_name, _regional_by_state, local=True)
 
     @classmethod
     def create_report_state_data(cls, geocodes, disease, year_week):
@@ -0,0 +1,135 @@
+"""
+Index of the Brazilian epidemiological calendar.
+
+The epiweeks run from Sunday to Saturday, and the first epiweek of a year
+is the one with at least four days in January. The calendar of the epiyears
+EPIYEAR_MIN to EPIYEAR_MAX is built once, at import, in two small arrays:
+
+    EPIYEAR_STARTS   Sunday of the first epiweek of each epiyear
+    WEEK_YEARWEEKS   epiweek (YYYYWW) of each week since the first Sunday
+
+A day is mapped to its epiweek in O(1): its week since the first Sunday,
+`(day - FIRST_SUNDAY) // 7`, indexes WEEK_YEARWEEKS; an epiweek is mapped
+back to its Sunday through EPIYEAR_STARTS. The arrays take about 64 KiB.
+"""
+import datetime
+
+import numpy as np
+
+EPIYEAR_MIN = 1900
+EPIYEAR_MAX = 2200
+
+# a Sunday, to get the weekday of datetime64[D] values
+_SUNDAY = np.datetime64("1970-01-04", "D")
+
+
+def epiyear_starts(years: np.ndarray) -> np.ndarray:
+    """
+    Sunday of the first epiweek of each year: the Sunday of the week of
+    January 1st if it is between Sunday and Wednesday, the next Sunday
+    otherwise.
+    """
+    jan_1 = (
+        (np.asarray(years) - 1970)
+        .astype("datetime64[Y]")
+        .astype("datetime64[D]")
+    )
+    day_week = (jan_1 - _SUNDAY).astype(np.int64) % 7
+    return jan_1 - day_week + np.where(day_week < 4, 0, 7)
+
+
+# one more year is kept as the end of the last one
+EPIYEAR_STARTS = epiyear_starts(np.arange(EPIYEAR_MIN, EPIYEAR_MAX + 2))
+FIRST_SUNDAY = EPIYEAR_STARTS[0]
+
+
+def _week_yearweeks() -> np.ndarray:
+    weeks_by_year = np.diff(EPIYEAR_STARTS).astype(np.int64) // 7
+    first_week = np.repeat(
+        np.cumsum(weeks_by_year) - weeks_by_year, weeks_by_year
+    )
+    epiyears = np.repeat(
+        np.arange(EPIYEAR_MIN, EPIYEAR_MAX + 1), weeks_by_year
+    )
+    epiweeks = np.arange(weeks_by_year.sum()) - first_week + 1
+    return (epiyears * 100 + epiweeks).astype(np.int32)
+
+
+WEEK_YEARWEEKS = _week_yearweeks()
+
+# the same, as lists, for the scalar functions (indexing a list is faster
+# than indexing an array with a Python int)
+_FIRST_SUNDAY_ORDINAL = FIRST_SUNDAY.astype(datetime.date).toordinal()
+_WEEK_YEARWEEKS = WEEK_YEARWEEKS.tolist()
+_EPIYEAR_START_ORDINALS = [
+    day.toordinal() for day in EPIYEAR_STARTS.astype(datetime.date)
+]
+
+
+def _out_of_range() -> ValueError:
+    return ValueError(f"Out of the epiyears {EPIYEAR_MIN}-{EPIYEAR_MAX}.")
+
+
+def in_calendar(days: np.ndarray) -> np.ndarray:
+    """
+    Whether datetime64[D] days are in the epiyears of the calendar (NaT is
+    not).
+    """
+    index = (days - FIRST_SUNDAY).astype(np.int64) // 7
+    return (index >= 0) & (index < len(WEEK_YEARWEEKS))
+
+
+def week_index(days: np.ndarray) -> np.ndarray:
+    """
+    Weeks since FIRST_SUNDAY of datetime64[D] days.
+    """
+    if not np.all(in_calendar(days)):
+        raise _out_of_range()
+    return (days - FIRST_SUNDAY).astype(np.int64) // 7
+
+
+def yearweeks(days: np.ndarray) -> np.ndarray:
+    """
+    Epiweeks (YYYYWW) of datetime64[D] days.
+    """
+    return WEEK_YEARWEEKS[week_index(days)]
+
+
+def sundays(days: np.ndarray) -> np.ndarray:
+    """
+    Sundays of the epiweeks of datetime64[D] days.
+    """
+    return FIRST_SUNDAY + 7 * week_index(days)
+
+
+def yearweek_sundays(yearweeks: np.ndarray) -> np.ndarray:
+    """
+    Sundays (datetime64[D]) of epiweeks (YYYYWW).
+    """
+    epiyears, epiweeks = np.divmod(np.asarray(yearweeks, np.int64), 100)
+    index = epiyears - EPIYEAR_MIN
+    if not np.all((index >= 0) & (index < len(EPIYEAR_STARTS) - 1)):
+        raise _out_of_range()
+    return EPIYEAR_STARTS[index] + 7 * (epiweeks - 1)
+
+
+def yearweek_of(day: datetime.date) -> int:
+    """
+    Epiweek (YYYYWW) of a date.
+    """
+    index = (day.toordinal() - _FIRST_SUNDAY_ORDINAL) // 7
+    if not 0 <= index < len(_WEEK_YEARWEEKS):
+        raise _out_of_range()
+    return _WEEK_YEARWEEKS[index]
+
+
+def sunday_of(yearweek: int) -> datetime.date:
+    """
+    Sunday of an epiweek (YYYYWW).
+    """
+    epiyear, epiweek = divmod(yearweek, 100)
+    if not EPIYEAR_MIN <= epiyear <= EPIYEAR_MAX:
+        raise _out_of_range()
+    return datetime.date.fromordinal(
+        _EPIYEAR_START_ORDINALS[epiyear - EPIYEAR_MIN] + 7 * (epiweek - 1)
+    )
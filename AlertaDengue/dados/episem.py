@@ -2,6 +2,9 @@ import datetime
 from datetime import timedelta
 
 import numpy as np
+import pandas as pd
+
+from . import epicalendar
 
 __author__ = "Marcelo Ferreira da Costa Gomes"
 """
@@ -16,40 +19,84 @@ def extractweekday(x=datetime.datetime):
     return w
 
 
-def firstepiday(year=int):
-    day = datetime.datetime.strptime("%s-01-01" % year, "%Y-%m-%d")
+def _as_days(dates) -> np.ndarray:
+    days = np.asarray(dates)
+    if days.dtype.kind != "M":
+        # the values that are not dates are missing
+        days = np.asarray(
+            pd.to_datetime(days.ravel(), errors="coerce")
+        ).reshape(days.shape)
+    return days.astype("datetime64[D]")
 
-    day_week = extractweekday(day)
 
-    # Whe want day1 to correspond to the first day of the first epiweek.
-    # That is, we need the Sunday corresponding to epiweek=%Y01
-    # If first day of the year is between Sunday and Wednesday,
-    # epiweek 01 includes it. Otherwise, it is still the last epiweek
-    # of the previous year
-    if day_week < 4:
-        day = day - datetime.timedelta(days=day_week)
-    else:
-        day = day + datetime.timedelta(days=(7 - day_week))
+def episem_array(dates):
+    """
+    Brazilian epidemiological weeks (as YYYYWW integers) of an array of
+    dates, looked up in the epidemiological calendar (dados.epicalendar).
+
+    :param dates: datetime64 array, pandas Series/Index or sequence of
+      dates, datetimes or %Y-%m-%d strings.
+    :return: int64 array, 0 for missing dates and dates out of the
+      calendar (e.g. mistyped years). For a Series, an "Int64" Series with
+      the same index and <NA> for them.
+    """
+    days = _as_days(dates)
+    missing = ~epicalendar.in_calendar(days)
+    days = np.where(missing, epicalendar.FIRST_SUNDAY, days)
 
-    return day
+    yearweeks = np.where(missing, 0, epicalendar.yearweeks(days))
 
+    if isinstance(dates, pd.Series):
+        return pd.Series(yearweeks, index=dates.index, dtype="Int64").mask(
+            missing
+        )
+    return yearweeks
 
-def lastepiday(year=int):
-    day = datetime.datetime.strptime("%s-12-31" % year, "%Y-%m-%d")
 
-    day_week = extractweekday(day)
+def episem2date_array(yearweeks, weekday: int = 0):
+    """
+    Dates of the `weekday` (0: Sunday, 6: Saturday) of an array of
+    epidemiological weeks, looked up in the epidemiological calendar
+    (dados.epicalendar).
+
+    :param yearweeks: YYYYWW integers, or strings as "2014W02".
+    :param weekday: Week day of the dates.
+    :return: datetime64[D] array. For a Series, a Series with the same
+      index and NaT for missing weeks.
+    """
+    values = np.asarray(yearweeks)
+    if values.dtype.kind in "OSU":
+        codes = pd.Series(values.ravel()).astype(str)
+        values = (
+            (
+                codes.str[:4].astype(np.int64) * 100
+                + codes.str[-2:].astype(np.int64)
+            )
+            .to_numpy()
+            .reshape(values.shape)
+        )
+
+    if isinstance(yearweeks, pd.Series):
+        missing = yearweeks.isna().to_numpy()
+        values = np.where(missing, epicalendar.WEEK_YEARWEEKS[0], values)
+        days = epicalendar.yearweek_sundays(values) + weekday
+        days = np.where(missing, np.datetime64("NaT"), days)
+        return pd.Series(days, index=yearweeks.index, dtype="datetime64[ns]")
+
+    return epicalendar.yearweek_sundays(values) + weekday
 
-    # Whe want day to correspond to the last day of the last epiweek.
-    # That is, we need the corresponding Saturday
-    # If the last day of the year is between Sunday and Tuesday,
-    # epiweek 01 of the next year includes it.
-    # Otherwise, it is still the last epiweek of the current year
-    if day_week < 3:
-        day = day - datetime.timedelta(days=(day_week + 1))
-    else:
-        day = day + datetime.timedelta(days=(6 - day_week))
 
-    return day
+def firstepiday(year=int):
+    # Sunday of epiweek %Y01 (see epicalendar.epiyear_starts)
+    day = epicalendar.epiyear_starts(np.array([year]))[0]
+    return datetime.datetime.combine(
+        day.astype(datetime.date), datetime.time()
+    )
+
+
+def lastepiday(year=int):
+    # Saturday before the first epiweek of the next year
+    return firstepiday(year + 1) - timedelta(days=1)
 
 
 def episem(x, sep="W", out="YW"):
@@ -57,8 +104,8 @@ def episem(x, sep="W", out="YW"):
     """
     Return Brazilian corresponding epidemiological week from x.
 
-    :param x: Input date. Can be a string in the format %Y-%m-%d or
-      datetime.datetime
+    :param x: Input date. Can be a string in the format %Y-%m-%d,
+      datetime.date or datetime.datetime
     :param sep: Year and week separator.
     :param out: Output format. 'YW' returns sep.join(epiyear,epiweek).
      'Y' returns epiyear only. 'W' returns epiweek only.
@@ -73,28 +120,16 @@ def episem(x, sep="W", out="YW"):
         if out == "W":
             return "%02d" % week
 
-    if type(x) != datetime.datetime:
+    if not isinstance(x, (datetime.date, np.datetime64)):
         if str(x) == "" or x is None or (type(x) != str and np.isnan(x)):
             return None
         x = datetime.datetime.strptime(x, "%Y-%m-%d")
+    if isinstance(x, datetime.datetime):
+        x = x.date()
+    elif isinstance(x, np.datetime64):
+        x = x.astype("datetime64[D]").astype(datetime.date)
 
-    epiyear = x.year
-    epiend = lastepiday(epiyear)
-
-    if x > epiend:
-        epiyear += 1
-        return out_format(epiyear, 1, out, sep)
-
-    epistart = firstepiday(epiyear)
-
-    # If current date is before its year first epiweek,
-    # then our base year is the previous one
-    if x < epistart:
-        epiyear -= 1
-        epistart = firstepiday(epiyear)
-
-    epiweek = int(((x - epistart) / 7).days) + 1
-
+    epiyear, epiweek = divmod(epicalendar.yearweek_of(x), 100)
     return out_format(epiyear, epiweek, out, sep)
 
 
@@ -149,17 +184,7 @@ def episem2date(epi_year_week: str, weekday: int = 0):
     epiyear = int(epi_year_week[:4])
     epiweek = int(epi_year_week[-2:])
 
-    # Obtain sunday of first epiweek of epiyear
-    # day.one
-    date_1 = datetime.datetime.strptime("%s-01-01" % epiyear, "%Y-%m-%d")
-    # day.one.week
-    date_1_w = int(date_1.strftime("%w"))
-
-    # Check wether week day of Jan 1st was before or after a Wednesday
-    # and set the start of the epiyear accordingly
-    epiweek_day_1 = (
-        date_1 - timedelta(days=date_1_w)
-        if date_1_w <= 3
-        else date_1 + timedelta(days=7 - date_1_w)
+    sunday = epicalendar.sunday_of(epiyear * 100 + epiweek)
+    return datetime.datetime.combine(sunday, datetime.time()) + timedelta(
+        days=weekday
     )
-    return epiweek_day_1 + timedelta(days=7 * (epiweek - 1) + weekday)
@@ -0,0 +1,116 @@
+"""
+In-process cache in front of the Django cache.
+
+Small lookups that change a few times a year (city lists, regionals, city
+metadata) are read on almost every request; keeping them in the memory of
+the worker process saves the memcached round trip and the unpickling. The
+cache is a bounded LRU with a TTL, so an entry is at most `timeout`
+seconds older than the Django cache, and it is capped both in number of
+entries and in (pickled) bytes.
+
+The cached objects are shared by the requests of the process and must not
+be mutated.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+
+class LocalCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 2**20,
+        timeout: int = 300,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # key -> (expiry, size, value), least recently used first
+        self._data: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expiry, size, value = entry
+            if expiry < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> None:
+        """
+        Stores the value for `timeout` (default: the cache timeout)
+        seconds, evicting the least recently used entries over the caps.
+        Values larger than `max_bytes` are not stored.
+        """
+        try:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if size > self.max_bytes:
+            return
+
+        expiry = time.monotonic() + (
+            self.timeout if timeout is None else timeout
+        )
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expiry, size, value)
+            self._bytes += size
+            while (
+                len(self._data) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters of the cache since the process started, for the metrics.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+            }
+
+
+local_cache = LocalCache(
+    max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+    timeout=settings.LOCAL_CACHE_TIMEOUT,
+)
@@ -0,0 +1,42 @@
+from dados.dbdata import CID10, STATE_NAME
+from dados.warmcache import warm_cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Fill the cache of the state, city and home pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of queries run at a time",
+        )
+        parser.add_argument(
+            "--disease",
+            action="append",
+            choices=list(CID10),
+            help="Disease to warm up, all by default (repeatable)",
+        )
+        parser.add_argument(
+            "--state",
+            action="append",
+            choices=list(STATE_NAME),
+            help="State abbreviation to warm up, all by default (repeatable)",
+        )
+
+    def handle(self, **options):
+        stats = warm_cache(
+            options["disease"], options["state"], options["workers"]
+        )
+
+        self.stdout.write(
+            f"{'query':<28}{'calls':>7}{'errors':>8}"
+            f"{'hit rate':>10}{'seconds':>10}\n"
+        )
+        for kind, s in sorted(stats.items()):
+            self.stdout.write(
+                f"{kind:<28}{s.calls:>7}{s.errors:>8}"
+                f"{s.hit_rate:>10.1%}{s.seconds:>10.2f}\n"
+            )
@@ -1,41 +1,126 @@
+import json
+from typing import Iterable, Optional
+
 import geojson
+import numpy as np
+import pandas as pd
+import shapely
 from ad_main.settings import get_sqla_conn
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine.base import Engine
 
 DB_ENGINE = get_sqla_conn()
 
+# rows fetched from the server-side cursor of load_cities_geojson at a time
+GEOJSON_BATCH_SIZE = 500
 
-def get_city_geojson(municipio):
-    """
-    Pega o geojson a partir do banco de dados
-    :param municipio: geocódigo do municipio
-    :return:
+BOUNDS = ["minx", "miny", "maxx", "maxy"]
+
+
+def cities_geojson(rows: pd.DataFrame) -> pd.DataFrame:
     """
+    Decodes the geometries of a batch of rows of "Dengue_global"."Municipio"
+    (geocodigo, nome, geojson, populacao, uf) at once.
 
-    with DB_ENGINE.connect() as conn:
-        head = r'{"type": "FeatureCollection", "features":['
-        tail = "]}"
+    Returns a DataFrame indexed by geocodigo with nome, populacao, uf, the
+    FeatureCollection of the city as a string (geojson) and its bounds
+    (minx, miny, maxx, maxy). Rows without a valid geometry are dropped.
+    """
+    geometries = shapely.from_geojson(
+        rows["geojson"].to_numpy(dtype=object, na_value=None),
+        on_invalid="ignore",
+    )
+    valid = ~shapely.is_missing(geometries)
+    if not valid.all():
+        logger.warning(
+            "Invalid geojson of the cities "
+            f"{rows['geocodigo'][~valid].tolist()}"
+        )
+    rows = rows[valid]
+    geometries = geometries[valid]
 
-        res = conn.execute(
-            f"""
-            SELECT geocodigo, nome, geojson, populacao, uf
-            FROM "Dengue_global"."Municipio"
-            WHERE geocodigo={municipio}
-            """
+    features = []
+    for geocodigo, nome, populacao, geometry in zip(
+        rows["geocodigo"].tolist(),
+        rows["nome"].tolist(),
+        rows["populacao"].tolist(),
+        shapely.to_geojson(geometries),
+    ):
+        properties = json.dumps(
+            {"geocodigo": geocodigo, "nome": nome, "populacao": populacao}
         )
-        datum = dict(res.fetchone().items())
-        feat = geojson.loads(datum["geojson"])
+        features.append(
+            '{"type": "FeatureCollection", "features": [{"type": "Feature", '
+            f'"geometry": {geometry}, "properties": {properties}}}]}}'
+        )
+
+    cities = pd.DataFrame(
+        shapely.bounds(geometries), columns=BOUNDS, index=rows["geocodigo"]
+    )
+    cities.insert(0, "geojson", features)
+    for column in ("uf", "populacao", "nome"):
+        cities.insert(0, column, rows[column].to_numpy())
+    return cities
+
 
-        feat["type"] = "Feature"
+def load_cities_geojson(
+    state_name: Optional[str] = None,
+    geocodes: Optional[Iterable[int]] = None,
+    batch_size: int = GEOJSON_BATCH_SIZE,
+    db_engine: Engine = DB_ENGINE,
+) -> pd.DataFrame:
+    """
+    Geometries of all the cities, or of the cities of `state_name` and/or
+    of the `geocodes`, read in one query through a server-side cursor and
+    decoded `batch_size` rows at a time (see cities_geojson).
+    """
+    filters = []
+    params = {}
+    if state_name is not None:
+        filters.append("uf = :state_name")
+        params["state_name"] = state_name
+    if geocodes is not None:
+        filters.append("geocodigo = ANY(:geocodes)")
+        params["geocodes"] = [int(geocode) for geocode in geocodes]
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
 
-        feat["properties"] = {
-            "geocodigo": datum["geocodigo"],
-            "nome": datum["nome"],
-            "populacao": datum["populacao"],
-        }
+    batches = []
+    with db_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            text(
+                f"""
+                SELECT geocodigo, nome, geojson, populacao, uf
+                FROM "Dengue_global"."Municipio"
+                {where}
+                """
+            ),
+            params,
+        )
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            batches.append(cities_geojson(pd.DataFrame(rows, columns=columns)))
 
-        geoj = geojson.loads(head + geojson.dumps(feat) + tail)
+    if not batches:
+        return cities_geojson(
+            pd.DataFrame(
+                {column: np.array([], dtype=object) for column in columns}
+            )
+        )
+    return pd.concat(batches)
 
-    return geoj
+
+def get_city_geojson(municipio):
+    """
+    Pega o geojson a partir do banco de dados
+    :param municipio: geocódigo do municipio
+    :return:
+    """
+    cities = load_cities_geojson(geocodes=[municipio])
+    return geojson.loads(cities.loc[int(municipio), "geojson"])
 
 
 def get_city_info(geocodigo):
@@ -0,0 +1,269 @@
+"""
+Precomputed data of the city alert page (AlertaMunicipioPageView).
+
+dados.tasks.precompute_alert_snapshots writes, after each alert
+publication, one parquet file per disease and state,
+`<ALERT_SNAPSHOTS_DIR>/<disease>/<state code>.parquet`, with a row per city:
+the indicators of get_city_alert, the forecast dates, the alert bands and
+the chart (plotly JSON, one column per language). The rows are sorted by
+geocode in small row groups, so the view reads a single city without
+touching PostgreSQL.
+
+A file is only used while the latest `data_iniSE` of the alerts it was
+built from is still the latest one in the database.
+"""
+import json
+import os
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.utils import translation
+from sqlalchemy import text
+from sqlalchemy.engine.base import Engine
+
+from .charts.alerts import AlertCitiesCharts, alert_bands
+from .dbdata import (
+    CID10,
+    DB_ENGINE,
+    DISEASE_LABEL,
+    _load_series_uncached,
+    cached_latest_alert_date,
+    city_alert_from_series,
+)
+from .episem import episem
+
+ROW_GROUP_SIZE = 8
+LATEST_KEY = b"latest_data_iniSE"
+
+
+def snapshot_path(disease: str, geocode: int) -> Path:
+    state_code = int(geocode) // 100000
+    return (
+        Path(settings.ALERT_SNAPSHOTS_DIR) / disease / f"{state_code}.parquet"
+    )
+
+
+def snapshot_latest_date(path: Path) -> Optional[date]:
+    """
+    Latest `data_iniSE` of the alerts when the snapshot file was written.
+    """
+    if not path.exists():
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    latest = metadata.get(LATEST_KEY)
+    return date.fromisoformat(latest.decode()) if latest else None
+
+
+def state_codes(db_engine: Engine = DB_ENGINE) -> List[int]:
+    with db_engine.connect() as conn:
+        result = conn.execute(
+            """
+            SELECT DISTINCT geocodigo / 100000
+            FROM "Dengue_global"."Municipio"
+            ORDER BY 1
+            """
+        )
+        return [row[0] for row in result.fetchall()]
+
+
+def _forecast_dates(
+    geocodes: List[int], disease: str, db_engine: Engine
+) -> Dict[int, Tuple[str, str]]:
+    """
+    Forecast.get_min_max_date of several cities in one query.
+    """
+    sql = text(
+        """
+        SELECT
+            f.geocode,
+            TO_CHAR(MIN(init_date_epiweek), 'YYYY-MM-DD') AS epiweek_min,
+            TO_CHAR(MAX(init_date_epiweek), 'YYYY-MM-DD') AS epiweek_max
+        FROM
+            forecast.forecast_cases AS f
+            INNER JOIN forecast.forecast_city AS fc
+            ON (f.geocode = fc.geocode AND fc.active=TRUE)
+            INNER JOIN forecast.forecast_model AS fm
+            ON (fc.forecast_model_id = fm.id AND fm.active = TRUE)
+        WHERE f.geocode = ANY(:geocodes) AND cid10 = :cid10
+        GROUP BY f.geocode
+        """
+    )
+    with db_engine.connect() as conn:
+        result = conn.execute(
+            sql, {"geocodes": geocodes, "cid10": CID10[disease]}
+        )
+        return {row[0]: (row[1], row[2]) for row in result.fetchall()}
+
+
+def _state_cities(state_code: int, db_engine: Engine) -> pd.DataFrame:
+    sql = text(
+        """
+        SELECT geocodigo, nome, populacao, uf
+        FROM "Dengue_global"."Municipio"
+        WHERE geocodigo BETWEEN :first AND :last
+        ORDER BY geocodigo
+        """
+    )
+    with db_engine.connect() as conn:
+        result = conn.execute(
+            sql,
+            {
+                "first": state_code * 100000,
+                "last": state_code * 100000 + 99999,
+            },
+        )
+        return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+
+def build_state_snapshots(
+    state_code: int, disease: str, db_engine: Engine = DB_ENGINE
+) -> List[dict]:
+    """
+    Snapshot rows of the cities of a state with alerts for the disease.
+
+    The series are read from the database, not from the query cache: right
+    after a publication, the cache may still hold the series of the
+    previous week under the current data version.
+    """
+    cities = _state_cities(state_code, db_engine)
+    geocodes = cities.geocodigo.tolist()
+    if not geocodes:
+        return []
+
+    series = _load_series_uncached(geocodes, disease, 0, db_engine)
+    forecast_dates = _forecast_dates(geocodes, disease, db_engine)
+
+    # the chart shows the latest forecast of each city
+    epiweeks = {}
+    by_epiweek = defaultdict(list)
+    for geocode in geocodes:
+        forecast_date_max = forecast_dates.get(geocode, (None, None))[1]
+        epiweeks[geocode] = (
+            None
+            if forecast_date_max is None
+            else episem(forecast_date_max).replace("W", "")
+        )
+        by_epiweek[epiweeks[geocode]].append(geocode)
+
+    chart_series = {}
+    for epiweek, epiweek_geocodes in by_epiweek.items():
+        chart_series.update(
+            _load_series_uncached(
+                epiweek_geocodes, disease, epiweek, db_engine
+            )
+        )
+
+    rows = []
+    for city in cities.itertuples(index=False):
+        geocode = str(city.geocodigo)
+        if series[geocode] is None or chart_series[geocode] is None:
+            # the view handles (and reports) the cities without data
+            continue
+
+        (
+            alert,
+            SE,
+            case_series,
+            last_year,
+            observed_cases,
+            min_max_est,
+            dia,
+            prt1,
+        ) = city_alert_from_series(series[geocode])
+        forecast_date_min, forecast_date_max = forecast_dates.get(
+            city.geocodigo, (None, None)
+        )
+        dados = chart_series[geocode]
+        verde, amarelo, laranja, vermelho = alert_bands(
+            dados["alerta"], dados["casos"]
+        )
+
+        row = {
+            "geocode": int(city.geocodigo),
+            "nome": city.nome,
+            "uf": city.uf,
+            "populacao": (
+                None if pd.isna(city.populacao) else int(city.populacao)
+            ),
+            "alert": int(alert),
+            "SE": int(SE),
+            "case_series": case_series,
+            "last_year": last_year,
+            "observed_cases": observed_cases,
+            "min_est": int(min_max_est[0]),
+            "max_est": int(min_max_est[1]),
+            "dia": dia,
+            "prt1": float(prt1),
+            "forecast_date_min": forecast_date_min,
+            "forecast_date_max": forecast_date_max,
+            "epiweek": epiweeks[city.geocodigo],
+            "verde": json.dumps(verde),
+            "amarelo": json.dumps(amarelo),
+            "laranja": json.dumps(laranja),
+            "vermelho": json.dumps(vermelho),
+        }
+        for language, _ in settings.LANGUAGES:
+            with translation.override(language):
+                row[
+                    f"chart_{language}"
+                ] = AlertCitiesCharts.create_alert_figure(
+                    geocode,
+                    city.nome,
+                    DISEASE_LABEL[disease],
+                    disease,
+                    epiweeks[city.geocodigo],
+                    dados=dados,
+                ).to_json()
+        rows.append(row)
+    return rows
+
+
+def write_state_snapshots(
+    state_code: int,
+    disease: str,
+    latest: date,
+    db_engine: Engine = DB_ENGINE,
+) -> int:
+    """
+    Rewrites the snapshot file of a state. Returns the number of cities.
+
+    A state without cities to show still gets an (empty) file, so it is
+    not rebuilt before the next publication.
+    """
+    rows = build_state_snapshots(state_code, disease, db_engine)
+    path = snapshot_path(disease, state_code * 100000)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = (
+        pa.Table.from_pylist(rows)
+        if rows
+        else pa.table({"geocode": pa.array([], pa.int64())})
+    ).replace_schema_metadata({LATEST_KEY: latest.isoformat()})
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def read_city_snapshot(geocode: int, disease: str) -> Optional[dict]:
+    """
+    The snapshot of a city, None if there is none or if it is outdated.
+    """
+    path = snapshot_path(disease, geocode)
+    if not path.exists():
+        return None
+
+    latest = cached_latest_alert_date(disease)
+    if latest is None or snapshot_latest_date(path) != latest:
+        return None
+
+    table = pq.read_table(path, filters=[("geocode", "=", int(geocode))])
+    if table.num_rows == 0:
+        return None
+    return table.to_pylist()[0]
@@ -1,9 +1,16 @@
 from datetime import datetime
-from typing import Literal
+from typing import Literal, Optional
 
 from ad_main.celeryapp import app
 from celery.schedules import crontab
-from dados.dbdata import ALL_STATE_NAMES
+from dados import snapshots
+from dados.dbdata import (
+    ALL_STATE_NAMES,
+    CID10,
+    latest_alert_date,
+    renew_data_version,
+)
+from dados.warmcache import warm_cache as _warm_cache
 from scanner.scanner import EpiScanner
 
 app.conf.beat_schedule = {
@@ -22,6 +29,11 @@ app.conf.beat_schedule = {
         "schedule": crontab(minute=0, hour=3, day_of_week=3),
         "args": (datetime.now().year, "chik"),
     },
+    # only the states with new alerts are rebuilt
+    "alert-snapshots": {
+        "task": "dados.tasks.precompute_alert_snapshots",
+        "schedule": crontab(minute=15),
+    },
 }
 
 DATA_DIR = "/opt/services/episcanner"
@@ -41,3 +53,55 @@ def episcanner_all_states(
             scanner.export("duckdb", output_dir=DATA_DIR)
         except ValueError:
             continue
+
+
+@app.task
+def precompute_alert_snapshots(
+    disease: Optional[str] = None, force: bool = False
+) -> dict:
+    """
+    Writes the city page snapshots (see dados.snapshots) of the states
+    whose snapshot was built before the latest alert of the disease, or of
+    every state if `force`. Returns the number of cities written by disease.
+    When new alerts were published, the query cache is warmed up again.
+    """
+    written = {}
+    for disease in [disease] if disease else list(CID10):
+        latest = latest_alert_date(disease)
+        if latest is None:
+            continue
+
+        written[disease] = 0
+        for state_code in snapshots.state_codes():
+            path = snapshots.snapshot_path(disease, state_code * 100000)
+            if not force and snapshots.snapshot_latest_date(path) == latest:
+                continue
+            written[disease] += snapshots.write_state_snapshots(
+                state_code, disease, latest
+            )
+
+        # renews the data_version of the cached queries of the disease,
+        # before the warm-up below runs (possibly in this process)
+        renew_data_version(disease)
+
+    if any(written.values()):
+        warm_cache.delay()
+    return written
+
+
+@app.task
+def warm_cache(workers: int = 4) -> dict:
+    """
+    Fills the cache of the state, city and home pages (see
+    dados.warmcache). Can be called after the refresh of the materialized
+    views. Returns the calls, hit rate and seconds by kind of query.
+    """
+    return {
+        kind: {
+            "calls": s.calls,
+            "errors": s.errors,
+            "hit_rate": s.hit_rate,
+            "seconds": s.seconds,
+        }
+        for kind, s in _warm_cache(workers=workers).items()
+    }
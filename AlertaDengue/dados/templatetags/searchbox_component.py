@@ -1,25 +1,11 @@
-from dados.dbdata import STATE_NAME, RegionalParameters
+from dados.dbdata import STATE_NAME, RegionalParameters, cache_get_or_set
 from dados.models import City
 from django import template
-from django.conf import settings
-from django.core.cache import cache
 
 register = template.Library()
 
 
-@register.inclusion_tag(
-    "components/searchbox/searchbox.html", takes_context=True
-)
-def searchbox_component(context):
-    cache_name = "options_cities"
-    res = cache.get(cache_name)
-
-    if res:
-        context = {
-            "options_cities": res,
-        }
-        return context
-
+def _options_cities() -> list:
     options_cities = []
     for uf, state_name in STATE_NAME.items():
         for (
@@ -27,15 +13,15 @@ def searchbox_component(context):
             city_name,
         ) in RegionalParameters.get_cities(state_name=state_name).items():
             options_cities.append(City(geocode, city_name, uf))
+    return options_cities
 
-    cache.set(
-        cache_name,
-        options_cities,
-        settings.QUERY_CACHE_TIMEOUT,
-    )
 
+@register.inclusion_tag(
+    "components/searchbox/searchbox.html", takes_context=True
+)
+def searchbox_component(context):
     context = {
-        "options_cities": options_cities,
+        "options_cities": cache_get_or_set("options_cities", _options_cities),
     }
 
     return context
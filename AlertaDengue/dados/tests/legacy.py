@@ -2,8 +2,13 @@
 Código antigos usados para comparar novas implementações
 """
 
+import datetime
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 from ad_main import settings
+from dados.dbdata import CID10, _nan_to_num_int_list, get_disease_suffix
 from dados.episem import episem
 from sqlalchemy import create_engine
 
@@ -219,3 +224,371 @@ class OldReportState:
                 "n_tweets": "tweets",
             }
         )
+
+
+def old_alert_bands(alerta: list, casos: list) -> list:
+    """
+    Bandas de alerta de AlertCitiesCharts.prepare_data
+    """
+
+    def int_or_none(x):
+        return None if x is None else int(x)
+
+    bands = []
+    for level in range(4):
+        band = [int(c) if a == level else None for a, c in zip(alerta, casos)]
+        band = [
+            int_or_none(casos[n])
+            if i is None and band[n - 1] is not None
+            else int_or_none(i)
+            for n, i in enumerate(band)
+        ]
+        bands.append(band)
+    return bands
+
+
+class OldNotificationResume:
+    @staticmethod
+    def tail_estimated_cases(geo_ids, n=12):
+        """
+        Uma subquery por geocódigo, unidas com UNION
+        """
+        sql_template = (
+            """(
+        SELECT
+            municipio_geocodigo, "data_iniSE", casos_est
+        FROM
+            "Municipio".historico_casos
+        WHERE
+            municipio_geocodigo={}
+        ORDER BY
+            "data_iniSE" DESC
+        LIMIT """
+            + str(n)
+            + ")"
+        )
+
+        sql = " UNION ".join([sql_template.format(gid) for gid in geo_ids])
+
+        if len(geo_ids) > 1:
+            sql += ' ORDER BY municipio_geocodigo, "data_iniSE"'
+
+        with db_engine.connect() as conn:
+            result = conn.execute(sql)
+            df_case_series = pd.DataFrame(result.fetchall())
+
+            return {
+                k: v.casos_est.values.tolist()
+                for k, v in df_case_series.groupby(by="municipio_geocodigo")
+            }
+
+
+class OldForecast:
+    @staticmethod
+    def load_cases(
+        geocode: int, disease: str, epiweek: int, db_engine=db_engine
+    ):
+        """
+        dados.dbdata.Forecast.load_cases, antes de load_series_many
+        """
+
+        # sql settings
+        cid10 = CID10[disease]
+
+        sql = """
+        SELECT DISTINCT ON (forecast_cases.forecast_model_id)
+        forecast_cases.forecast_model_id,
+        forecast_model.name AS forecast_model_name,
+        forecast_cases.published_date
+        FROM
+        forecast.forecast_cases
+        INNER JOIN forecast.forecast_model
+            ON (
+            forecast_cases.forecast_model_id =
+            forecast_model.id
+            )
+        WHERE
+        cid10 = %s
+        AND geocode = %s
+        AND epiweek = %s
+        ORDER BY forecast_model_id, published_date DESC
+        """
+
+        with db_engine.connect() as conn:
+            result = conn.execute(sql, (cid10, geocode, epiweek))
+            df_forecast_model = pd.DataFrame(
+                result.fetchall(), columns=result.keys()
+            )
+
+        # return df_forecast_model
+
+        table_name = "Historico_alerta" + get_disease_suffix(disease)
+
+        sql_alert = """
+        SELECT * FROM "Municipio"."{}"
+        WHERE municipio_geocodigo={} ORDER BY "data_iniSE" ASC
+        """.format(
+            table_name, geocode
+        )
+
+        sql = """
+        SELECT
+            (CASE
+             WHEN tb_cases."data_iniSE" IS NOT NULL
+               THEN tb_cases."data_iniSE"
+             %(forecast_date_ini_epiweek)s
+             ELSE NULL
+             END
+            ) AS "data_iniSE",
+            tb_cases.casos_est_min,
+            tb_cases.casos_est,
+            tb_cases.casos_est_max,
+            tb_cases.casos,
+            tb_cases.nivel,
+            (CASE
+             WHEN tb_cases."SE" IS NOT NULL THEN tb_cases."SE"
+             %(forecast_epiweek)s
+             ELSE NULL
+             END
+            ) AS "SE",
+            tb_cases.p_rt1
+            %(forecast_models_cases)s
+        FROM
+            (%(sql_alert)s) AS tb_cases %(forecast_models_joins)s
+        ORDER BY "data_iniSE" ASC
+        """
+
+        sql_forecast_by_model = """
+        FULL OUTER JOIN (
+          SELECT
+            epiweek,
+            init_date_epiweek,
+            cases AS forecast_%(model_name)s_cases
+          FROM
+            forecast.forecast_cases
+            INNER JOIN forecast.forecast_model
+              ON (
+                forecast_cases.forecast_model_id = forecast_model.id
+                AND forecast_model.active=TRUE
+              )
+            INNER JOIN forecast.forecast_city
+              ON (
+                forecast_city.geocode = forecast_cases.geocode
+                AND forecast_cases.forecast_model_id =
+                  forecast_city.forecast_model_id
+                AND forecast_city.active=TRUE
+              )
+          WHERE
+            cid10='%(cid10)s'
+            AND forecast_cases.geocode=%(geocode)s
+            AND published_date='%(published_date)s'
+            AND forecast_cases.forecast_model_id=%(model_id)s
+        ) AS forecast%(model_id)s ON (
+          tb_cases."SE" = forecast%(model_id)s.epiweek
+        )
+        """
+
+        forecast_date_ini_epiweek = ""
+        forecast_models_cases = ""
+        forecast_models_joins = ""
+        forecast_epiweek = ""
+        forecast_config = {
+            "geocode": geocode,
+            "cid10": cid10,
+            "published_date": None,
+            "model_name": None,
+            "model_id": None,
+        }
+
+        for i, row in df_forecast_model.iterrows():
+            forecast_config.update(
+                {
+                    "published_date": row.published_date,
+                    "model_name": row.forecast_model_name,
+                    "model_id": row.forecast_model_id,
+                }
+            )
+            # forecast models join sql
+            forecast_models_joins += sql_forecast_by_model % forecast_config
+
+            # forecast date ini selection
+            forecast_date_ini_epiweek += (
+                """
+            WHEN forecast%(model_id)s.init_date_epiweek IS NOT NULL
+               THEN forecast%(model_id)s.init_date_epiweek
+            """
+                % forecast_config
+            )
+
+            # forecast epiweek selection
+            forecast_epiweek += (
+                """
+            WHEN forecast%(model_id)s.epiweek IS NOT NULL
+               THEN forecast%(model_id)s.epiweek
+            """
+                % forecast_config
+            )
+
+            # forecast models cases selection
+            forecast_models_cases += (
+                ",forecast_%(model_name)s_cases" % forecast_config
+            )
+
+        if forecast_models_cases == "":
+            forecast_models_cases = ",1"
+
+        sql = sql % {
+            "forecast_models_joins": forecast_models_joins,
+            "forecast_models_cases": forecast_models_cases,
+            "forecast_date_ini_epiweek": forecast_date_ini_epiweek,
+            "forecast_epiweek": forecast_epiweek,
+            "sql_alert": sql_alert,
+        }
+
+        with db_engine.connect() as conn:
+            result = conn.execute(sql)
+            return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+
+def old_load_cases_without_forecast(
+    geocode: int, disease, db_engine=db_engine
+):
+    """
+    dados.dbdata.load_cases_without_forecast, antes de load_series_many
+    """
+
+    with db_engine.connect() as conn:
+        table_name = "Historico_alerta" + get_disease_suffix(disease)
+
+        result = conn.execute(
+            f"""
+            SELECT * FROM "Municipio"."{table_name}"
+            WHERE municipio_geocodigo={geocode} ORDER BY "data_iniSE" ASC
+            """
+        )
+
+        data_alert = pd.DataFrame(result.fetchall(), columns=result.keys())
+
+        # Convert relevant columns to datetime
+        data_alert["data_iniSE"] = pd.to_datetime(data_alert["data_iniSE"])
+        # Add more columns if needed
+
+    return data_alert
+
+
+def old_load_series(cidade, disease: str = "dengue", epiweek: int = 0):
+    """
+    dados.dbdata.load_series, antes de load_series_many (sem o cache)
+    """
+    ap = str(cidade)
+
+    if epiweek is not None:
+        dados_alerta = OldForecast.load_cases(
+            geocode=cidade, disease=disease, epiweek=epiweek
+        )
+    else:
+        dados_alerta = old_load_cases_without_forecast(
+            geocode=cidade, disease=disease
+        )
+
+    if len(dados_alerta) == 0:
+        return {ap: None}
+
+    series = defaultdict(lambda: defaultdict(lambda: []))
+
+    series[ap]["dia"] = dados_alerta.data_iniSE.tolist()
+
+    series[ap]["casos_est_min"] = _nan_to_num_int_list(
+        dados_alerta.casos_est_min
+    )
+
+    series[ap]["casos_est"] = _nan_to_num_int_list(dados_alerta.casos_est)
+
+    series[ap]["casos_est_max"] = _nan_to_num_int_list(
+        dados_alerta.casos_est_max
+    )
+
+    series[ap]["casos"] = _nan_to_num_int_list(dados_alerta.casos)
+    # (1,4)->(0,3)
+    series[ap]["alerta"] = (
+        dados_alerta.nivel.fillna(1).astype(int) - 1
+    ).tolist()
+    series[ap]["SE"] = (dados_alerta.SE.astype(int)).tolist()
+    series[ap]["prt1"] = dados_alerta.p_rt1.astype(float).tolist()
+
+    k_forecast = [k for k in dados_alerta.keys() if k.startswith("forecast_")]
+
+    if k_forecast:
+        for k in k_forecast:
+            series[ap][k] = dados_alerta[k].astype(float).tolist()
+
+    series[ap] = dict(series[ap])
+
+    return dict(series)
+
+
+def old_firstepiday(year):
+    """
+    dados.episem.firstepiday, antes do calendário epidemiológico
+    """
+    day = datetime.datetime.strptime("%s-01-01" % year, "%Y-%m-%d")
+    day_week = day.isoweekday() % 7
+    if day_week < 4:
+        day = day - datetime.timedelta(days=day_week)
+    else:
+        day = day + datetime.timedelta(days=(7 - day_week))
+    return day
+
+
+def old_lastepiday(year):
+    """
+    dados.episem.lastepiday, antes do calendário epidemiológico
+    """
+    day = datetime.datetime.strptime("%s-12-31" % year, "%Y-%m-%d")
+    day_week = day.isoweekday() % 7
+    if day_week < 3:
+        day = day - datetime.timedelta(days=(day_week + 1))
+    else:
+        day = day + datetime.timedelta(days=(6 - day_week))
+    return day
+
+
+def old_episem(x, sep="W"):
+    """
+    dados.episem.episem (out="YW"), antes do calendário epidemiológico
+    """
+    if type(x) is not datetime.datetime:
+        if str(x) == "" or x is None or (type(x) is not str and np.isnan(x)):
+            return None
+        x = datetime.datetime.strptime(x, "%Y-%m-%d")
+
+    epiyear = x.year
+    epiend = old_lastepiday(epiyear)
+    if x > epiend:
+        return "%s%s%02d" % (epiyear + 1, sep, 1)
+
+    epistart = old_firstepiday(epiyear)
+    if x < epistart:
+        epiyear -= 1
+        epistart = old_firstepiday(epiyear)
+
+    epiweek = int(((x - epistart) / 7).days) + 1
+    return "%s%s%02d" % (epiyear, sep, epiweek)
+
+
+def old_episem2date(epi_year_week, weekday=0):
+    """
+    dados.episem.episem2date, antes do calendário epidemiológico
+    """
+    epi_year_week = str(epi_year_week)
+    epiyear = int(epi_year_week[:4])
+    epiweek = int(epi_year_week[-2:])
+
+    date_1 = datetime.datetime.strptime("%s-01-01" % epiyear, "%Y-%m-%d")
+    date_1_w = int(date_1.strftime("%w"))
+    epiweek_day_1 = (
+        date_1 - datetime.timedelta(days=date_1_w)
+        if date_1_w <= 3
+        else date_1 + datetime.timedelta(days=7 - date_1_w)
+    )
+    return epiweek_day_1 + datetime.timedelta(days=7 * (epiweek - 1) + weekday)
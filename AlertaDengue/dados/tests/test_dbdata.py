@@ -1,9 +1,17 @@
 import datetime
+import threading
+import time
+from functools import partial
 from unittest import TestCase
+from unittest.mock import patch
 
-from dados import dbdata
+import pandas as pd
+from dados import dbdata, warmcache
 from dados.dbdata import RegionalParameters
-from dados.tests import legacy  # noqa
+from dados.localcache import local_cache
+from dados.tests import legacy
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
 from pandas._testing import assert_frame_equal
 
 # Paramaters
@@ -78,6 +86,217 @@ class TestLoadAlerta(TestCase):
         self.assertIsInstance(min_max_est, tuple)
         self.assertIsInstance(dia, datetime.date)
 
+    def test_load_series_matches_legacy(self):
+        cities = [self.cidade, 3304557]
+        for epiweek in (0, None):
+            series = dbdata._load_series_uncached(
+                cities, "dengue", epiweek, dbdata.DB_ENGINE
+            )
+            for city in cities:
+                old_series = legacy.old_load_series(city, "dengue", epiweek)
+                assert_frame_equal(
+                    pd.DataFrame(series[str(city)]),
+                    pd.DataFrame(old_series[str(city)]),
+                    obj=f"{city}, epiweek {epiweek}",
+                )
+
+
+class TestJoinForecasts(TestCase):
+    def test_join(self):
+        alerts = pd.DataFrame(
+            {
+                "data_iniSE": [datetime.date(2024, 1, 7)],
+                "SE": [202402],
+                "casos": [10],
+            }
+        )
+        forecasts = pd.DataFrame(
+            {
+                "geocode": [3304557] * 3,
+                "forecast_model_id": [2, 2, 1],
+                "forecast_model_name": ["Arima", "Arima", "Empty"],
+                "epiweek": [202402, 202403, None],
+                "init_date_epiweek": [
+                    datetime.date(2024, 1, 7),
+                    datetime.date(2024, 1, 14),
+                    None,
+                ],
+                "cases": [11.0, 12.0, None],
+            }
+        )
+        cases = dbdata._join_forecasts(alerts, forecasts)
+
+        self.assertEqual(
+            list(cases.columns),
+            [
+                "data_iniSE",
+                "SE",
+                "casos",
+                "forecast_empty_cases",
+                "forecast_arima_cases",
+            ],
+        )
+        self.assertEqual(list(cases.SE), [202402, 202403])
+        self.assertEqual(
+            list(cases.data_iniSE),
+            [datetime.date(2024, 1, 7), datetime.date(2024, 1, 14)],
+        )
+        self.assertEqual(list(cases.forecast_arima_cases), [11.0, 12.0])
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    },
+    QUERY_CACHE_LOCK_TIMEOUT=5,
+)
+class TestCacheGetOrSet(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return None
+
+        self.assertIsNone(dbdata.cache_get_or_set("key", compute))
+        self.assertIsNone(dbdata.cache_get_or_set("key", compute))
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_the_lock_holder(self):
+        cache.add("key:lock", 1)
+        threading.Timer(0.3, cache.set, ("key", "computed")).start()
+
+        value = dbdata.cache_get_or_set("key", lambda: "recomputed")
+
+        self.assertEqual(value, "computed")
+
+    def test_concurrent_misses(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return "value"
+
+        threads = [
+            threading.Thread(
+                target=dbdata.cache_get_or_set, args=("k", compute)
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get("k"), "value")
+        self.assertIsNone(cache.get("k:lock"))
+
+    def test_stats(self):
+        stats = dbdata.cache_stats()
+        before = stats.copy()
+        dbdata.cache_get_or_set("key", lambda: 1)
+        dbdata.cache_get_or_set("key", lambda: 1)
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertEqual(stats["misses"] - before["misses"], 1)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    },
+    QUERY_CACHE_LOCK_TIMEOUT=5,
+)
+class TestDataVersion(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        cache.set("latest_alert_date_dengue", datetime.date(2024, 1, 7))
+        cache.set("latest_alert_date_zika", datetime.date(2024, 1, 7))
+
+    def test_versioned_key(self):
+        self.assertEqual(
+            dbdata.versioned_key("data_hist_RJ_dengue", "dengue"),
+            "data_hist_RJ_dengue@20240107",
+        )
+
+    def test_new_publication_only_changes_its_disease(self):
+        loaded = []
+
+        def load(geocodes, disease, epiweek, db_engine):
+            loaded.append(disease)
+            return {str(g): {"SE": [disease]} for g in geocodes}
+
+        with patch.object(dbdata, "_load_series_uncached", side_effect=load):
+            for disease in ("dengue", "zika"):
+                dbdata.load_series_many([3304557], disease)
+
+            # a new week of dengue is published
+            with patch.object(
+                dbdata,
+                "latest_alert_date",
+                return_value=datetime.date(2024, 1, 14),
+            ):
+                dbdata.renew_data_version("dengue")
+                for disease in ("dengue", "zika"):
+                    dbdata.load_series_many([3304557], disease)
+
+        self.assertEqual(loaded, ["dengue", "zika", "dengue"])
+        self.assertEqual(dbdata.data_version("dengue"), "20240114")
+        self.assertEqual(
+            dbdata.load_series(3304557, "zika"), {"3304557": {"SE": ["zika"]}}
+        )
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    },
+    QUERY_CACHE_LOCK_TIMEOUT=5,
+)
+class TestWarmCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_by_kind(self):
+        def query(key):
+            return partial(dbdata.cache_get_or_set, key, lambda: key)
+
+        def fail():
+            raise ValueError("no table")
+
+        jobs = [
+            ("a", query("a1")),
+            ("a", query("a1")),
+            ("a", query("a2")),
+            ("b", fail),
+        ]
+        with patch.object(warmcache, "warm_jobs", return_value=jobs):
+            stats = warmcache.warm_cache(workers=2)
+
+        self.assertEqual(stats["a"].calls, 3)
+        self.assertEqual(stats["a"].hits + stats["a"].misses, 3)
+        self.assertGreaterEqual(stats["a"].misses, 2)
+        self.assertEqual(stats["b"].errors, 1)
+        self.assertEqual(stats["b"].hit_rate, 0.0)
+        self.assertEqual(cache.get("a2"), "a2")
+
+
+class TestNotificationResume(TestCase):
+    def test_tail_estimated_cases(self):
+        geo_ids = [3304557, 3303302, 3106200]
+
+        tail = dbdata.NotificationResume.tail_estimated_cases(geo_ids, 12)
+
+        self.assertEqual(
+            tail, legacy.OldNotificationResume.tail_estimated_cases(geo_ids)
+        )
+        self.assertTrue(all(len(v) <= 12 for v in tail.values()))
+
 
 class TestMunicipio(TestCase):
     def test_get_active_cities(self):
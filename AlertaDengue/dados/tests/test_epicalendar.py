@@ -0,0 +1,56 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+from dados import epicalendar
+from dados.episem import episem, episem2date, firstepiday, lastepiday
+from dados.tests import legacy
+
+
+class TestEpiCalendar(TestCase):
+    """
+    The calendar against the former episem, for every day from 1990 to
+    2100 and every epiweek of these years.
+    """
+
+    days = np.arange(np.datetime64("1990-01-01"), np.datetime64("2101-01-01"))
+
+    def test_every_day(self):
+        yearweeks = epicalendar.yearweeks(self.days).tolist()
+        sundays = epicalendar.sundays(self.days)
+
+        for day, yearweek, sunday in zip(self.days, yearweeks, sundays):
+            dt = datetime.datetime.combine(
+                day.astype(datetime.date), datetime.time()
+            )
+            expected = int(legacy.old_episem(dt, sep=""))
+            self.assertEqual(yearweek, expected, day)
+            self.assertEqual(epicalendar.yearweek_of(dt.date()), expected)
+            self.assertEqual(episem(dt, sep=""), str(expected))
+            self.assertEqual(
+                sunday.astype(datetime.date),
+                legacy.old_episem2date(expected).date(),
+            )
+
+    def test_every_week(self):
+        yearweeks = np.unique(epicalendar.yearweeks(self.days))
+        sundays = epicalendar.yearweek_sundays(yearweeks)
+
+        for yearweek, sunday in zip(yearweeks.tolist(), sundays):
+            expected = legacy.old_episem2date(yearweek)
+            self.assertEqual(sunday.astype(datetime.date), expected.date())
+            self.assertEqual(epicalendar.sunday_of(yearweek), expected.date())
+            self.assertEqual(
+                episem2date(yearweek, 6), legacy.old_episem2date(yearweek, 6)
+            )
+
+    def test_epiyear_bounds(self):
+        for year in range(1990, 2101):
+            self.assertEqual(firstepiday(year), legacy.old_firstepiday(year))
+            self.assertEqual(lastepiday(year), legacy.old_lastepiday(year))
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            epicalendar.yearweeks(np.array(["1899-06-01"], "datetime64[D]"))
+        with self.assertRaises(ValueError):
+            epicalendar.sunday_of(230001)
@@ -0,0 +1,72 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from dados.episem import episem, episem2date, episem2date_array, episem_array
+
+
+class TestEpisemArray(TestCase):
+    def test_same_as_scalar(self):
+        days = np.arange(
+            np.datetime64("2018-12-01"), np.datetime64("2021-02-01")
+        )
+        yearweeks = episem_array(days)
+
+        self.assertEqual(
+            yearweeks.tolist(),
+            [int(episem(str(day), sep="")) for day in days],
+        )
+
+    def test_year_boundaries(self):
+        # 2020-12-31 is a Thursday: still in 2020W53
+        self.assertEqual(
+            episem_array(["2020-12-31", "2021-01-03", "2024-12-29"]).tolist(),
+            [202053, 202101, 202501],
+        )
+        self.assertEqual(episem(datetime.date(2023, 12, 31)), "2024W01")
+
+    def test_series_with_missing_dates(self):
+        dates = pd.Series(
+            pd.to_datetime(["2024-01-01", None]), index=["a", "b"]
+        )
+        yearweeks = episem_array(dates)
+
+        self.assertEqual(yearweeks["a"], 202401)
+        self.assertTrue(pd.isna(yearweeks["b"]))
+        self.assertTrue(pd.isna(episem2date_array(yearweeks)["b"]))
+
+    def test_out_of_range(self):
+        # mistyped dates don't fail the other ones
+        dates = ["2024-01-01", "1850-01-01", "0202-01-05", "2300-01-01"]
+        self.assertEqual(episem_array(dates).tolist(), [202401, 0, 0, 0])
+
+        yearweeks = episem_array(pd.Series(dates))
+        self.assertEqual(yearweeks[0], 202401)
+        self.assertTrue(yearweeks[1:].isna().all())
+
+
+class TestEpisem2DateArray(TestCase):
+    def test_same_as_scalar(self):
+        yearweeks = [
+            year * 100 + week
+            for year in range(2015, 2026)
+            for week in range(1, 53)
+        ]
+        days = episem2date_array(np.array(yearweeks), weekday=1)
+
+        self.assertEqual(
+            days.tolist(),
+            [episem2date(yw, 1).date() for yw in yearweeks],
+        )
+
+    def test_round_trip(self):
+        yearweeks = np.array([201952, 202001, 202053, 202352])
+        self.assertEqual(
+            episem_array(episem2date_array(yearweeks)).tolist(),
+            yearweeks.tolist(),
+        )
+        self.assertEqual(
+            episem2date_array(np.array(["2014W02", "201402"])).tolist(),
+            [datetime.date(2014, 1, 5)] * 2,
+        )
@@ -0,0 +1,50 @@
+import time
+from unittest import TestCase
+
+from dados.localcache import LocalCache
+
+
+class TestLocalCache(TestCase):
+    def test_lru_eviction(self):
+        local = LocalCache(max_entries=2)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+
+        self.assertEqual(local.get("a"), 1)
+        self.assertIsNone(local.get("b"))
+        self.assertEqual(local.get("c"), 3)
+        self.assertEqual(local.stats()["evictions"], 1)
+
+    def test_bytes_cap(self):
+        local = LocalCache(max_bytes=1000)
+        local.set("big", "x" * 2000)
+        local.set("a", "x" * 400)
+        local.set("b", "x" * 400)
+        local.set("c", "x" * 400)
+
+        self.assertIsNone(local.get("big"))
+        self.assertIsNone(local.get("a"))
+        self.assertLessEqual(local.stats()["bytes"], 1000)
+        self.assertEqual(local.stats()["entries"], 2)
+
+    def test_ttl(self):
+        local = LocalCache(timeout=60)
+        local.set("a", 1, timeout=0.1)
+        local.set("b", None)
+        time.sleep(0.2)
+
+        self.assertEqual(local.get("a", "expired"), "expired")
+        self.assertIsNone(local.get("b", "missing"))
+        self.assertEqual(local.stats()["entries"], 1)
+
+    def test_counters(self):
+        local = LocalCache()
+        local.set("a", 1)
+        local.get("a")
+        local.get("a")
+        local.get("b")
+
+        stats = local.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
@@ -1,8 +1,46 @@
+import json
 from unittest import TestCase
 
+import geojson
+import pandas as pd
+
 from .. import maps
 
 
 class TestMaps(TestCase):
     def test_return_valid_geojson(self):
         maps.get_city_geojson(3304557)
+
+    def test_cities_geojson(self):
+        polygon = {
+            "type": "Polygon",
+            "coordinates": [[[0, 0], [2, 0], [2, 1], [0, 0]]],
+        }
+        rows = pd.DataFrame(
+            {
+                "geocodigo": [1, 2, 3],
+                "nome": ["A", "B", "C"],
+                "geojson": [
+                    json.dumps(polygon),
+                    json.dumps({"type": "Feature", "geometry": polygon}),
+                    None,
+                ],
+                "populacao": [10, 20, 30],
+                "uf": ["X", "X", "Y"],
+            }
+        )
+        cities = maps.cities_geojson(rows)
+
+        # the city without geometry is dropped
+        self.assertEqual(cities.index.tolist(), [1, 2])
+        self.assertEqual(
+            cities.loc[2, maps.BOUNDS].tolist(), [0.0, 0.0, 2.0, 1.0]
+        )
+        collection = geojson.loads(cities.loc[2, "geojson"])
+        self.assertEqual(collection["type"], "FeatureCollection")
+        (feature,) = collection["features"]
+        self.assertEqual(feature["geometry"], polygon)
+        self.assertEqual(
+            feature["properties"],
+            {"geocodigo": 2, "nome": "B", "populacao": 20},
+        )
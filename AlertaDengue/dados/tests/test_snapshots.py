@@ -0,0 +1,176 @@
+import datetime
+import json
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dados import dbdata, snapshots
+from dados.charts.alerts import alert_bands
+from dados.localcache import local_cache
+from dados.tests import legacy
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+
+class TestAlertBands(TestCase):
+    def test_same_as_legacy(self):
+        rng = np.random.default_rng(42)
+        alerta = rng.integers(0, 4, 300).tolist()
+        casos = rng.integers(0, 1000, 300).tolist()
+
+        self.assertEqual(
+            alert_bands(alerta, casos),
+            legacy.old_alert_bands(alerta, casos),
+        )
+        json.dumps(alert_bands(alerta, casos))
+
+    def test_first_week_closes_last_level(self):
+        # the first week looks back at the last one, as in the legacy code
+        self.assertEqual(
+            alert_bands([1, 0], [5, 7]),
+            [[5, 7], [5, 7], [None, None], [None, None]],
+        )
+
+
+class TestReadCitySnapshot(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            ALERT_SNAPSHOTS_DIR=self.tmp.name,
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                }
+            },
+        )
+        self.settings.enable()
+        cache.clear()
+        local_cache.clear()
+
+        rows = [
+            {"geocode": geocode, "nome": f"city {geocode}", "SE": 202402}
+            for geocode in range(3300100, 3300300, 7)
+        ]
+        path = snapshots.snapshot_path("dengue", 3304557)
+        path.parent.mkdir(parents=True)
+        table = pa.Table.from_pylist(rows).replace_schema_metadata(
+            {snapshots.LATEST_KEY: "2024-01-07"}
+        )
+        pq.write_table(table, path, row_group_size=snapshots.ROW_GROUP_SIZE)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def test_fresh(self):
+        cache.set("latest_alert_date_dengue", datetime.date(2024, 1, 7))
+
+        snapshot = snapshots.read_city_snapshot(3300107, "dengue")
+
+        self.assertEqual(snapshot["nome"], "city 3300107")
+        self.assertIsNone(snapshots.read_city_snapshot(3300108, "dengue"))
+        self.assertIsNone(snapshots.read_city_snapshot(3100108, "dengue"))
+
+    def test_outdated(self):
+        cache.set("latest_alert_date_dengue", datetime.date(2024, 1, 14))
+
+        self.assertIsNone(snapshots.read_city_snapshot(3300107, "dengue"))
+
+
+class TestWriteStateSnapshots(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            ALERT_SNAPSHOTS_DIR=self.tmp.name,
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                }
+            },
+            QUERY_CACHE_LOCK_TIMEOUT=5,
+        )
+        self.settings.enable()
+        cache.clear()
+        local_cache.clear()
+        self.week = datetime.date(2024, 1, 7)
+
+        self.patches = [
+            patch.object(
+                snapshots,
+                "_state_cities",
+                return_value=pd.DataFrame(
+                    {
+                        "geocodigo": [3304557],
+                        "nome": ["Rio de Janeiro"],
+                        "populacao": [6747815],
+                        "uf": ["Rio de Janeiro"],
+                    }
+                ),
+            ),
+            patch.object(snapshots, "_forecast_dates", return_value={}),
+            patch.object(
+                snapshots.AlertCitiesCharts,
+                "create_alert_figure",
+                **{"return_value.to_json.return_value": "{}"},
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def load(self, geocodes, disease, epiweek, db_engine):
+        # the series ends on the latest week published
+        return {
+            str(geocode): {
+                "dia": [self.week],
+                "SE": [int(snapshots.episem(self.week).replace("W", ""))],
+                "alerta": [1],
+                "casos": [10],
+                "casos_est": [12],
+                "casos_est_min": [11],
+                "casos_est_max": [13],
+                "prt1": [0.5],
+            }
+            for geocode in geocodes
+        }
+
+    def test_new_week_with_a_warm_cache(self):
+        cache.set("latest_alert_date_dengue", self.week)
+        with patch.object(
+            dbdata, "_load_series_uncached", side_effect=self.load
+        ):
+            for epiweek in (0, None):
+                dbdata.load_series_many([3304557], "dengue", epiweek)
+
+        # a new week is published, the cache still holds the previous
+        # version until the task renews it
+        self.week = datetime.date(2024, 1, 14)
+        with patch.object(
+            snapshots, "_load_series_uncached", side_effect=self.load
+        ):
+            snapshots.write_state_snapshots(33, "dengue", self.week)
+
+        cache.set("latest_alert_date_dengue", self.week)
+        local_cache.clear()
+        snapshot = snapshots.read_city_snapshot(3304557, "dengue")
+        self.assertEqual(snapshot["SE"], 202403)
+
+    def test_state_without_cities_keeps_its_file(self):
+        with patch.object(snapshots, "build_state_snapshots", return_value=[]):
+            self.assertEqual(
+                snapshots.write_state_snapshots(33, "dengue", self.week), 0
+            )
+
+        path = snapshots.snapshot_path("dengue", 3304557)
+        self.assertEqual(snapshots.snapshot_latest_date(path), self.week)
+        cache.set("latest_alert_date_dengue", self.week)
+        self.assertIsNone(snapshots.read_city_snapshot(3304557, "dengue"))
@@ -12,6 +12,7 @@ import altair as alt
 import fiona
 import numpy as np
 import pandas as pd
+import plotly.io as pio
 from dados.dbdata import get_epiyears
 
 #
@@ -19,11 +20,11 @@ from django.apps import apps
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.staticfiles.finders import find
-from django.core.cache import cache
 from django.http import Http404, HttpResponse
 
 # from django.shortcuts import redirect
 from django.templatetags.static import static
+from django.utils import translation
 from django.utils.translation import gettext as _
 from django.views.decorators.cache import cache_page
 from django.views.generic import TemplateView
@@ -44,6 +45,7 @@ from .charts.states import ReportStateCharts
 from .dbdata import (  # get_notification_cases,
     ALERT_COLOR,
     CID10,
+    DISEASE_LABEL,
     DISEASES_NAME,
     MAP_CENTER,
     MAP_ZOOM,
@@ -54,6 +56,7 @@ from .dbdata import (  # get_notification_cases,
     RegionalParameters,
     ReportCity,
     ReportState,
+    cache_get_or_set,
     data_hist_uf,
     get_city_alert,
     get_last_alert,
@@ -61,6 +64,7 @@ from .dbdata import (  # get_notification_cases,
 from .episem import episem, episem2date
 from .maps import get_city_info
 from .models import City
+from .snapshots import read_city_snapshot
 
 
 def get_static(static_dir):
@@ -77,15 +81,7 @@ locale.setlocale(locale.LC_TIME, locale="pt_BR.UTF-8")
 
 
 def _get_disease_label(disease_code: str) -> str:
-    return (
-        "Dengue"
-        if disease_code == "dengue"
-        else "Chikungunya"
-        if disease_code == "chikungunya"
-        else "Zika"
-        if disease_code == "zika"
-        else None
-    )
+    return DISEASE_LABEL.get(disease_code)
 
 
 def hex_to_rgb(value):
@@ -304,35 +300,78 @@ class AlertaMunicipioPageView(AlertCityPageBaseView):
         disease_label = _get_disease_label(disease_code)
         geocode = context["geocodigo"]
 
-        # Fetch city info from cache or database
-        city_info = cache.get(f"city_info:{geocode}")
-        if city_info is None:
-            city_info = get_city_info(geocode)
-            cache.set(
-                f"city_info:{geocode}", city_info, 60 * 60 * 24
-            )  # Cache for 24 hours
-
-        # Fetch forecast epiweek reference
-        forecast_date_min, forecast_date_max = Forecast.get_min_max_date(
-            geocode=geocode, cid10=CID10[disease_code]
+        snapshot = (
+            None
+            if self._get("ref")
+            else read_city_snapshot(geocode, disease_code)
         )
-        forecast_date_ref = self._get("ref", forecast_date_max)
-
-        if forecast_date_ref is None:
-            epiweek = None
+        chart_column = f"chart_{translation.get_language()}"
+
+        if snapshot is not None and chart_column in snapshot:
+            # precomputed by dados.tasks.precompute_alert_snapshots
+            city_info = {
+                "nome": snapshot["nome"],
+                "uf": snapshot["uf"],
+                "populacao": snapshot["populacao"],
+            }
+            forecast_date_min = snapshot["forecast_date_min"]
+            forecast_date_max = snapshot["forecast_date_max"]
+            forecast_date_ref = forecast_date_max
+            epiweek = snapshot["epiweek"]
+            (
+                alert,
+                SE,
+                case_series,
+                last_year,
+                observed_cases,
+                min_max_est,
+                dia,
+                prt1,
+            ) = (
+                snapshot["alert"],
+                snapshot["SE"],
+                snapshot["case_series"],
+                snapshot["last_year"],
+                snapshot["observed_cases"],
+                (snapshot["min_est"], snapshot["max_est"]),
+                snapshot["dia"],
+                snapshot["prt1"],
+            )
+            city_chart = pio.to_html(
+                json.loads(snapshot[chart_column]), validate=False
+            )
         else:
-            epiweek = episem(forecast_date_ref).replace("W", "")
-
-        (
-            alert,
-            SE,
-            case_series,
-            last_year,
-            observed_cases,
-            min_max_est,
-            dia,
-            prt1,
-        ) = get_city_alert(geocode, disease_code)
+            city_chart = None
+
+            # Fetch city info from cache or database (cached for 24 hours)
+            city_info = cache_get_or_set(
+                f"city_info:{geocode}",
+                lambda: get_city_info(geocode),
+                timeout=60 * 60 * 24,
+                local=True,
+            )
+
+            # Fetch forecast epiweek reference
+            forecast_date_min, forecast_date_max = Forecast.get_min_max_date(
+                geocode=geocode, cid10=CID10[disease_code]
+            )
+            forecast_date_ref = self._get("ref", forecast_date_max)
+
+            if forecast_date_ref is None:
+                epiweek = None
+            else:
+                epiweek = episem(forecast_date_ref).replace("W", "")
+
+            (
+                alert,
+                SE,
+                case_series,
+                last_year,
+                observed_cases,
+                min_max_est,
+                dia,
+                prt1,
+            ) = get_city_alert(geocode, disease_code)
 
         if alert is not None:
             casos_ap = {geocode: int(case_series[-1])}
@@ -346,13 +385,14 @@ class AlertaMunicipioPageView(AlertCityPageBaseView):
             total_observed_series = [0]
 
         try:
-            city_chart = chart_alerts.create_alert_chart(
-                geocode,
-                city_info["nome"],
-                disease_label,
-                disease_code,
-                epiweek,
-            )
+            if city_chart is None:
+                city_chart = chart_alerts.create_alert_chart(
+                    geocode,
+                    city_info["nome"],
+                    disease_label,
+                    disease_code,
+                    epiweek,
+                )
         except ValueError:
             context = {
                 "message": _(
@@ -772,10 +812,10 @@ class GeoTiffView(View):
 
 class GeoJsonView(View):
     def get(self, request, geocodigo, disease):
-        cache_key = f"geojson_{geocodigo}"
-        geojson = cache.get(cache_key)  # NOQA F811
+        # the fill color depends on the disease alert
+        cache_key = f"geojson_{geocodigo}_{disease}"
 
-        if not geojson:
+        def _geojson() -> str:
             # Get the path of the GeoJSON file
             geojson_path = self.get_geojson_path(geocodigo)
 
@@ -790,10 +830,10 @@ class GeoJsonView(View):
             geojson_data["features"][0]["properties"]["fill"] = hex_color
 
             # Serialize the GeoJSON to a string
-            geojson = json.dumps(geojson_data)
+            return json.dumps(geojson_data)
 
-            # Store in cache for a certain period of time (e.g., 1 hour)
-            cache.set(cache_key, geojson, timeout=3600)
+        # Store in cache for a certain period of time (e.g., 1 hour)
+        geojson = cache_get_or_set(cache_key, _geojson, timeout=3600)
 
         # Create the HTTP response with the GeoJSON
         response = HttpResponse(geojson, content_type="application/json")
@@ -0,0 +1,154 @@
+"""
+Warm-up of the query cache.
+
+After the cache is cleared, or after the weekly alert update and the
+refresh of the materialized views, the first visitors of the home, state
+and city pages would run the cold queries. `warm_cache` runs them instead,
+for every state, disease and active city, in a bounded thread pool, and
+reports the cache hits, misses and time of each kind of query.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from .dbdata import (
+    CID10,
+    STATE_NAME,
+    NotificationResume,
+    RegionalParameters,
+    ReportState,
+    cache_stats,
+    data_hist_uf,
+    get_all_active_cities_state,
+    load_series_many,
+)
+
+# (kind of query, call that fills its cache keys)
+Job = Tuple[str, Callable[[], object]]
+
+
+@dataclass
+class WarmStats:
+    calls: int = 0
+    errors: int = 0
+    hits: int = 0
+    misses: int = 0
+    seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def active_cities_by_state() -> Dict[str, List[int]]:
+    """
+    Geocodes of the cities with alerts in the last 52 weeks, by state name.
+    """
+    cities = defaultdict(set)
+    for geocode, _, _, state_name in get_all_active_cities_state():
+        cities[state_name].add(int(geocode))
+    return {state: sorted(geocodes) for state, geocodes in cities.items()}
+
+
+def warm_jobs(
+    diseases: Iterable[str], state_abbvs: Iterable[str]
+) -> List[Job]:
+    """
+    The cached queries of the home, state and city pages, with the
+    arguments used by the views.
+    """
+    diseases = list(diseases)
+    jobs: List[Job] = [("get_cities", RegionalParameters.get_cities)]
+    active_cities = active_cities_by_state()
+
+    for state_abbv in state_abbvs:
+        state_name = STATE_NAME[state_abbv]
+        jobs += [
+            (
+                "get_cities",
+                partial(RegionalParameters.get_cities, state_name=state_name),
+            ),
+            (
+                "get_regional_names",
+                partial(RegionalParameters.get_regional_names, state_name),
+            ),
+            (
+                "get_regional_by_state",
+                partial(ReportState.get_regional_by_state, state_abbv),
+            ),
+        ]
+        for disease in diseases:
+            jobs += [
+                (
+                    "data_hist_uf",
+                    partial(data_hist_uf, state_abbv, disease),
+                ),
+                (
+                    "get_cities_alert_by_state",
+                    partial(
+                        NotificationResume.get_cities_alert_by_state,
+                        state_name,
+                        disease,
+                    ),
+                ),
+            ]
+            geocodes = active_cities.get(state_name)
+            if geocodes:
+                # one query for the series of all the cities of the state
+                jobs.append(
+                    (
+                        "load_series",
+                        partial(load_series_many, geocodes, disease),
+                    )
+                )
+    return jobs
+
+
+def _run(job: Job) -> Tuple[str, WarmStats]:
+    kind, call = job
+    stats = WarmStats(calls=1)
+    before = cache_stats().copy()
+    st = time.perf_counter()
+    try:
+        call()
+    except Exception as e:
+        stats.errors = 1
+        logger.error(f"Cache warm-up of {kind} failed: {e}")
+    stats.seconds = time.perf_counter() - st
+    after = cache_stats()
+    stats.hits = after["hits"] - before["hits"]
+    stats.misses = after["misses"] - before["misses"]
+    return kind, stats
+
+
+def warm_cache(
+    diseases: Optional[Iterable[str]] = None,
+    state_abbvs: Optional[Iterable[str]] = None,
+    workers: int = 4,
+) -> Dict[str, WarmStats]:
+    """
+    Fills the cache keys of the pages of the `state_abbvs` (all states by
+    default) and `diseases` (all by default), with up to `workers` queries
+    at a time. Returns the stats by kind of query.
+    """
+    jobs = warm_jobs(diseases or list(CID10), state_abbvs or list(STATE_NAME))
+    stats: Dict[str, WarmStats] = defaultdict(WarmStats)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run, job) for job in jobs]
+        for future in as_completed(futures):
+            kind, job_stats = future.result()
+            total = stats[kind]
+            total.calls += job_stats.calls
+            total.errors += job_stats.errors
+            total.hits += job_stats.hits
+            total.misses += job_stats.misses
+            total.seconds += job_stats.seconds
+
+    return dict(stats)
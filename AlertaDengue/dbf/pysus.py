@@ -5,14 +5,15 @@ import time
 import traceback as tb
 from datetime import timedelta
 from pathlib import Path
-from typing import Union
+from typing import List, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import psycopg2
 import psycopg2.extras as extras
 from ad_main import settings
-from dados.episem import episem
+from dados.dbdata import to_copy_buffer
+from dados.episem import episem_array
 from psycopg2.extras import DictCursor
 from pysus.online_data import SINAN
 
@@ -52,6 +53,13 @@ MAP_FIELDS = {
 }
 
 COL_TO_RENAME = dict(zip(MAP_FIELDS.values(), MAP_FIELDS.keys()))
+# Columns of the casos_unicos constraint of "Municipio"."Notificacao"
+CASOS_UNICOS = [
+    "nu_notific",
+    "dt_notific",
+    "cid10_codigo",
+    "municipio_geocodigo",
+]
 COL_NAMES = list(MAP_FIELDS.values())
 
 dtypes = {
@@ -198,38 +206,33 @@ def fill_cid(disease: str) -> str:
     return "A92.0" if disease == "A92." else str(disease)
 
 
-@np.vectorize
-def add_se(dt_notf: datetime.date) -> int:
+def add_se(dt_notf: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
     Adds the SE field if it is empty.
     Return Brazilian corresponding epidemiological week.
     Parameters
     ----------
-        dt_notf: date of notification of symptoms.
+        dt_notf: dates of notification of symptoms.
     Returns
     -------
-        week: last two digits of the epidemiological week.
+        week: last two digits of the epidemiological weeks.
     """
 
-    epiweek = episem(str(dt_notf), sep="")
-
-    return int(str(epiweek)[-2:])
+    return episem_array(np.asarray(dt_notf)) % 100
 
 
-@np.vectorize
-def slice_se(epiweek: str, dt_notf: datetime.date) -> int:
+def slice_se(
+    epiweek: Union[pd.Series, np.ndarray],
+    dt_notf: Union[pd.Series, np.ndarray],
+) -> np.ndarray:
     """
     Get the epiweek from position -2.
     Removes the invalid character from the epidemiological week.
     """
 
-    not_valid_char = ["-", ""]
-
-    return (
-        add_se(dt_notf)
-        if any(x in epiweek for x in not_valid_char)
-        else int(str(epiweek)[-2:])
-    )
+    # every string contains "", so the week has always been taken from the
+    # date of notification
+    return add_se(dt_notf)
 
 
 class PySUS(object):
@@ -336,55 +339,134 @@ class PySUS(object):
                 )
             )
 
-    def upsert_to_pgsql(self):
+    def _upsert_rows(
+        self, connection, df: pd.DataFrame, insert_sql: str
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Upserts the rows one by one, each one under its own savepoint, so
+        the rows that fail are written to the Log and the others are kept.
+        """
+        inserted_ids, updated_ids = [], []
+
+        with connection.cursor() as cursor:
+            for _, row in df.iterrows():
+                cursor.execute("SAVEPOINT pysus_row;")
+                try:
+                    cursor.execute(insert_sql, tuple(row))
+                except Exception:
+                    cursor.execute("ROLLBACK TO SAVEPOINT pysus_row;")
+                    Log.write(tb.format_exc() + "> " + row.to_json())
+                    continue
+                _id, xmax = cursor.fetchone()
+                (inserted_ids if xmax == "0" else updated_ids).append(_id)
+        connection.commit()
+
+        return inserted_ids, updated_ids
+
+    def _upsert_batch(
+        self, connection, df: pd.DataFrame, merge_sql: str, stage: str
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Streams the batch into the stage table with COPY and merges it into
+        the Notificacao table with a single INSERT ... SELECT statement.
+        """
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {stage} ({','.join(df.columns)}) FROM STDIN "
+                "WITH (FORMAT csv, NULL '\\N')",
+                to_copy_buffer(df),
+            )
+            cursor.execute(merge_sql)
+            results = cursor.fetchall()
+            cursor.execute(f"TRUNCATE {stage};")
+        connection.commit()
+
+        inserted_ids = [_id for _id, xmax in results if xmax == "0"]
+        updated_ids = [_id for _id, xmax in results if xmax != "0"]
+        return inserted_ids, updated_ids
+
+    def upsert_to_pgsql(
+        self, batch_size: int = 50000
+    ) -> Tuple[List[int], List[int]]:
         """
         Get database connection and insert PySUS data from dataframe.
         Inserts or updates the row if it already exists.
+        The data is staged in a temporary table with COPY and merged with
+        one INSERT ... ON CONFLICT per batch. When a batch fails, its rows
+        are upserted one by one and the failing ones written to the Log.
+        Parameters
+        ----------
+            batch_size: number of rows merged per statement.
+        Returns
+        -------
+            inserted_ids, updated_ids: ids of the inserted and updated rows.
         """
         Log.start()
         connection = _get_postgres_connection()
 
         df_pysus = self.parse_dataframe(self.get_data(self.year, self.disease))
 
-        join = lambda x: ", ".join(x)  # noqa F841
-
         logger.info("Connecting to PostgreSQL database")
 
-        with connection.cursor(cursor_factory=DictCursor) as cursor:
+        table_name = '"Municipio"."Notificacao"'
+        stage = "pysus_notificacao_stage"
 
-            table_name = '"Municipio"."Notificacao"'
+        with connection.cursor(cursor_factory=DictCursor) as cursor:
             cursor.execute(f"SELECT * FROM {table_name} LIMIT 1;")
             col_names = [c.name for c in cursor.description if c.name != "id"]
-
+            cursor.execute(
+                f"CREATE TEMP TABLE {stage} AS "
+                f"SELECT {','.join(col_names)} FROM {table_name} WITH NO DATA;"
+            )
+        connection.commit()
+
+        fields = ",".join(col_names)
+        on_conflict = ",".join([f"{j}=excluded.{j}" for j in col_names])
+        merge_sql = (
+            f"INSERT INTO {table_name}({fields}) SELECT {fields} FROM {stage} "
+            f"ON CONFLICT ON CONSTRAINT casos_unicos DO UPDATE SET "
+            f"{on_conflict} RETURNING id, xmax"
+        )
         insert_sql = (
-            "INSERT INTO {}({}) VALUES ({}) on conflict "
-            "on CONSTRAINT casos_unicos do UPDATE SET {}"
-        ).format(
-            table_name,
-            ",".join(col_names),
-            ",".join(["%s" for i in col_names]),
-            ",".join(["{0}=excluded.{0}".format(j) for j in col_names]),
+            f"INSERT INTO {table_name}({fields}) "
+            f"VALUES ({','.join(['%s' for _ in col_names])}) "
+            f"ON CONFLICT ON CONSTRAINT casos_unicos DO UPDATE SET "
+            f"{on_conflict} RETURNING id, xmax"
         )
 
-        for row in df_pysus[col_names].iterrows():
-            with connection.cursor(cursor_factory=DictCursor) as cursor:
-
-                i = row[0]
-                row = row[1]
-
-                try:
-                    cursor.execute(insert_sql, row)
-                except Exception:
-                    Log.write(tb.format_exc() + "> " + row.to_json())
+        # A merge can't update the same row twice, keep the last one as
+        # the row by row upsert would
+        df_pysus = df_pysus[col_names].drop_duplicates(
+            subset=CASOS_UNICOS, keep="last"
+        )
 
-                if (i % 1000 == 0) and (i > 0):
-                    logger.info(
-                        f"{i} lines inserted."
-                        "Committing changes to the database..."
-                    )
-                    connection.commit()
+        inserted_ids, updated_ids = [], []
+        for start in range(0, len(df_pysus), batch_size):
+            df_batch = df_pysus.iloc[start : start + batch_size]
+            try:
+                inserted, updated = self._upsert_batch(
+                    connection, df_batch, merge_sql, stage
+                )
+            except Exception:
+                connection.rollback()
+                logger.warning(
+                    f"Batch {start}-{start + len(df_batch)} failed, "
+                    "upserting its rows one by one..."
+                )
+                inserted, updated = self._upsert_rows(
+                    connection, df_batch, insert_sql
+                )
+            inserted_ids += inserted
+            updated_ids += updated
+            logger.info(
+                f"{start + len(df_batch)} lines processed "
+                f"({len(inserted_ids)} inserts, {len(updated_ids)} updates)."
+            )
 
-            connection.commit()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {stage};")
+        connection.commit()
+        connection.close()
 
         logger.info(
             "Sinan {} rows in {} fields inserted in the database".format(
@@ -393,3 +475,4 @@ class PySUS(object):
         )
 
         Log.stop()
+        return inserted_ids, updated_ids
@@ -0,0 +1,173 @@
+import struct
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# (name, type, length, decimal count), as in simpledbf's Dbf5.fields
+Field = Tuple[str, str, int, int]
+
+
+class DBFReader:
+    """
+    Single pass DBF (dBase III) reader.
+
+    The records are read sequentially, in blocks of fixed width rows that
+    are viewed as a numpy structured array, so only the requested columns
+    are decoded, column by column. The file is opened once, whatever the
+    number of batches.
+    """
+
+    def __init__(
+        self,
+        fname: Union[str, Path],
+        encoding: str = "iso-8859-1",
+        columns: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        fname : Union[str, Path]
+            Path to the DBF file.
+        encoding : str
+            Encoding of the character fields.
+        columns : Optional[List[str]]
+            Columns to decode, all of them by default. Requested columns
+            that are not in the file are returned filled with None.
+        """
+        self.fname = str(fname)
+        self.encoding = encoding
+        self.records = 0
+        self.elapsed = 0.0
+
+        with open(self.fname, "rb") as dbf:
+            (
+                self.numrec,
+                self.header_length,
+                self.record_length,
+            ) = struct.unpack("<xxxxLHH20x", dbf.read(32))
+            self.fields: List[Field] = []
+            offsets = {}
+            offset = 1  # deletion flag
+            while True:
+                descriptor = dbf.read(32)
+                if not descriptor or descriptor[0] == 0x0D:
+                    break
+                name = descriptor[:11].split(b"\0")[0].decode("ascii")
+                field_type = chr(descriptor[11])
+                length, decimals = descriptor[16], descriptor[17]
+                self.fields.append((name, field_type, length, decimals))
+                offsets[name] = offset
+                offset += length
+
+        self._offsets = offsets
+        self.columns = columns or self.field_names
+
+    @property
+    def field_names(self) -> List[str]:
+        return [f[0] for f in self.fields]
+
+    @property
+    def columns(self) -> List[str]:
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns: List[str]) -> None:
+        self._columns = list(columns)
+        self._selected = [f for f in self.fields if f[0] in self._columns]
+        self._dtype = np.dtype(
+            {
+                "names": ["_deleted"] + [f[0] for f in self._selected],
+                "formats": ["S1"] + [f"S{f[2]}" for f in self._selected],
+                "offsets": [0] + [self._offsets[f[0]] for f in self._selected],
+                "itemsize": self.record_length,
+            }
+        )
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    def _decode(self, field: Field, values: np.ndarray) -> pd.Series:
+        _, field_type, _, decimals = field
+
+        if field_type in ("N", "F"):
+            numbers = pd.to_numeric(
+                pd.Series(np.char.decode(values, "ascii")).str.strip(),
+                errors="coerce",
+            )
+            integral = (numbers.dropna() % 1 == 0).all()
+            if field_type == "N" and decimals == 0 and integral:
+                return numbers.astype("Int64")
+            return numbers
+
+        if field_type == "D":
+            return pd.to_datetime(
+                pd.Series(np.char.decode(values, "ascii")),
+                format="%Y%m%d",
+                errors="coerce",
+            )
+
+        if field_type == "L":
+            flags = pd.Series(np.char.upper(values))
+            return flags.map(
+                {b"T": True, b"Y": True, b"F": False, b"N": False}
+            )
+
+        strings = pd.Series(
+            np.char.decode(np.char.rstrip(values), self.encoding)
+        )
+        return strings.where(strings != "", None)
+
+    def _to_dataframe(self, block: bytes) -> pd.DataFrame:
+        records = np.frombuffer(block, dtype=self._dtype)
+        records = records[records["_deleted"] != b"*"]
+        df = pd.DataFrame(
+            {
+                field[0]: self._decode(field, records[field[0]])
+                for field in self._selected
+            }
+        )
+        for column in self.columns:
+            if column not in df.columns:
+                df[column] = None
+        return df[self.columns]
+
+    def iter_batches(self, batch_size: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        Yields DataFrames of up to `batch_size` records, in file order.
+        """
+        self.records = 0
+        self.elapsed = 0.0
+        with open(self.fname, "rb") as dbf:
+            dbf.seek(self.header_length)
+            remaining = self.numrec
+            while remaining > 0:
+                st = time.perf_counter()
+                rows = min(batch_size, remaining)
+                block = dbf.read(rows * self.record_length)
+                rows = len(block) // self.record_length
+                if rows == 0:
+                    break
+                df = self._to_dataframe(block[: rows * self.record_length])
+                remaining -= rows
+                self.records += rows
+                self.elapsed += time.perf_counter() - st
+                yield df
+
+        logger.info(
+            f"{Path(self.fname).name}: {self.records} records read in "
+            f"{self.elapsed:.2f}s ({self.records_per_second:.0f} records/s)"
+        )
+
+    def read(self) -> pd.DataFrame:
+        """
+        Reads the whole file into a single DataFrame.
+        """
+        batches = list(self.iter_batches())
+        if not batches:
+            return self._to_dataframe(b"")
+        return pd.concat(batches, ignore_index=True)
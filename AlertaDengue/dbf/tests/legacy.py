@@ -0,0 +1,241 @@
+"""
+Old np.vectorize implementations of the dbf.utils and upload.sinan.utils
+column converters, used as golden reference for the columnar ones. Both
+modules had the same converters, except add_dv, convert_date and
+fill_id_agravo, whose upload.sinan.utils versions are the sinan_* ones.
+"""
+import datetime as dt
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
+from loguru import logger
+
+
+def calculate_digit(dig: str) -> int:
+    """
+    Calculates the verifier digit of the municipality geocode.
+    Parameters
+    ----------
+        geocode: str
+            IBGE codes of municipalities in Brazil.
+    Returns
+    -------
+        digit: the verifier digit.
+    """
+
+    peso = [1, 2, 1, 2, 1, 2, 0]
+    soma = 0
+    dig = str(dig)
+    for i in range(6):
+        valor = int(dig[i]) * peso[i]
+        soma += sum([int(d) for d in str(valor)]) if valor > 9 else valor
+    dv = 0 if soma % 10 == 0 else (10 - (soma % 10))
+    return dv
+
+
+@np.vectorize
+def add_dv(geocode: str) -> int:
+    """
+    Returns the geocode of the municipality by adding the verifier digit.
+    If the input geocode is already 7 digits long, it is returned as is.
+    If the input geocode is 6 digits long, the verifier digit is calculated
+        and appended to the end.
+    If the input geocode is 0 digits long, a log message is printed
+        and 0 is returned.
+    Parameters
+    ----------
+        geocode: IBGE codes of municipalities in Brazil.
+    Returns
+    -------
+        geocode: geocode 7 digit.
+    """
+
+    if len(str(geocode)) == 7:
+        return int(geocode)
+    elif len(str(geocode)) == 6:
+        return int(str(geocode) + str(calculate_digit(geocode)))
+
+    raise ValueError(f"geocode:{geocode} does not match!")
+
+
+@np.vectorize
+def fix_nu_notif(value: Union[str, None]) -> Optional[int]:
+    """
+    Formats NU_NOTIF field value.
+    Parameters
+    ----------
+        value: Union[str, None]
+            Value of NU_NOTIF field.
+    Returns
+    -------
+        Optional[int]: Formatted NU_NOTIF field value.
+    Raises
+    ------
+        ValueError: If value cannot be converted to int.
+    """
+    char_to_replace = {",": "", "'": "", ".": ""}
+    if value is None:
+        return None
+
+    try:
+        return int(value)
+    except ValueError:
+        # Replace multiple characters.
+        for char, replacement in char_to_replace.items():
+            value = value.replace(char, replacement)
+
+        try:
+            return int(value)
+        except ValueError:
+            logger.error(f"Invalid NU_NOTIF value: {value}")
+            return None
+
+
+@np.vectorize
+def fill_id_agravo(col: str, default_cid: str) -> str:
+    """
+    Fills missing values in col with default_cid.
+    Parameters
+    ----------
+        col (np.ndarray): A numpy array with missing values.
+        default_cid (str): A default value to fill in the missing values.
+    Returns
+    -------
+        str: String with missing values filled using default_cid.
+    """
+
+    if col is None:
+        if default_cid is None:
+            raise ValidationError(
+                _(
+                    "Existem nesse arquivo notificações que não incluem "
+                    "a coluna ID_AGRAVO."
+                )
+            )
+        else:
+            return default_cid
+    else:
+        return col
+
+
+@np.vectorize
+def convert_date(col: Union[pd.Series, dt.datetime]) -> Optional[pd.Series]:
+    """
+    Convert a column of dates to datetime.date objects.
+    Parameters
+    ----------
+    col : Union[pd.Series, np.ndarray]
+        A pandas.Series or numpy array containing date strings.
+
+    Returns
+    -------
+    Optional[np.ndarray]
+        A Any of datetime.date objects, or None if the input is null.
+    """
+
+    if pd.isnull(col):
+        return None
+    else:
+        return pd.to_datetime(col).to_pydatetime().date()
+
+
+@np.vectorize
+def convert_sem_not(col: np.ndarray[int]) -> np.ndarray[int]:
+    """
+    Converts a given column of integers to its last two digits.
+    Parameters
+    ----------
+    col : numpy.ndarray[int]
+        A column of integers to be converted.
+    Returns
+    -------
+    numpy.ndarray[int]
+        A column of integers with only its last two digits.
+    """
+    return int(str(int(col))[-2:])
+
+
+@np.vectorize
+def convert_nu_ano(year: str, col: pd.Series) -> int:
+    """
+    Convert the given 'year' string to an integer if 'col' is NaN,
+    otherwise convert 'col' to an integer.
+    Parameters
+    ----------
+        year: A string representing the year.
+        col: A pandas series representing a column of a dataframe.
+    Returns
+    -------
+        int: A column of integers.
+    """
+
+    return int(year) if pd.isnull(col) else int(col)
+
+
+@np.vectorize
+def convert_sem_pri(col: str) -> int:
+    """
+    Converts a column of data from a string to an integer representing
+    the last two digits of the string.
+    Parameters
+    ----------
+        col (str): A column of data.
+    Returns
+    -------
+        int: The last two digits of the string as an integer.
+    """
+
+    if col:
+        col = str(col)[-2:]
+
+    return int(col)
+
+
+@np.vectorize
+def sinan_add_dv(geocodigo):
+    miscalculated_geocodes = {
+        "2201911": 2201919,
+        "2201986": 2201988,
+        "2202257": 2202251,
+        "2611531": 2611533,
+        "3117835": 3117836,
+        "3152139": 3152131,
+        "4305876": 4305871,
+        "5203963": 5203962,
+        "5203930": 5203939,
+    }
+
+    try:
+        if len(str(geocodigo)) == 7:
+            return int(geocodigo)
+        elif len(str(geocodigo)) == 6:
+            geocode = int(str(geocodigo) + str(calculate_digit(geocodigo)))
+            if str(geocode) in miscalculated_geocodes:
+                return miscalculated_geocodes[str(geocode)]
+            return int(geocode)
+        else:
+            return None
+    except (ValueError, TypeError):
+        return None
+
+
+@np.vectorize
+def sinan_convert_date(
+    col: Union[pd.Timestamp, str, None]
+) -> Optional[dt.date]:
+    try:
+        if pd.isnull(col):
+            return None
+        if isinstance(col, dt.date):
+            return col
+        return pd.to_datetime(col).date()
+    except Exception:
+        return None
+
+
+@np.vectorize
+def sinan_fill_id_agravo(cid: str, default_cid: str) -> str:
+    return default_cid if not cid else cid
@@ -1,10 +1,14 @@
 import collections.abc
+import os
+import tempfile
 from datetime import date, timedelta
+from unittest import mock
 
 import numpy as np
 import pandas as pd
+from dbf import pysus
 from dbf.pysus import COL_TO_RENAME, PySUS, add_se, calc_birth_date
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
 
 class Test_LoadPySUS(TestCase):
@@ -56,3 +60,195 @@ class Test_LoadPySUS(TestCase):
 
     def test_upsert_to_pgsql(self):
         pass
+
+
+class TestAddSe(SimpleTestCase):
+    def test_mistyped_dates(self):
+        """
+        A date out of the epidemiological calendar gets week 0 instead of
+        failing the whole file.
+        """
+        dt_notific = pd.Series(
+            [date(2016, 3, 15), date(201, 3, 15), None, date(2016, 1, 3)]
+        )
+        self.assertEqual(add_se(dt_notific).tolist(), [11, 0, 0, 1])
+
+
+class SavepointConnection:
+    """
+    psycopg2 connection whose commits and rollbacks are savepoints, so
+    everything upsert_to_pgsql writes stays in the transaction of the test.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._execute("SAVEPOINT pysus_test;")
+
+    def _execute(self, sql: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def cursor(self, *args, **kwargs):
+        return self.connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._execute("RELEASE SAVEPOINT pysus_test; SAVEPOINT pysus_test;")
+
+    def rollback(self):
+        self._execute("ROLLBACK TO SAVEPOINT pysus_test;")
+
+    def close(self):
+        pass
+
+
+class TestUpsertToPgsql(SimpleTestCase):
+    """
+    upsert_to_pgsql on a seeded notification, rolled back at the end of
+    each test.
+    """
+
+    def setUp(self):
+        self.connection = pysus._get_postgres_connection()
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT * FROM "Municipio"."Notificacao" LIMIT 0;')
+            self.columns = [
+                c.name for c in cursor.description if c.name != "id"
+            ]
+            cursor.execute(
+                """
+                INSERT INTO "Municipio"."Notificacao" (
+                    dt_notific, se_notif, ano_notif, municipio_geocodigo,
+                    nu_notific, cid10_codigo, cs_sexo, nu_idade_n
+                )
+                VALUES ('2024-01-10', 2, 2024, 3304557, 999000001, 'A90',
+                    'F', 4030)
+                RETURNING id;
+                """
+            )
+            self.seeded_id = cursor.fetchone()[0]
+
+        fd, self.log_path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        patches = [
+            mock.patch.object(
+                pysus,
+                "_get_postgres_connection",
+                return_value=SavepointConnection(self.connection),
+            ),
+            mock.patch.object(pysus.Log, "file_path", self.log_path),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.connection.rollback()
+        self.connection.close()
+        os.remove(self.log_path)
+
+    def notifications(self, *rows: dict) -> pd.DataFrame:
+        """
+        Rows as parse_dataframe returns them: nu_idade_n is float, as the
+        int columns with nulls are.
+        """
+        default = {
+            "dt_notific": date(2024, 1, 10),
+            "se_notif": 2,
+            "ano_notif": 2024,
+            "municipio_geocodigo": 3304557,
+            "cid10_codigo": "A90",
+            "cs_sexo": "F",
+            "nu_idade_n": 4030.0,
+        }
+        return pd.DataFrame([{**default, **row} for row in rows]).reindex(
+            columns=self.columns
+        )
+
+    def upsert(self, df: pd.DataFrame):
+        with mock.patch.object(PySUS, "get_data"), mock.patch.object(
+            PySUS, "parse_dataframe", return_value=df
+        ):
+            return PySUS("2024", "dengue").upsert_to_pgsql()
+
+    def fetch(self, sql: str, ids: list) -> list:
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, (tuple(ids),))
+            return cursor.fetchall()
+
+    def test_inserted_and_updated_ids(self):
+        df = self.notifications(
+            {"nu_notific": 999000001, "cs_sexo": "M"},
+            {"nu_notific": 999000002},
+        )
+        inserted, updated = self.upsert(df)
+        self.assertEqual(updated, [self.seeded_id])
+        self.assertEqual(len(inserted), 1)
+        self.assertNotEqual(inserted[0], self.seeded_id)
+        self.assertEqual(
+            self.fetch(
+                'SELECT cs_sexo FROM "Municipio"."Notificacao" '
+                "WHERE id IN %s;",
+                updated,
+            ),
+            [("M",)],
+        )
+
+    def test_duplicates_keep_the_last_row(self):
+        df = self.notifications(
+            {"nu_notific": 999000002, "cs_sexo": "F"},
+            {"nu_notific": 999000002, "cs_sexo": "M"},
+        )
+        inserted, updated = self.upsert(df)
+        self.assertEqual(updated, [])
+        self.assertEqual(
+            self.fetch(
+                'SELECT cs_sexo FROM "Municipio"."Notificacao" '
+                "WHERE id IN %s;",
+                inserted,
+            ),
+            [("M",)],
+        )
+
+    def test_bad_row_falls_back_to_row_by_row(self):
+        df = self.notifications(
+            {"nu_notific": 999000002},
+            {"nu_notific": 999000003, "cs_sexo": "XX"},
+            {"nu_notific": 999000004},
+        )
+        with mock.patch.object(
+            PySUS,
+            "_upsert_rows",
+            autospec=True,
+            side_effect=PySUS._upsert_rows,
+        ) as upsert_rows:
+            inserted, updated = self.upsert(df)
+        upsert_rows.assert_called_once()
+        self.assertEqual(updated, [])
+        self.assertCountEqual(
+            self.fetch(
+                'SELECT nu_notific FROM "Municipio"."Notificacao" '
+                "WHERE id IN %s;",
+                inserted,
+            ),
+            [(999000002,), (999000004,)],
+        )
+        with open(self.log_path) as log:
+            self.assertIn("999000003", log.read())
+
+    def test_nullable_int_column_goes_through_copy(self):
+        df = self.notifications(
+            {"nu_notific": 999000002},
+            {"nu_notific": 999000003, "nu_idade_n": None},
+        )
+        self.assertEqual(df["nu_idade_n"].dtype, np.float64)
+        with mock.patch.object(PySUS, "_upsert_rows") as upsert_rows:
+            inserted, updated = self.upsert(df)
+        upsert_rows.assert_not_called()
+        self.assertCountEqual(
+            self.fetch(
+                'SELECT nu_idade_n FROM "Municipio"."Notificacao" '
+                "WHERE id IN %s;",
+                inserted,
+            ),
+            [(4030,), (None,)],
+        )
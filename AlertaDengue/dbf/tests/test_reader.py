@@ -0,0 +1,57 @@
+import datetime
+import os
+from unittest import TestCase
+
+import pandas as pd
+from dbf.reader import DBFReader
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "data/")
+
+
+class TestDBFReader(TestCase):
+    def setUp(self):
+        self.fname = os.path.join(
+            TEST_DATA_DIR, "mixed_notification_years.dbf"
+        )
+
+    def test_fields(self):
+        reader = DBFReader(self.fname)
+        self.assertEqual(reader.numrec, 2)
+        self.assertIn("ID_MUNICIP", reader.field_names)
+        self.assertEqual(reader.fields[0], ("NU_ANO", "C", 6, 0))
+
+    def test_read_selected_columns(self):
+        df = DBFReader(
+            self.fname, columns=["NU_ANO", "ID_MUNICIP", "DT_SIN_PRI"]
+        ).read()
+        self.assertEqual(
+            list(df.columns), ["NU_ANO", "ID_MUNICIP", "DT_SIN_PRI"]
+        )
+        self.assertEqual(list(df.NU_ANO), ["2016", "2015"])
+        self.assertEqual(list(df.ID_MUNICIP), ["320030", "320030"])
+        self.assertEqual(
+            df.DT_SIN_PRI.dt.date.tolist(), [datetime.date(2016, 1, 3)] * 2
+        )
+
+    def test_missing_columns_are_filled(self):
+        df = DBFReader(self.fname, columns=["NU_ANO", "ID_MN_RESI"]).read()
+        self.assertTrue(df.ID_MN_RESI.isna().all())
+
+    def test_blank_strings_are_null(self):
+        df = DBFReader(
+            os.path.join(TEST_DATA_DIR, "id_agravo_null.dbf"),
+            columns=["ID_AGRAVO"],
+        ).read()
+        self.assertTrue(pd.isnull(df.ID_AGRAVO[0]))
+
+    def test_iter_batches(self):
+        reader = DBFReader(self.fname, columns=["NU_ANO"])
+        batches = list(reader.iter_batches(batch_size=1))
+        self.assertEqual([len(b) for b in batches], [1, 1])
+        self.assertEqual(reader.records, 2)
+        self.assertGreater(reader.records_per_second, 0)
+
+    def test_set_columns(self):
+        reader = DBFReader(self.fname)
+        reader.columns = ["ID_MUNICIP"]
+        self.assertEqual(list(reader.read().columns), ["ID_MUNICIP"])
@@ -0,0 +1,110 @@
+import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from dbf import utils
+from dbf.tests import legacy
+from django.core.exceptions import ValidationError
+
+
+def as_list(values) -> list:
+    """Normalizes missing values, so outputs can be compared"""
+    return [None if pd.isnull(v) else v for v in values]
+
+
+class TestColumnarConverters(TestCase):
+    """
+    Golden output tests: the columnar converters must return the same
+    values as the old np.vectorize ones
+    """
+
+    def assertSameOutput(self, func, legacy_func, *args):
+        self.assertEqual(as_list(func(*args)), as_list(legacy_func(*args)))
+
+    def test_calculate_digits(self):
+        geocodes = np.arange(110000, 530000, 37)
+        self.assertEqual(
+            list(utils.calculate_digits(geocodes)),
+            [legacy.calculate_digit(g) for g in geocodes],
+        )
+
+    def test_add_dv(self):
+        geocodes = pd.Series(["330455", "3304557", "355030", 310620])
+        self.assertSameOutput(utils.add_dv, legacy.add_dv, geocodes)
+
+    def test_add_dv_invalid_geocode(self):
+        with self.assertRaises(ValueError):
+            utils.add_dv(pd.Series(["330455", "33045"]))
+
+    def test_fix_nu_notif(self):
+        values = pd.Series(["1234567", "1.234.567", "12,345", "'123'", "0"])
+        self.assertSameOutput(utils.fix_nu_notif, legacy.fix_nu_notif, values)
+
+    def test_fix_nu_notif_invalid(self):
+        values = pd.Series([None, "1234567", "12a34", "7654321"])
+        self.assertEqual(
+            as_list(utils.fix_nu_notif(values)),
+            [None, 1234567, None, 7654321],
+        )
+
+    def test_fix_nu_notif_numeric(self):
+        values = pd.Series([1234567, 7654321])
+        self.assertSameOutput(utils.fix_nu_notif, legacy.fix_nu_notif, values)
+
+    def test_convert_date(self):
+        values = pd.Series(
+            [
+                "2023-01-15",
+                None,
+                "2022-12-31",
+                datetime.date(2021, 5, 3),
+                "20230601",
+            ]
+        )
+        self.assertSameOutput(utils.convert_date, legacy.convert_date, values)
+
+    def test_convert_date_datetime64(self):
+        values = pd.to_datetime(pd.Series(["2023-01-15", None]))
+        self.assertSameOutput(utils.convert_date, legacy.convert_date, values)
+
+    def test_convert_sem_not(self):
+        values = pd.Series(["202301", "202352", 202310])
+        self.assertSameOutput(
+            utils.convert_sem_not, legacy.convert_sem_not, values
+        )
+
+    def test_convert_sem_pri(self):
+        values = pd.Series(["202301", "202352", "202310"])
+        self.assertSameOutput(
+            utils.convert_sem_pri, legacy.convert_sem_pri, values
+        )
+
+    def test_convert_nu_ano(self):
+        values = pd.Series(["2023", None, "2022"])
+        self.assertSameOutput(
+            utils.convert_nu_ano, legacy.convert_nu_ano, "2024", values
+        )
+
+    def test_fill_id_agravo(self):
+        values = pd.Series(["A90", None, "A92.0"])
+        self.assertSameOutput(
+            utils.fill_id_agravo, legacy.fill_id_agravo, values, "A90"
+        )
+
+    def test_fill_id_agravo_without_default(self):
+        with self.assertRaises(ValidationError):
+            utils.fill_id_agravo(pd.Series(["A90", None]), None)
+
+
+class TestDbfParquetDir(TestCase):
+    def test_same_name_in_different_directories(self):
+        first = utils.dbf_parquet_dir("/data/2023/DENGBR23.dbf")
+        second = utils.dbf_parquet_dir("/data/uploads/DENGBR23.dbf")
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.parent, utils.dbf_pqt_dir)
+        self.assertTrue(first.name.startswith("DENGBR23-"))
+        self.assertEqual(
+            first, utils.dbf_parquet_dir("/data/2023/../2023/DENGBR23.dbf")
+        )
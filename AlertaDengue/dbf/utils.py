@@ -1,23 +1,27 @@
-import datetime as dt
 import glob
+import hashlib
 from pathlib import Path
-from typing import Any, Iterator, List, Optional, Tuple, Union
+from typing import Any, Iterator, List, Tuple, Union
 
 import dask.dataframe as dd
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+from dados.dbdata import calculate_digits, fix_nu_notif, to_datetime
+from dbf.reader import DBFReader
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 from loguru import logger
-from simpledbf import Dbf5
 
 # Directories
 temp_files_dir = Path(settings.TEMP_FILES_DIR)
 dbf_sinan_dir = Path(settings.DBF_SINAN) / "dbf_duplicated_csv"
 dbf_pqt_dir = temp_files_dir / "dbf_parquet"
 
+# rows of each parquet chunk of a DBF converted by read_dbf
+DBF_PARQUET_CHUNKSIZE = 100000
+
 EXPECTED_FIELDS = [
     "NU_ANO",
     "ID_MUNICIP",
@@ -96,15 +100,13 @@ def calculate_digit(dig: str) -> int:
     return dv
 
 
-@np.vectorize
-def add_dv(geocode: str) -> int:
+def add_dv(geocode: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
     Returns the geocode of the municipality by adding the verifier digit.
     If the input geocode is already 7 digits long, it is returned as is.
     If the input geocode is 6 digits long, the verifier digit is calculated
         and appended to the end.
-    If the input geocode is 0 digits long, a log message is printed
-        and 0 is returned.
+    Any other geocode raises a ValueError.
     Parameters
     ----------
         geocode: IBGE codes of municipalities in Brazil.
@@ -112,46 +114,20 @@ def add_dv(geocode: str) -> int:
     -------
         geocode: geocode 7 digit.
     """
+    codes = pd.Series(geocode, copy=False).astype(str)
+    is_7 = codes.str.fullmatch(r"\d{7}|[+-]\d{6}")
+    is_6 = codes.str.fullmatch(r"\d{6}")
 
-    if len(str(geocode)) == 7:
-        return int(geocode)
-    elif len(str(geocode)) == 6:
-        return int(str(geocode) + str(calculate_digit(geocode)))
-
-    raise ValueError(f"geocode:{geocode} does not match!")
-
-
-@np.vectorize
-def fix_nu_notif(value: Union[str, None]) -> Optional[int]:
-    """
-    Formats NU_NOTIF field value.
-    Parameters
-    ----------
-        value: Union[str, None]
-            Value of NU_NOTIF field.
-    Returns
-    -------
-        Optional[int]: Formatted NU_NOTIF field value.
-    Raises
-    ------
-        ValueError: If value cannot be converted to int.
-    """
-    char_to_replace = {",": "", "'": "", ".": ""}
-    if value is None:
-        return None
-
-    try:
-        return int(value)
-    except ValueError:
-        # Replace multiple characters.
-        for char, replacement in char_to_replace.items():
-            value = value.replace(char, replacement)
+    if not (is_7 | is_6).all():
+        raise ValueError(
+            f"geocode:{codes[~(is_7 | is_6)].iloc[0]} does not match!"
+        )
 
-        try:
-            return int(value)
-        except ValueError:
-            logger.error(f"Invalid NU_NOTIF value: {value}")
-            return None
+    result = np.empty(len(codes), dtype=np.int64)
+    result[is_7.to_numpy()] = codes[is_7].astype(np.int64)
+    codes_6 = codes[is_6].astype(np.int64).to_numpy()
+    result[is_6.to_numpy()] = codes_6 * 10 + calculate_digits(codes_6)
+    return result
 
 
 def convert_data_types(col: pd.Series, dtype: type) -> pd.Series:
@@ -184,8 +160,9 @@ def convert_data_types(col: pd.Series, dtype: type) -> pd.Series:
     return col
 
 
-@np.vectorize
-def fill_id_agravo(col: str, default_cid: str) -> str:
+def fill_id_agravo(
+    col: Union[pd.Series, np.ndarray], default_cid: str
+) -> np.ndarray:
     """
     Fills missing values in col with default_cid.
     Parameters
@@ -194,25 +171,23 @@ def fill_id_agravo(col: str, default_cid: str) -> str:
         default_cid (str): A default value to fill in the missing values.
     Returns
     -------
-        str: String with missing values filled using default_cid.
+        np.ndarray: Array with missing values filled using default_cid.
     """
-
-    if col is None:
-        if default_cid is None:
-            raise ValidationError(
-                _(
-                    "Existem nesse arquivo notificações que não incluem "
-                    "a coluna ID_AGRAVO."
-                )
+    col = pd.Series(col, copy=False)
+    missing = col.isna()
+
+    if missing.any() and default_cid is None:
+        raise ValidationError(
+            _(
+                "Existem nesse arquivo notificações que não incluem "
+                "a coluna ID_AGRAVO."
             )
-        else:
-            return default_cid
-    else:
-        return col
+        )
+
+    return np.where(missing, default_cid, col.to_numpy(dtype=object))
 
 
-@np.vectorize
-def convert_date(col: Union[pd.Series, dt.datetime]) -> Optional[pd.Series]:
+def convert_date(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
     Convert a column of dates to datetime.date objects.
     Parameters
@@ -222,36 +197,35 @@ def convert_date(col: Union[pd.Series, dt.datetime]) -> Optional[pd.Series]:
 
     Returns
     -------
-    Optional[np.ndarray]
-        A Any of datetime.date objects, or None if the input is null.
+    np.ndarray
+        An object array of datetime.date objects, None where the input
+        is null.
     """
-
-    if pd.isnull(col):
-        return None
-    else:
-        return pd.to_datetime(col).to_pydatetime().date()
+    dates = to_datetime(pd.Series(col, copy=False), errors="raise")
+    return np.where(dates.isna(), None, dates.dt.date.to_numpy(dtype=object))
 
 
-@np.vectorize
-def convert_sem_not(col: np.ndarray[int]) -> np.ndarray[int]:
+def convert_sem_not(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
     Converts a given column of integers to its last two digits.
     Parameters
     ----------
-    col : numpy.ndarray[int]
+    col : Union[pd.Series, np.ndarray]
         A column of integers to be converted.
     Returns
     -------
     numpy.ndarray[int]
         A column of integers with only its last two digits.
     """
-    return int(str(int(col))[-2:])
+    return (
+        pd.to_numeric(pd.Series(col, copy=False)).to_numpy(dtype=np.int64)
+        % 100
+    )
 
 
-@np.vectorize
-def convert_nu_ano(year: str, col: pd.Series) -> int:
+def convert_nu_ano(year: str, col: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
-    Convert the given 'year' string to an integer if 'col' is NaN,
+    Convert the given 'year' string to an integer where 'col' is NaN,
     otherwise convert 'col' to an integer.
     Parameters
     ----------
@@ -259,29 +233,32 @@ def convert_nu_ano(year: str, col: pd.Series) -> int:
         col: A pandas series representing a column of a dataframe.
     Returns
     -------
-        int: A column of integers.
+        np.ndarray: A column of integers.
     """
-
-    return int(year) if pd.isnull(col) else int(col)
+    return (
+        pd.to_numeric(pd.Series(col, copy=False))
+        .fillna(int(year))
+        .to_numpy(dtype=np.int64)
+    )
 
 
-@np.vectorize
-def convert_sem_pri(col: str) -> int:
+def convert_sem_pri(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
     """
     Converts a column of data from a string to an integer representing
     the last two digits of the string.
     Parameters
     ----------
-        col (str): A column of data.
+        col (Union[pd.Series, np.ndarray]): A column of data.
     Returns
     -------
-        int: The last two digits of the string as an integer.
+        np.ndarray: The last two digits of each value as integers.
     """
+    col = pd.Series(col, copy=False)
 
-    if col:
-        col = str(col)[-2:]
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy(dtype=np.int64) % 100
 
-    return int(col)
+    return pd.to_numeric(col.astype(str).str[-2:]).to_numpy(dtype=np.int64)
 
 
 def parse_data(df: pd.DataFrame, default_cid: str, year: int) -> pd.DataFrame:
@@ -505,9 +482,20 @@ def chunk_gen(chunksize: int, totalsize: int) -> Iterator[Tuple[int, int]]:
         yield chunks * chunksize, chunks * chunksize + rest
 
 
+def dbf_parquet_dir(fname: str) -> Path:
+    """
+    Directory of the parquet chunks of a DBF converted by read_dbf: its
+    name plus a hash of its absolute path, so DBFs with the same name in
+    different directories don't share their chunks.
+    """
+    path = Path(fname).resolve()
+    digest = hashlib.sha1(str(path).encode()).hexdigest()[:12]
+    return dbf_pqt_dir / f"{path.stem}-{digest}"
+
+
 def read_dbf(fname: str) -> pd.DataFrame:
     """
-    Generator to read the DBF in chunks.
+    Reads the DBF in chunks, in a single sequential pass.
     Filtering columns from the field_map dictionary on DataFrame and export
     to parquet files.
     Parameters
@@ -519,25 +507,19 @@ def read_dbf(fname: str) -> pd.DataFrame:
     pd.DataFrame
         DataFrame containing the data from the DBF file.
     """
-    dbf = Dbf5(fname, codec="iso-8859-1")
-    dbf_name = str(dbf.dbf)[:-4]
-    dbf_fields = dbf.fields
-    expeceted_cols = list_expected_fields(dbf_fields)
-    parquet_dir = dbf_pqt_dir / f"{dbf_name}"
+    dbf = DBFReader(fname)
+    dbf_name = Path(fname).stem
+    expeceted_cols = list_expected_fields(dbf.fields)
+    dbf.columns = [col for col in expeceted_cols if col in dbf.field_names]
+    parquet_dir = dbf_parquet_dir(fname)
 
     if not parquet_dir.is_dir():
         logger.info("Converting DBF file to Parquet format...")
         Path.mkdir(parquet_dir, parents=True, exist_ok=True)
-        for chunk, (lowerbound, upperbound) in enumerate(
-            chunk_gen(1000, dbf.numrec)
+        for chunk, df in enumerate(
+            dbf.iter_batches(batch_size=DBF_PARQUET_CHUNKSIZE)
         ):
             parquet_fname = f"{parquet_dir}/{dbf_name}-{chunk}.parquet"
-            df = gpd.read_file(
-                fname,
-                include_fields=expeceted_cols,
-                rows=slice(lowerbound, upperbound),
-                ignore_geometry=True,
-            )
             df = _parse_fields(dbf_name, df)
             df.to_parquet(parquet_fname)
 
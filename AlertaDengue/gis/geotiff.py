@@ -1,9 +1,12 @@
+import math
 import multiprocessing as mp
 import os
 import traceback as tb
 from copy import copy
 from datetime import datetime
 from glob import glob
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import fiona
 import geopy.distance
@@ -20,8 +23,13 @@ from ad_main.settings import (
 )
 from dados.dbdata import RegionalParameters
 from rasterio import Affine
-from rasterio.features import rasterize
+from rasterio.features import geometry_mask, rasterize
 from rasterio.transform import from_origin
+from shapely.geometry import shape
+from shapely.geometry.base import BaseGeometry
+
+# geometries of the shapefile of a city and their bounds
+CityShape = Tuple[List[BaseGeometry], Tuple[float, float, float, float]]
 
 
 def convert_from_shapefile(shapefile, rgb_color):
@@ -206,15 +214,180 @@ def increase_resolution(raster_file_path: str, factor_increase: int):
         dst.write(image)
 
 
+def read_city_shapes(geocodes: Iterable[int]) -> Dict[int, CityShape]:
+    """
+    Geometries and bounds of the shapefiles of the cities, by geocode.
+    The cities without a shapefile are left out.
+    """
+    city_shapes = {}
+    for geocode in geocodes:
+        shapefile_path = os.path.join(SHAPEFILE_PATH, "%s.shp" % geocode)
+        if not os.path.exists(shapefile_path):
+            continue
+        with fiona.open(shapefile_path, "r") as shapefile:
+            city_shapes[geocode] = (
+                [shape(feature["geometry"]) for feature in shapefile],
+                tuple(shapefile.bounds),
+            )
+    return city_shapes
+
+
+def bounds_window(
+    transform: Affine,
+    bounds: Tuple[float, float, float, float],
+    raster_shape: Tuple[int, int],
+) -> Tuple[slice, slice]:
+    """
+    Rows and columns of the pixels of a raster of `raster_shape` (height,
+    width) and `transform` that intersect `bounds` (the window of
+    `rasterio.mask.mask` with crop=True).
+    """
+    left, bottom, right, top = bounds
+    cols, rows = zip(
+        *(
+            ~transform * corner
+            for corner in (
+                (left, top),
+                (right, top),
+                (right, bottom),
+                (left, bottom),
+            )
+        )
+    )
+    height, width = raster_shape
+    row_start = min(max(math.floor(min(rows)), 0), height)
+    row_stop = min(max(math.ceil(max(rows)), row_start), height)
+    col_start = min(max(math.floor(min(cols)), 0), width)
+    col_stop = min(max(math.ceil(max(cols)), col_start), width)
+    return slice(row_start, row_stop), slice(col_start, col_stop)
+
+
+def clip_raster(
+    image: np.ndarray,
+    transform: Affine,
+    city_shape: CityShape,
+    factor_increase: int,
+) -> Tuple[np.ndarray, Affine]:
+    """
+    Crops the pixels of `image` (bands, height, width) under the bounds of a
+    city, increases their resolution `factor_increase` times (nearest
+    neighbour, as `increase_resolution`) and sets the pixels out of the
+    city to nan, in memory.
+
+    The result is the same as `mask_raster_with_shapefile`, then
+    `increase_resolution`, then `mask_raster_with_shapefile` again, but
+    only the window of the city in the finer grid is built.
+    """
+    geometries, bounds = city_shape
+    res = int(factor_increase)
+
+    rows, cols = bounds_window(transform, bounds, image.shape[1:])
+    window = image[:, rows, cols]
+    transform = transform * Affine.translation(cols.start, rows.start)
+
+    # the window of the city in the grid `res` times finer
+    fine_transform = transform * Affine.scale(1 / res)
+    fine_rows, fine_cols = bounds_window(
+        fine_transform,
+        bounds,
+        (window.shape[1] * res, window.shape[2] * res),
+    )
+    out_image = window[
+        :,
+        np.arange(fine_rows.start, fine_rows.stop)[:, None] // res,
+        np.arange(fine_cols.start, fine_cols.stop)[None, :] // res,
+    ]
+    out_transform = fine_transform * Affine.translation(
+        fine_cols.start, fine_rows.start
+    )
+
+    if out_image.size:
+        out_image[
+            :,
+            geometry_mask(
+                geometries,
+                out_shape=out_image.shape[1:],
+                transform=out_transform,
+                all_touched=True,
+            ),
+        ] = np.nan
+    return out_image, out_transform
+
+
+class SharedRaster:
+    """
+    Bands of a raster in a shared memory block, read once by the parent
+    process and attached by the workers of the pool.
+    """
+
+    def __init__(self, raster_input_file_path: str):
+        with rasterio.open(raster_input_file_path) as src:
+            image = src.read()
+            self.meta = src.meta.copy()
+
+        self.shape = image.shape
+        self.dtype = image.dtype.str
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(image.nbytes, 1)
+        )
+        self.name = self._shm.name
+        self.array()[:] = image
+
+    def array(self) -> np.ndarray:
+        return np.ndarray(self.shape, self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        # the workers get the name of the block, not the block
+        state = self.__dict__.copy()
+        del state["_shm"]
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._shm.close()
+        self._shm.unlink()
+
+
+# shared memory block attached by the worker, and the city shapes given by
+# the initializer of the pool
+_attached: Optional[shared_memory.SharedMemory] = None
+_city_shapes: Dict[int, CityShape] = {}
+
+
+def _init_worker(city_shapes: Dict[int, CityShape]) -> None:
+    global _city_shapes
+    _city_shapes = city_shapes
+
+
+def _attach(raster: SharedRaster) -> np.ndarray:
+    """
+    Array of a raster in shared memory, attached once by worker.
+    """
+    global _attached
+    if _attached is None or _attached.name != raster.name:
+        if _attached is not None:
+            _attached.close()
+        _attached = shared_memory.SharedMemory(name=raster.name)
+        # the block is unlinked by the parent, not by the tracker of the
+        # worker when it exits
+        resource_tracker.unregister(_attached._name, "shared_memory")
+    return np.ndarray(raster.shape, raster.dtype, buffer=_attached.buf)
+
+
 class MeteorologicalRasterProcess:
-    def __init__(self, raster_class, raster_date, raster_input_file_path):
+    def __init__(self, raster_class, raster_date, raster: SharedRaster):
         self.raster_class = raster_class
         self.raster_date = raster_date
-        self.raster_input_file_path = raster_input_file_path
+        self.raster = raster
 
-    def __call__(self, geo_info):
+    def __call__(self, geocode):
         try:
-            geocode, city_name = geo_info
+            city_shape = _city_shapes.get(geocode)
+            if city_shape is None:
+                return
+
             raster_output_dir_path = os.path.join(
                 RASTER_PATH,
                 "meteorological",
@@ -227,35 +400,32 @@ class MeteorologicalRasterProcess:
             if not os.path.exists(raster_output_dir_path):
                 os.makedirs(raster_output_dir_path, exist_ok=True)
 
-            # check if shapefile exists
-            shapefile_path = os.path.join(SHAPEFILE_PATH, "%s.shp" % geocode)
-            if not os.path.exists(shapefile_path):
-                return
-
             raster_output_file_path = os.path.join(
                 raster_output_dir_path,
                 "%s.tif" % self.raster_date.strftime("%Y%m%d"),
             )
 
-            # apply mask on raster using shapefile by city
-            mask_raster_with_shapefile(
-                shapefile_path=shapefile_path,
-                raster_input_file_path=self.raster_input_file_path,
-                raster_output_file_path=raster_output_file_path,
+            # crop, increase resolution and mask by the city in memory
+            out_image, out_transform = clip_raster(
+                _attach(self.raster),
+                self.raster.meta["transform"],
+                city_shape,
+                RASTER_METEROLOGICAL_FACTOR_INCREASE,
             )
 
-            # increase resolution
-            increase_resolution(
-                raster_file_path=raster_output_file_path,
-                factor_increase=RASTER_METEROLOGICAL_FACTOR_INCREASE,
-            )
-
-            # apply mask on increased resolution raster using shapefile by city
-            mask_raster_with_shapefile(
-                shapefile_path=shapefile_path,
-                raster_input_file_path=raster_output_file_path,
-                raster_output_file_path=raster_output_file_path,
+            out_meta = self.raster.meta.copy()
+            out_meta.update(
+                {
+                    "driver": "GTiff",
+                    "height": out_image.shape[1],
+                    "width": out_image.shape[2],
+                    "transform": out_transform,
+                }
             )
+            with rasterio.open(
+                raster_output_file_path, "w", **out_meta
+            ) as dst:
+                dst.write(out_image)
         except Exception:
             if DEBUG:
                 log_path = os.path.join(
@@ -275,6 +445,10 @@ class MeteorologicalRaster:
         Each city can have raster file for datetime regards the datetime from
         the original file (whole country).
 
+        The shapefiles are read once and each country raster is read once,
+        into shared memory; a single pool of processes clips the cities of
+        all the dates.
+
         :param raster_class:
         :param date_start:
         :return:
@@ -283,10 +457,7 @@ class MeteorologicalRaster:
             RASTER_PATH, "meteorological", "country", raster_class, "*"
         )
 
-        cities = RegionalParameters.get_cities().items()
-
-        n_processes = mp.cpu_count()
-
+        rasters = []
         for raster_input_file_path in glob(path_search, recursive=True):
             raster_name = raster_input_file_path.split(os.sep)[-1]
 
@@ -299,14 +470,25 @@ class MeteorologicalRaster:
             if date_start is not None and raster_date < date_start:
                 continue
 
-            # processing
-            p = mp.Pool(n_processes)
+            rasters.append((raster_date, raster_input_file_path))
 
-            p.map(
-                MeteorologicalRasterProcess(
-                    raster_class, raster_date, raster_input_file_path
-                ),
-                cities,
-            )
-            p.close()
-            p.join()
+        if not rasters:
+            return
+
+        city_shapes = read_city_shapes(RegionalParameters.get_cities())
+        n_processes = mp.cpu_count()
+        chunksize = max(len(city_shapes) // (4 * n_processes), 1)
+
+        # processing
+        with mp.Pool(
+            n_processes, initializer=_init_worker, initargs=(city_shapes,)
+        ) as p:
+            for raster_date, raster_input_file_path in sorted(rasters):
+                with SharedRaster(raster_input_file_path) as raster:
+                    p.map(
+                        MeteorologicalRasterProcess(
+                            raster_class, raster_date, raster
+                        ),
+                        city_shapes,
+                        chunksize=chunksize,
+                    )
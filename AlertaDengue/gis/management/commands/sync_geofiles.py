@@ -1,26 +1,28 @@
+import hashlib
 import json
-import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import fiona
-import geojson
-import geopandas as gpd
 import shapely
 from ad_main.settings import get_sqla_conn
 
 # local
 from dados import dbdata, maps
 from django.conf import settings
-from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from shapely.geometry import MultiPolygon, shape
 from sqlalchemy.engine import Engine
 
-from ...geodf import extract_boundaries
-
 DB_ENGINE = get_sqla_conn()
 
+# geocode -> hash of the source geojson, and state -> geocodes of the
+# state file, of the last run
+MANIFEST_NAME = "manifest.json"
+
 
 def get_all_active_cities(
     db_engine: Engine = DB_ENGINE,
@@ -39,11 +41,7 @@ def get_all_active_cities(
         List of city information (geocode, name)
     """
 
-    # Check if the result is already cached
-    res = cache.get("get_all_active_cities")
-
-    if res is None:
-        # If not cached, query the database and cache the result
+    def _active_cities() -> list:
         with db_engine.connect() as conn:
             res = conn.execute(
                 """
@@ -55,129 +53,142 @@ def get_all_active_cities(
                     ON (hist.municipio_geocodigo=city.geocodigo)
                 """
             )
-            res = res.fetchall()
-            cache.set(
-                "get_all_active_cities", res, settings.QUERY_CACHE_TIMEOUT
-            )
-    return res
-
+            return res.fetchall()
 
-class Command(BaseCommand):
-    help = "Generates geojson files and save into staticfiles folder"
+    return dbdata.cache_get_or_set("get_all_active_cities", _active_cities)
 
-    def create_geojson(self, f_path, geocode):
-        """
-        :param f_path:
-        :param geocode:
-        :return:
-        """
 
-        f_name = f_path / f"{geocode}.json"
-
-        geojson_city = geojson.dumps(maps.get_city_geojson(int(geocode)))
-
-        with open(f_name, "w") as f:
-            f.write(geojson_city)
+def create_shapefile(f_path: Path, geocode) -> None:
+    """
+    Converts geojson/<geocode>.json to shapefile/<geocode>.shp.
+    """
+    geojson_path = f_path / "geojson" / f"{geocode}.json"
+    shpfile_path = f_path / "shapefile" / f"{geocode}.shp"
+
+    with fiona.open(geojson_path) as geojson_file:
+        with fiona.open(
+            shpfile_path,
+            "w",
+            crs=geojson_file.crs,
+            driver="ESRI Shapefile",
+            schema=geojson_file.schema.copy(),
+        ) as shp:
+            for item in geojson_file:
+                shp.write(item)
+
+
+def simplify_geojson(f_path: Path, geocode) -> None:
+    """
+    Writes geojson_simplified/<geocode>.json, the geometry of
+    geojson/<geocode>.json simplified as a single Feature.
+    """
+    geojson_simplified_path = f_path / "geojson_simplified" / f"{geocode}.json"
+    geojson_original_path = f_path / "geojson" / f"{geocode}.json"
+
+    with fiona.open(geojson_original_path, "r") as shp:
+        polygon_list = [shape(pol["geometry"]) for pol in shp]
+
+        if len(polygon_list) == 1 and isinstance(
+            polygon_list[0], MultiPolygon
+        ):
+            multipolygon = polygon_list[0]
+        else:
+            multipolygon = MultiPolygon(polygon_list)
+
+        shp_min = multipolygon.simplify(0.005)
+        with open(geojson_simplified_path, "w") as f:
+            properties = shp[0]["properties"]
+            properties_serializable = {
+                key: str(value) for key, value in properties.items()
+            }
+            geojson_geometry = shapely.geometry.mapping(shp_min)
+            geojson_content = {
+                "type": "Feature",
+                "id": str(geocode),
+                "properties": properties_serializable,
+                "geometry": geojson_geometry,
+            }
+            json.dump(geojson_content, f)
+
+
+def extract_geo_info(bounds) -> dict:
+    """
+    Bounds, width and height of a city from its (minx, miny, maxx, maxy).
+    """
+    bounds = [float(bound) for bound in bounds]
+    return {
+        "bounds": bounds,
+        "width": abs(bounds[0] - bounds[2]),
+        "height": abs(bounds[1] - bounds[3]),
+    }
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                "Successfully geojson %s synchronized!" % geocode
-            )
-        )
 
-    def get_geojson(self, f_path, geocode):
+def sync_city(path_root: Path, geocode, geojson_city: str) -> Dict[str, float]:
+    """
+    Writes the geojson, shapefile and simplified geojson files of a city.
+    Runs in the worker processes of `sync_geofiles --jobs N`.
 
-        f_name = f_path / f"{geocode}.json"
+    Returns the seconds taken by each stage.
+    """
+    timings = {}
 
-        with open(f_name, "r") as f:
-            return json.load(f)
+    st = time.perf_counter()
+    with open(path_root / "geojson" / f"{geocode}.json", "w") as f:
+        f.write(geojson_city)
+    timings["geojson"] = time.perf_counter() - st
 
-    def create_shapefile(self, f_path, geocode):
-        """
-        :param f_path:
-        :param geocode:
-        :return:
-        """
+    st = time.perf_counter()
+    create_shapefile(path_root, geocode)
+    timings["shapefile"] = time.perf_counter() - st
 
-        geojson_path = f_path / "geojson" / f"{geocode}.json"
-        shpfile_path = f_path / "shapefile" / f"{geocode}.shp"
-
-        # creates the shapefile
-        with fiona.open(geojson_path) as geojson_file:
-            with fiona.open(
-                shpfile_path,
-                "w",
-                crs=geojson_file.crs,
-                driver="ESRI Shapefile",
-                schema=geojson_file.schema.copy(),
-            ) as shp:
-                for item in geojson_file:
-                    shp.write(item)
-
-    def simplify_geojson(self, f_path, geocode):
-        """
-        :param f_path:
-        :param geocode:
-        :return:
-        """
+    st = time.perf_counter()
+    simplify_geojson(path_root, geocode)
+    timings["simplify"] = time.perf_counter() - st
 
-        geojson_simplified_path = Path(
-            f_path / "geojson_simplified" / f"{geocode}.json"
-        )
+    return timings
 
-        geojson_original_path = Path(f_path / "geojson" / f"{geocode}.json")
 
-        geojson_simplified_dir_path = geojson_simplified_path.parent
+def _read_json(f_name: Path, default: dict) -> dict:
+    if not f_name.exists():
+        return default
+    with open(f_name) as f:
+        return json.load(f)
 
-        geojson_simplified_dir_path.mkdir(parents=True, exist_ok=True)
 
-        if not geojson_original_path.exists():
-            self.stdout.write(
-                self.style.WARNING(
-                    "GeoJSON/simplified %s not synchronized!" % geocode
-                )
-            )
-            return
+class Command(BaseCommand):
+    help = "Generates geojson files and save into staticfiles folder"
 
-        # creates the shapefile
-        with fiona.open(geojson_original_path, "r") as shp:
-            polygon_list = [shape(pol["geometry"]) for pol in shp]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes converting the cities",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild the files of the cities even if unchanged",
+        )
 
-            if len(polygon_list) == 1 and isinstance(
-                polygon_list[0], MultiPolygon
-            ):
-                multipolygon = polygon_list[0]
-            else:
-                multipolygon = MultiPolygon(polygon_list)
-
-            shp_min = multipolygon.simplify(0.005)
-            with open(geojson_simplified_path, "w") as f:
-                properties = shp[0]["properties"]
-                properties_serializable = {
-                    key: str(value) for key, value in properties.items()
-                }
-                geojson_geometry = shapely.geometry.mapping(shp_min)
-                geojson_content = {
-                    "type": "Feature",
-                    "id": str(geocode),
-                    "properties": properties_serializable,
-                    "geometry": geojson_geometry,
-                }
-                json.dump(geojson_content, f)
+    def get_geojson(self, f_path, geocode):
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                "Successfully GeoJSON/simplified %s synchronized!" % geocode
-            )
-        )
+        f_name = f_path / f"{geocode}.json"
 
-    def create_geojson_by_state(self, geojson_simplified_path):
-        # create jsonfiles by state
-        # note: uses 2 steps to minimize memory consumption
+        with open(f_name, "r") as f:
+            return json.load(f)
 
-        # create a dictionary with geocode by ufs
+    def create_geojson_by_state(
+        self, geojson_simplified_path, changed, states_manifest
+    ):
+        """
+        Rebuilds the <state>.json files of the states with a changed city
+        or whose cities changed since the last run (`states_manifest`).
+        Returns the geocodes by state.
+        """
+        # (the active cities come once for each week with alerts)
         geojson_codes_states = {
-            state_code: [] for state_code in dbdata.STATE_NAME.keys()
+            state_code: set() for state_code in dbdata.STATE_NAME.keys()
         }
         for (
             geocode,
@@ -186,24 +197,29 @@ class Command(BaseCommand):
             state_name,
         ) in dbdata.get_all_active_cities_state():
             state_code = dbdata.STATE_INITIAL[state_name]
-            geojson_codes_states[state_code].append(geocode)
-
-        geojson_states: dict = {
-            state_code: {"type": "FeatureCollection", "features": []}
-            for state_code in dbdata.STATE_NAME.keys()
+            geojson_codes_states[state_code].add(geocode)
+        geojson_codes_states = {
+            state_code: sorted(geocodes)
+            for state_code, geocodes in geojson_codes_states.items()
         }
 
         for state_code, geocodes in geojson_codes_states.items():
-            for geocode in geocodes:
-                geojson_content = self.get_geojson(
-                    geojson_simplified_path, geocode
-                )
-                # add id attribute
-                geojson_states[state_code]["features"].append(geojson_content)
-
-        for state_code, geojson_state in geojson_states.items():
             f_name = geojson_simplified_path / f"{state_code}.json"
-
+            if (
+                f_name.exists()
+                and states_manifest.get(state_code) == geocodes
+                and not changed.intersection(geocodes)
+            ):
+                continue
+
+            # note: one state at a time to minimize memory consumption
+            geojson_state = {
+                "type": "FeatureCollection",
+                "features": [
+                    self.get_geojson(geojson_simplified_path, geocode)
+                    for geocode in geocodes
+                ],
+            }
             with open(f_name, "w") as f:
                 json.dump(geojson_state, f)
 
@@ -214,22 +230,7 @@ class Command(BaseCommand):
                 )
             )
 
-    def extract_geo_info_table(self, f_path, geocode):
-        """
-        :param f_path:
-        :param geocode:
-        :return:
-        """
-
-        shpfile_path = f_path / "shapefile" / f"{geocode}.shp"
-
-        gdf = gpd.read_file(shpfile_path)
-
-        bounds = extract_boundaries(gdf).tolist()
-        width = abs(bounds[0] - bounds[2])
-        height = abs(bounds[1] - bounds[3])
-
-        return {geocode: {"bounds": bounds, "width": width, "height": height}}
+        return geojson_codes_states
 
     def handle(self, *args, **options):
         geocodes = list(dict(get_all_active_cities()).keys())
@@ -248,23 +249,95 @@ class Command(BaseCommand):
 
         f_shapefile_path = path_root / "shapefile"
 
-        f_geojson_path.mkdir(parents=True, exist_ok=True)
-
-        f_shapefile_path.mkdir(parents=True, exist_ok=True)
-
+        for f_path in (
+            f_geojson_path,
+            f_geojson_simplified_path,
+            f_shapefile_path,
+        ):
+            f_path.mkdir(parents=True, exist_ok=True)
+
+        manifest_path = f_geojson_path / MANIFEST_NAME
+        manifest = _read_json(manifest_path, {"cities": {}, "states": {}})
+        geo_info_path = f_geojson_path / "geo_info.json"
+        if options["force"]:
+            manifest = {"cities": {}, "states": {}}
+
+        timings = defaultdict(float)
+        st_total = time.perf_counter()
+
+        # the geometries of all the cities are read in one query, only the
+        # cities whose geojson changed (or whose files are missing) are
+        # converted
+        st = time.perf_counter()
+        cities = maps.load_cities_geojson(geocodes=geocodes)
+        timings["fetch"] = time.perf_counter() - st
+
+        st = time.perf_counter()
         geo_info = {}
+        pending = {}
+        for geocode, geojson_city, *bounds in cities[
+            ["geojson"] + maps.BOUNDS
+        ].itertuples():
+            digest = hashlib.sha256(geojson_city.encode()).hexdigest()
+            geo_info[str(geocode)] = extract_geo_info(bounds)
+            if (
+                manifest["cities"].get(str(geocode)) == digest
+                and (f_geojson_simplified_path / f"{geocode}.json").exists()
+                and (f_shapefile_path / f"{geocode}.shp").exists()
+            ):
+                continue
+            pending[geocode] = (geojson_city, digest)
+        timings["compare"] = time.perf_counter() - st
+
+        self.stdout.write(f"{len(pending)} of {len(cities)} cities changed")
+
+        st = time.perf_counter()
+        if options["jobs"] > 1:
+            with ProcessPoolExecutor(max_workers=options["jobs"]) as pool:
+                futures = {
+                    geocode: pool.submit(sync_city, path_root, geocode, data)
+                    for geocode, (data, _) in pending.items()
+                }
+                results = {
+                    geocode: future.result()
+                    for geocode, future in futures.items()
+                }
+        else:
+            results = {
+                geocode: sync_city(path_root, geocode, data)
+                for geocode, (data, _) in pending.items()
+            }
+
+        for geocode, city_timings in results.items():
+            manifest["cities"][str(geocode)] = pending[geocode][1]
+            for stage, seconds in city_timings.items():
+                timings[stage] += seconds
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Successfully geojson %s synchronized!" % geocode
+                )
+            )
+        timings["cities (wall)"] = time.perf_counter() - st
 
-        for geocode in geocodes:
-            self.create_geojson(f_geojson_path, geocode)
-            self.create_shapefile(path_root, geocode)
-            self.simplify_geojson(path_root, geocode)
-            geo_info.update(self.extract_geo_info_table(path_root, geocode))
-
-        # f_geojson_simplified_path.mkdir(parents=True, exist_ok=True)
-        self.create_geojson_by_state(f_geojson_simplified_path)
+        st = time.perf_counter()
+        manifest["states"] = self.create_geojson_by_state(
+            f_geojson_simplified_path,
+            set(pending),
+            manifest["states"],
+        )
+        timings["states"] = time.perf_counter() - st
 
-        with open(os.path.join(f_geojson_path, "geo_info.json"), "w") as f:
+        with open(geo_info_path, "w") as f:
             json.dump(geo_info, f)
             print("[II] Geo Info JSON saved!")
 
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+        timings["total"] = time.perf_counter() - st_total
+
+        # the stages run by the workers are summed over the cities
+        for stage, seconds in timings.items():
+            self.stdout.write(f"{stage:>15}: {seconds:8.2f}s")
+
         print("[II] DONE!")
@@ -1,16 +1,19 @@
 import os
 import shutil
+import tempfile
 import unittest
 from datetime import datetime
 from glob import glob
 from pathlib import Path, PurePath
 
+import fiona
 import numpy as np
 import rasterio
 from AlertaDengue.ad_main import settings
 
 # local
 from AlertaDengue.gis.geotiff import (
+    clip_raster,
     get_date_from_file_name,
     get_key_from_file_name,
     increase_resolution,
@@ -19,6 +22,8 @@ from AlertaDengue.gis.geotiff import (
 from django.contrib.staticfiles.finders import find
 from django.templatetags.static import static
 from django.test import TestCase
+from rasterio.transform import from_origin
+from shapely.geometry import Polygon, mapping
 
 
 def get_static(static_dir):
@@ -128,6 +133,68 @@ class TestGeoTiff(TestCase):
                 assert np.nanmean(img1) == np.nanmean(img2)
                 assert np.nanmedian(img1) == np.nanmedian(img2)
 
+    def test_clip_raster(self):
+        """
+        clip_raster gives the same raster as masking, increasing the
+        resolution and masking again the files.
+        """
+        factor_increase = 4
+        polygon = Polygon([(-43.8, -23.1), (-43.1, -23.0), (-43.5, -22.6)])
+        image = (
+            np.random.default_rng(0)
+            .normal(size=(1, 60, 60))
+            .astype(np.float32)
+        )
+        transform = from_origin(-45.0, -21.0, 0.0833, 0.0833)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            shapefile_path = os.path.join(tmp, "city.shp")
+            with fiona.open(
+                shapefile_path,
+                "w",
+                driver="ESRI Shapefile",
+                crs="EPSG:4326",
+                schema={"geometry": "Polygon", "properties": {}},
+            ) as shp:
+                shp.write({"geometry": mapping(polygon), "properties": {}})
+
+            raster_input_file_path = os.path.join(tmp, "country.tif")
+            raster_output_file_path = os.path.join(tmp, "city.tif")
+            with rasterio.open(
+                raster_input_file_path,
+                "w",
+                driver="GTiff",
+                height=60,
+                width=60,
+                count=1,
+                dtype="float32",
+                crs="EPSG:4326",
+                transform=transform,
+                nodata=np.nan,
+            ) as dst:
+                dst.write(image)
+
+            mask_raster_with_shapefile(
+                shapefile_path,
+                raster_input_file_path,
+                raster_output_file_path,
+            )
+            increase_resolution(raster_output_file_path, factor_increase)
+            mask_raster_with_shapefile(
+                shapefile_path,
+                raster_output_file_path,
+                raster_output_file_path,
+            )
+            with rasterio.open(raster_output_file_path) as src:
+                expected, expected_transform = src.read(), src.transform
+
+        out_image, out_transform = clip_raster(
+            image, transform, ([polygon], polygon.bounds), factor_increase
+        )
+
+        np.testing.assert_array_equal(out_image, expected)
+        assert out_transform.almost_equals(expected_transform)
+
 
 if __name__ == "__main__":
     unittest.main()
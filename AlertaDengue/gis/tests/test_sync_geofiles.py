@@ -0,0 +1,102 @@
+import datetime
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from gis.management.commands import sync_geofiles
+
+# a row of "Dengue_global"."Municipio"
+CITY_ROWS = pd.DataFrame(
+    {
+        "geocodigo": [3304557],
+        "nome": ["Rio de Janeiro"],
+        "geojson": [
+            json.dumps(
+                {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [
+                            [-43.8, -23.1],
+                            [-43.1, -23.1],
+                            [-43.1, -22.7],
+                            [-43.8, -23.1],
+                        ]
+                    ],
+                }
+            )
+        ],
+        "populacao": [6747815],
+        "uf": ["Rio de Janeiro"],
+    }
+)
+
+
+class TestSyncGeofiles(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            DEBUG=False, STATIC_ROOT=self.tmp.name
+        )
+        self.settings.enable()
+
+        week = datetime.date(2024, 1, 7)
+        self.patches = [
+            patch.object(
+                sync_geofiles,
+                "get_all_active_cities",
+                return_value=[(3304557, "Rio de Janeiro")],
+            ),
+            patch.object(
+                sync_geofiles.dbdata,
+                "get_all_active_cities_state",
+                return_value=[
+                    (3304557, week, "Rio de Janeiro", "Rio de Janeiro"),
+                    (
+                        3304557,
+                        week + datetime.timedelta(7),
+                        "Rio de Janeiro",
+                        "Rio de Janeiro",
+                    ),
+                ],
+            ),
+            patch.object(
+                sync_geofiles.maps,
+                "load_cities_geojson",
+                return_value=sync_geofiles.maps.cities_geojson(CITY_ROWS),
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def sync(self, *args) -> str:
+        out = io.StringIO()
+        call_command("sync_geofiles", *args, stdout=out)
+        return out.getvalue()
+
+    def test_unchanged_cities_are_skipped(self):
+        self.assertIn("1 of 1 cities changed", self.sync())
+        second = self.sync()
+
+        self.assertIn("0 of 1 cities changed", second)
+        self.assertNotIn("RJ.json stored", second)
+        self.assertIn("1 of 1 cities changed", self.sync("--force"))
+
+        root = Path(self.tmp.name)
+        with open(root / "geojson" / "geo_info.json") as f:
+            geo_info = json.load(f)
+        self.assertEqual(
+            geo_info["3304557"]["bounds"], [-43.8, -23.1, -43.1, -22.7]
+        )
+        with open(root / "geojson_simplified" / "RJ.json") as f:
+            self.assertEqual(len(json.load(f)["features"]), 1)
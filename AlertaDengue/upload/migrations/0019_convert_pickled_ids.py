@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations
+
+from upload.sinan.ids import convert_pickled_ids
+
+
+def convert_ids_logs(apps, schema_editor):
+    log_dir = Path(settings.DBF_SINAN) / "log"
+    if not log_dir.exists():
+        return
+    for pattern in ("*.inserts.log", "*.updates.log"):
+        for ids_file in log_dir.glob(pattern):
+            convert_pickled_ids(ids_file)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("upload", "0018_auto_20250107_0455"),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_ids_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from django.db import migrations
+
+from upload.sinan.logs import UploadLog
+
+
+def index_upload_logs(apps, schema_editor):
+    SINANUploadLogStatus = apps.get_model("upload", "SINANUploadLogStatus")
+    for log_status in SINANUploadLogStatus.objects.all():
+        text_log = Path(log_status.log_file)
+        log_index = text_log.with_suffix(".sqlite3")
+        if text_log.exists() and not log_index.exists():
+            UploadLog(log_index).import_text_log(text_log)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("upload", "0019_convert_pickled_ids"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_upload_logs, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,6 @@
 from typing import Literal, Optional, Union, Generator
 from pathlib import Path
 from datetime import date
-from array import array
-import pickle
 
 from epiweeks import Week
 
@@ -14,6 +12,8 @@ from django.contrib.auth import get_user_model
 from chunked_upload.models import BaseChunkedUpload
 
 from dados.models import City
+from .sinan.ids import count_ids, read_ids, write_ids
+from .sinan.logs import UploadLog
 from .sinan.utils import UF_CODES, chunk_gen
 
 
@@ -50,24 +50,16 @@ class SINANUploadLogStatus(models.Model):
     inserts_file = models.FilePathField(path=sinan_upload_log_path, null=True)
     updates_file = models.FilePathField(path=sinan_upload_log_path, null=True)
 
-    def _read_ids(self, id_type: Literal["inserts", "updates"]) -> array:
-        ids_file = Path(sinan_upload_log_path()) / f"{self.pk}.{id_type}.log"
-
-        if not ids_file.exists():
-            return array("i", [])
-
-        with ids_file.open("rb") as log:
-            ids = pickle.load(log)
-
-        return ids
+    def _ids_file(self, id_type: Literal["inserts", "updates"]) -> Path:
+        return Path(sinan_upload_log_path()) / f"{self.pk}.{id_type}.log"
 
     @property
     def inserts(self) -> int:
-        return len(self._read_ids("inserts"))
+        return count_ids(self._ids_file("inserts"))
 
     @property
     def updates(self) -> int:
-        return len(self._read_ids("updates"))
+        return count_ids(self._ids_file("updates"))
 
     def list_ids(
         self,
@@ -78,80 +70,94 @@ class SINANUploadLogStatus(models.Model):
         if abs(limit - offset) > 50000:
             raise ValueError("ids range exceeds 50_000 entries")
 
-        ids = self._read_ids(id_type)
-
-        if len(ids) == 0:
-            return []
-
         start, end = min([offset, limit]), max([offset, limit])
-        return ids[start:end+1]
+        return read_ids(self._ids_file(id_type), start, end + 1)
+
+    @property
+    def log_index(self) -> UploadLog:
+        return UploadLog(Path(self.log_file).with_suffix(".sqlite3"))
 
     @property
     def time_spend(self) -> float:
-        for log in self.read_logs(level="DEBUG"):
-            if "time_spend: " in log:
-                _, time_spend = log.split("time_spend: ")
-                return float(time_spend)
-        raise ValueError("No time_spend found in logs")
+        time_spend = self.log_index.get("time_spend")
+        if time_spend is None:
+            raise ValueError("No time_spend found in logs")
+        return float(time_spend)
+
+    @property
+    def last_progress(self) -> float:
+        return float(self.log_index.get("progress") or 0)
 
     def write_inserts(self, insert_ids: list[int]):
-        log_dir = Path(sinan_upload_log_path())
-        inserts_file = log_dir / f"{self.pk}.inserts.log"
-        inserts_file.touch()
-        inserts = array("i", insert_ids)
-        with inserts_file.open("wb") as log:
-            pickle.dump(inserts, log)
+        inserts_file = self._ids_file("inserts")
+        write_ids(inserts_file, insert_ids)
         self.inserts_file = inserts_file
         self.save()
 
     def write_updates(self, updates_ids: list[int]):
-        log_dir = Path(sinan_upload_log_path())
-        updates_file = log_dir / f"{self.pk}.updates.log"
-        updates_file.touch()
-        updates = array("i", updates_ids)
-        with updates_file.open("wb") as log:
-            pickle.dump(updates, log)
+        updates_file = self._ids_file("updates")
+        write_ids(updates_file, updates_ids)
         self.updates_file = updates_file
         self.save()
 
+    def _levels(self, level: Optional[str], only_level: bool):
+        if not level:
+            return None
+        if only_level:
+            return [level]
+        return self.LOG_LEVEL[self.LOG_LEVEL.index(level):]
+
+    def _format_log(self, level: str, message: str) -> str:
+        try:
+            spaces = " " * (max(map(len, self.LOG_LEVEL)) - len(level))
+        except TypeError:
+            spaces = " " * len("PROGRESS")
+        return f"{level}{spaces} - {message}"
+
+    def read_entries(
+        self,
+        since: int = 0,
+        level: Optional[Literal[
+            "PROGRESS", "DEBUG", "INFO", "WARNING", "ERROR", "SUCCESS"
+        ]] = None,
+        only_level: bool = False,
+    ) -> list[tuple[int, str, str]]:
+        """
+        (id, level, message) of the entries written after the entry `since`,
+        for polling the log incrementally.
+        """
+        return self.log_index.read(
+            levels=self._levels(level, only_level), since=since
+        )
+
     def read_logs(
         self,
         level: Optional[Literal[
             "PROGRESS", "DEBUG", "INFO", "WARNING", "ERROR", "SUCCESS"
         ]] = None,
         only_level: bool = False,
-    ):
-        with Path(self.log_file).open(mode='r', encoding="utf-8") as log_file:
-            logs = []
-
-            for line in log_file:
-                if level:
-                    startswith = (
-                        tuple(self.LOG_LEVEL[self.LOG_LEVEL.index(level):])
-                        if not only_level else level
-                    )
-                    if line.startswith(startswith):
-                        logs.append(line.strip())
-                else:
-                    logs.append(line.strip())
-        return logs
+        since: int = 0,
+    ) -> list[str]:
+        return [
+            self._format_log(entry_level, message)
+            for _, entry_level, message in self.read_entries(
+                since=since, level=level, only_level=only_level
+            )
+        ]
 
     def _write_logs(
         self,
         level: Literal["PROGRESS", "DEBUG", "INFO", "WARNING", "ERROR", "SUCCESS"],
         message: str,
+        state: Optional[dict] = None,
     ):
-        try:
-            spaces = " " * (max(map(len, self.LOG_LEVEL)) - len(level))
-        except TypeError:
-            spaces = " " * len("PROGRESS")
-
         if self.status != 0:
             raise ValueError(
                 "Log is closed for writing (finished with status " +
                 f"{self.status})."
             )
-        log_message = f"{level}{spaces} - {message}\n"
+        self.log_index.write(level, message, state=state)
+        log_message = self._format_log(level, message) + "\n"
         with Path(self.log_file).open(mode='a', encoding="utf-8") as log_file:
             log_file.write(log_message)
 
@@ -159,8 +165,12 @@ class SINANUploadLogStatus(models.Model):
         self._write_logs(level="DEBUG", message=message)
 
     def progress(self, rowcount: int, total_rows: int):
-        percentage = f"{min((rowcount / total_rows) * 100, 100):.2f}%"
-        self._write_logs(level="PROGRESS", message=percentage)
+        percentage = min((rowcount / total_rows) * 100, 100)
+        self._write_logs(
+            level="PROGRESS",
+            message=f"{percentage:.2f}%",
+            state={"progress": f"{percentage:.2f}"},
+        )
 
     def info(self, message: str):
         self._write_logs(level="INFO", message=message)
@@ -176,7 +186,11 @@ class SINANUploadLogStatus(models.Model):
     def done(self, inserts: int, time_spend: float):
         filename = SINANUpload.objects.get(status__id=self.id).upload.filename
         message = f"{inserts} inserts in {time_spend:.2f} seconds."
-        self._write_logs(level="SUCCESS", message=message)
+        self._write_logs(
+            level="SUCCESS",
+            message=message,
+            state={"time_spend": time_spend},
+        )
         self.status = 1
         self.save()
 
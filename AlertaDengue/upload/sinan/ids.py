@@ -0,0 +1,88 @@
+"""
+Storage of the inserted/updated Notificacao ids of a SINAN upload.
+
+The ids are stored as raw little-endian int32 (or int64, when an id
+doesn't fit) after an 8 bytes header, so the count comes from the file
+size and any window can be read with a memory map, without loading the
+whole file.
+"""
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+
+MAGIC = b"SIDS"
+VERSION = 1
+# magic, version, numpy type code ("i" int32, "q" int64), padding
+HEADER = struct.Struct("<4sBc2x")
+DTYPES = {b"i": np.dtype("<i4"), b"q": np.dtype("<i8")}
+
+
+def write_ids(path: Union[str, Path], ids: Iterable[int]) -> None:
+    ids = np.asarray(list(ids), dtype=np.int64)
+    int32_max = np.iinfo(np.int32).max
+    typecode = b"q" if len(ids) and ids.max() > int32_max else b"i"
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as ids_file:
+        ids_file.write(HEADER.pack(MAGIC, VERSION, typecode))
+        ids_file.write(ids.astype(DTYPES[typecode]).tobytes())
+    os.replace(tmp, path)
+
+
+def _dtype(path: Path) -> np.dtype:
+    with path.open("rb") as ids_file:
+        magic, _, typecode = HEADER.unpack(ids_file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an ids file")
+    return DTYPES[typecode]
+
+
+def count_ids(path: Union[str, Path]) -> int:
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return (path.stat().st_size - HEADER.size) // _dtype(path).itemsize
+
+
+def read_ids(
+    path: Union[str, Path], start: int = 0, stop: Optional[int] = None
+) -> List[int]:
+    """
+    Returns the ids in [start, stop), reading only that window of the file.
+    """
+    path = Path(path)
+    count = count_ids(path)
+    start, stop, _ = slice(start, stop).indices(count)
+    if start >= stop:
+        return []
+    ids = np.memmap(
+        path,
+        dtype=_dtype(path),
+        mode="r",
+        offset=HEADER.size,
+        shape=(count,),
+    )
+    return ids[start:stop].tolist()
+
+
+def is_pickled(path: Union[str, Path]) -> bool:
+    with Path(path).open("rb") as ids_file:
+        return ids_file.read(len(MAGIC)) != MAGIC
+
+
+def convert_pickled_ids(path: Union[str, Path]) -> bool:
+    """
+    Rewrites a pickled array("i") ids file in the current format.
+    Returns False if the file was already converted.
+    """
+    path = Path(path)
+    if not is_pickled(path):
+        return False
+    with path.open("rb") as ids_file:
+        ids = pickle.load(ids_file)
+    write_ids(path, ids)
+    return True
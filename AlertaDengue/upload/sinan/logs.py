@@ -0,0 +1,123 @@
+"""
+Structured storage of the SINAN upload logs.
+
+Each upload log is a SQLite file next to the plain text log, with one row
+per entry indexed by level, so the status views can filter by level and
+poll only the entries after the last one they have seen, and a key/value
+table that keeps the latest value of a metric (progress, time_spend)
+instead of searching it in the messages.
+"""
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_level_id ON entries (level, id);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# (id, level, message)
+Entry = Tuple[int, str, str]
+
+LOG_LINE = re.compile(r"^(?P<level>[A-Z]+)\s* - (?P<message>.*)$")
+
+
+class UploadLog:
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def write(
+        self, level: str, message: str, state: Optional[dict] = None
+    ) -> int:
+        """
+        Appends an entry, updating the `state` keys in the same transaction.
+        Returns the entry id.
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO entries (level, message) VALUES (?, ?)",
+                (level, message),
+            )
+            if state:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                    [(key, str(value)) for key, value in state.items()],
+                )
+            return cursor.lastrowid
+
+    def read(
+        self, levels: Optional[Iterable[str]] = None, since: int = 0
+    ) -> List[Entry]:
+        """
+        Returns the entries with id greater than `since`, in writing order,
+        optionally restricted to `levels`.
+        """
+        if not self.path.exists():
+            return []
+
+        sql = "SELECT id, level, message FROM entries WHERE id > ?"
+        params: list = [since]
+        if levels is not None:
+            levels = list(levels)
+            sql += f" AND level IN ({', '.join('?' * len(levels))})"
+            params += levels
+        sql += " ORDER BY id"
+
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.path.exists():
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def import_text_log(self, text_log: Union[str, Path]) -> int:
+        """
+        Loads the entries of a plain text log ("LEVEL - message" lines),
+        recovering the time_spend and progress states. Returns the number
+        of entries imported.
+        """
+        entries = []
+        state = {}
+        with Path(text_log).open(mode="r", encoding="utf-8") as log_file:
+            for line in log_file:
+                match = LOG_LINE.match(line.rstrip("\n"))
+                if not match:
+                    continue
+                level, message = match["level"], match["message"]
+                entries.append((level, message))
+                if level == "PROGRESS":
+                    state["progress"] = message.rstrip("%")
+                elif message.startswith("time_spend: "):
+                    state["time_spend"] = message[len("time_spend: ") :]
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM entries")
+            conn.executemany(
+                "INSERT INTO entries (level, message) VALUES (?, ?)", entries
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                list(state.items()),
+            )
+        return len(entries)
@@ -1,10 +1,14 @@
 import numpy as np
 import pandas as pd
-import datetime as dt
-from typing import Iterator, Tuple, Optional, Union
+from typing import Iterator, Tuple, Union
 
 
-from dados.dbdata import calculate_digit
+from dados.dbdata import (
+    calculate_digits,
+    fix_nu_notif,
+    to_datetime,
+    to_nullable_int,
+)
 
 
 UF_CODES = {
@@ -47,82 +51,66 @@ def chunk_gen(chunksize: int, totalsize: int) -> Iterator[Tuple[int, int]]:
         yield chunks * chunksize, chunks * chunksize + rest
 
 
-@np.vectorize
-def add_dv(geocodigo):
-    miscalculated_geocodes = {
-        "2201911": 2201919,
-        "2201986": 2201988,
-        "2202257": 2202251,
-        "2611531": 2611533,
-        "3117835": 3117836,
-        "3152139": 3152131,
-        "4305876": 4305871,
-        "5203963": 5203962,
-        "5203930": 5203939,
-    }
-
-    try:
-        if len(str(geocodigo)) == 7:
-            return int(geocodigo)
-        elif len(str(geocodigo)) == 6:
-            geocode = int(str(geocodigo) + str(calculate_digit(geocodigo)))
-            if str(geocode) in miscalculated_geocodes:
-                return miscalculated_geocodes[str(geocode)]
-            return int(geocode)
-        else:
-            return None
-    except (ValueError, TypeError):
-        return None
-
-
-@np.vectorize
-def convert_date(col: Union[pd.Timestamp, str, None]) -> Optional[dt.date]:
-    try:
-        if pd.isnull(col):
-            return None
-        if isinstance(col, dt.date):
-            return col
-        return pd.to_datetime(col).date()
-    except Exception:
-        return None
-
-
-@np.vectorize
-def convert_nu_ano(year: str, col: pd.Series) -> int:
-    return int(year) if pd.isnull(col) else int(col)
-
-
-@np.vectorize
-def convert_sem_pri(col: str) -> int:
-    if col:
-        col = str(col)[-2:]
-    return int(col)
-
-
-@np.vectorize
-def fix_nu_notif(value: Union[str, None]) -> Optional[int]:
-    char_to_replace = {",": "", "'": "", ".": ""}
-    if value is None:
-        return None
-    try:
-        return int(value)
-    except ValueError:
-        for char, replacement in char_to_replace.items():
-            value = value.replace(char, replacement)
-        try:
-            return int(value)
-        except ValueError:
-            return None
-
-
-@np.vectorize
-def fill_id_agravo(cid: str, default_cid: str) -> str:
-    return default_cid if not cid else cid
-
-
-@np.vectorize
-def convert_sem_not(col: np.ndarray[int]) -> np.ndarray[int]:
-    return int(str(int(col))[-2:])
+MISCALCULATED_GEOCODES = {
+    2201911: 2201919,
+    2201986: 2201988,
+    2202257: 2202251,
+    2611531: 2611533,
+    3117835: 3117836,
+    3152139: 3152131,
+    4305876: 4305871,
+    5203963: 5203962,
+    5203930: 5203939,
+}
+
+
+def add_dv(geocodigo: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    codes = pd.Series(geocodigo, copy=False).astype(str)
+    is_7 = codes.str.fullmatch(r"\d{7}|[+-]\d{6}").to_numpy()
+    is_6 = codes.str.fullmatch(r"\d{6}").to_numpy()
+
+    result = pd.Series(pd.NA, index=codes.index, dtype="Int64")
+    result[is_7] = codes[is_7].astype(np.int64).to_numpy()
+
+    codes_6 = codes[is_6].astype(np.int64).to_numpy()
+    geocodes = codes_6 * 10 + calculate_digits(codes_6)
+    result[is_6] = pd.Series(geocodes).replace(MISCALCULATED_GEOCODES).values
+    return to_nullable_int(result)
+
+
+def convert_date(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    dates = to_datetime(pd.Series(col, copy=False))
+    return np.where(dates.isna(), None, dates.dt.date.to_numpy(dtype=object))
+
+
+def convert_nu_ano(year: str, col: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    return (
+        pd.to_numeric(pd.Series(col, copy=False))
+        .fillna(int(year))
+        .to_numpy(dtype=np.int64)
+    )
+
+
+def convert_sem_pri(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    col = pd.Series(col, copy=False)
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy(dtype=np.int64) % 100
+    return pd.to_numeric(col.astype(str).str[-2:]).to_numpy(dtype=np.int64)
+
+
+def fill_id_agravo(
+    cid: Union[pd.Series, np.ndarray], default_cid: str
+) -> np.ndarray:
+    cid = pd.Series(cid, copy=False)
+    missing = cid.isna() | (cid == "")
+    return np.where(missing, default_cid, cid.to_numpy(dtype=object))
+
+
+def convert_sem_not(col: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    return (
+        pd.to_numeric(pd.Series(col, copy=False)).to_numpy(dtype=np.int64)
+        % 100
+    )
 
 
 def convert_data_types(col: pd.Series, dtype: type) -> pd.Series:
@@ -1,24 +1,28 @@
+import multiprocessing as mp
 import shutil
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterator, Tuple
+from typing import Iterator, Literal, Optional, Tuple
 
 import pyarrow.parquet as pq
-import geopandas as gpd
 import pandas as pd
 from celery import shared_task
 from psycopg2.extras import DictCursor
-from simpledbf import Dbf5
 
+from django.conf import settings
 from django.db import transaction
 from ad_main.settings import get_sqla_conn
+from dados.dbdata import to_copy_buffer
+from dbf.reader import DBFReader
 
 from .models import (
     sinan_upload_path,
     SINANUpload,
     SINANUploadFatalError,
 )
-from .sinan.utils import chunk_gen, parse_data
+from .sinan.utils import parse_data
 
 
 ENGINE = get_sqla_conn(database="dengue")
@@ -67,11 +71,7 @@ def sinan_verify_file(upload_sinan_id: int):
         if file.suffix.lower() == ".parquet":
             columns = pq.read_schema(str(file)).names
         elif file.suffix.lower() == ".dbf":
-            columns = gpd.read_file(
-                sinan.upload.file.path,
-                rows=0,
-                ignore_geometry=True,
-            ).columns
+            columns = DBFReader(str(file)).field_names
         elif file.suffix.lower() == ".csv":
             columns = pd.read_csv(str(file), nrows=0).columns
         else:
@@ -115,41 +115,212 @@ def sinan_verify_file(upload_sinan_id: int):
     sinan.status.debug("Task 'sinan_verify_file' finished.")
 
 
-def insert_chunk_to_temp_table(
-    upload_sinan_id: int,
-    df_chunk: pd.DataFrame,
-    tablename: str,
-    cursor,
-    filtered_rows: int = 0,
-):
-    sinan = SINANUpload.objects.get(pk=upload_sinan_id)
-    columns = list(sinan.COLUMNS.values())
+TEMP_TABLE_UNIQUE_COLS = [
+    "nu_notific",
+    "dt_notific",
+    "cid10_codigo",
+    "municipio_geocodigo",
+]
+
+
+def create_temp_table(cursor, tablename: str):
+    cursor.execute(f"""
+        CREATE TEMP TABLE {tablename} (
+            dt_notific DATE,
+            se_notif INTEGER,
+            ano_notif INTEGER,
+            dt_sin_pri DATE,
+            se_sin_pri INTEGER,
+            dt_digita DATE,
+            municipio_geocodigo INTEGER,
+            nu_notific INTEGER,
+            cid10_codigo VARCHAR(5),
+            dt_nasc DATE,
+            cs_sexo VARCHAR(1),
+            nu_idade_n INTEGER,
+            resul_pcr NUMERIC,
+            criterio NUMERIC,
+            classi_fin NUMERIC,
+            dt_chik_s1 DATE,
+            dt_chik_s2 DATE,
+            dt_prnt DATE,
+            res_chiks1 VARCHAR(255),
+            res_chiks2 VARCHAR(255),
+            resul_prnt VARCHAR(255),
+            dt_soro DATE,
+            resul_soro VARCHAR(255),
+            dt_ns1 DATE,
+            resul_ns1 VARCHAR(255),
+            dt_viral DATE,
+            resul_vi_n VARCHAR(255),
+            dt_pcr DATE,
+            sorotipo VARCHAR(255),
+            id_distrit NUMERIC,
+            id_bairro NUMERIC,
+            nm_bairro VARCHAR(255),
+            id_unidade NUMERIC,
+            CONSTRAINT casos_unicos UNIQUE (
+                {', '.join(TEMP_TABLE_UNIQUE_COLS)}
+            )
+        );
+    """)
+    # Unconstrained twin of the temp table, used as the COPY target.
+    # LIKE does not copy the UNIQUE constraint, so COPY never conflicts
+    cursor.execute(
+        f"CREATE TEMP TABLE {tablename}_stage (LIKE {tablename});"
+    )
+
+
+def drop_temp_table(cursor, tablename: str):
+    cursor.execute(f"DROP TABLE IF EXISTS {tablename}_stage;")
+    cursor.execute(f"DROP TABLE IF EXISTS {tablename};")
 
-    df_chunk = parse_data(df_chunk, sinan.cid10, sinan.year)
+
+def parse_chunk(
+    df_chunk: pd.DataFrame,
+    cid10: str,
+    year: int,
+    columns: dict[str, str],
+    required_cols: list[str],
+) -> tuple[pd.DataFrame, int]:
+    """
+    Parses a raw chunk, drops the rows missing required fields and renames
+    the columns to the Notificacao ones. Returns the chunk and the number
+    of rows dropped. Module level and model free, so it can run in a
+    process pool
+    """
+    df_chunk = parse_data(df_chunk, cid10, year)
     df_chunk = df_chunk.replace({pd.NA: None})
     len1 = len(df_chunk)
-    df_chunk = df_chunk.dropna(
-        subset=SINANUpload.REQUIRED_COLS, how="any"
-    )
+    df_chunk = df_chunk.dropna(subset=required_cols, how="any")
     len2 = len(df_chunk)
-    filtered_rows += len1-len2
-    df_chunk = df_chunk.rename(columns=sinan.COLUMNS)
+    df_chunk = df_chunk.rename(columns=columns)
+    return df_chunk, len1 - len2
+
+
+def count_rows(file: Path) -> int:
+    suffix = file.suffix.lower()
+    if suffix == ".parquet":
+        return pq.ParquetFile(str(file)).metadata.num_rows
+    if suffix == ".csv":
+        with file.open("r", encoding="iso-8859-1") as csv:
+            return sum(1 for _ in csv) - 1
+    if suffix == ".dbf":
+        return DBFReader(str(file)).numrec
+    raise ValueError(f"File type '{file.suffix}' is not supported")
+
+
+def iter_chunks(
+    file: Path,
+    columns: list[str],
+    chunksize: int,
+) -> Iterator[pd.DataFrame]:
+    suffix = file.suffix.lower()
+    if suffix == ".parquet":
+        parquet = pq.ParquetFile(str(file))
+        for batch in parquet.iter_batches(
+            batch_size=chunksize,
+            columns=columns,
+        ):
+            yield batch.to_pandas()
+    elif suffix == ".csv":
+        yield from pd.read_csv(
+            str(file),
+            chunksize=chunksize,
+            usecols=columns,
+        )
+    elif suffix == ".dbf":
+        reader = DBFReader(str(file), columns=columns)
+        yield from reader.iter_batches(batch_size=chunksize)
+    else:
+        raise ValueError(f"File type '{file.suffix}' is not supported")
+
+
+def parse_chunks(
+    chunks: Iterator[pd.DataFrame],
+    parse_args: tuple,
+    workers: int = 1,
+    queue_depth: int = 2,
+) -> Iterator[tuple[pd.DataFrame, int, int]]:
+    """
+    Yields (parsed chunk, dropped rows, raw rows) for each chunk, in the
+    same order as `chunks`. With more than one worker, up to `queue_depth`
+    chunks are parsed ahead in a pool while the caller is still consuming
+    (inserting) the previous ones
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield (*parse_chunk(chunk, *parse_args), len(chunk))
+        return
+
+    # Daemonic processes (e.g. some Celery pool workers) can't have
+    # children, use threads there: parsing still overlaps with the DB I/O
+    executor_class = (
+        ThreadPoolExecutor
+        if mp.current_process().daemon
+        else ProcessPoolExecutor
+    )
+    pending = deque()
+    with executor_class(max_workers=workers) as executor:
+        try:
+            for chunk in chunks:
+                future = executor.submit(parse_chunk, chunk, *parse_args)
+                pending.append((future, len(chunk)))
+                if len(pending) >= queue_depth:
+                    future, rows = pending.popleft()
+                    yield (*future.result(), rows)
+            while pending:
+                future, rows = pending.popleft()
+                yield (*future.result(), rows)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
 
+def executemany_to_temp_table(cursor, df: pd.DataFrame, tablename: str):
     insert_sql = f"""
-        INSERT INTO {tablename}({','.join(df_chunk.columns)}) 
-        VALUES ({','.join(['%s' for _ in df_chunk.columns])}) 
+        INSERT INTO {tablename}({','.join(df.columns)}) 
+        VALUES ({','.join(['%s' for _ in df.columns])}) 
         ON CONFLICT ON CONSTRAINT casos_unicos DO UPDATE SET 
-        {','.join([f'{j}=excluded.{j}' for j in df_chunk.columns])}
+        {','.join([f'{j}=excluded.{j}' for j in df.columns])}
     """
 
     rows = [
         tuple(row)
-        for row in df_chunk.itertuples(index=False)
+        for row in df.itertuples(index=False)
     ]
 
     cursor.executemany(insert_sql, rows)
 
 
+def copy_to_temp_table(cursor, df: pd.DataFrame, tablename: str):
+    # COPY can't resolve conflicts, so the chunk is deduplicated here
+    # (last occurrence wins, as with executemany) and merged into the temp
+    # table from the stage table in a single statement
+    df = df.drop_duplicates(subset=TEMP_TABLE_UNIQUE_COLS, keep="last")
+    columns = ",".join(df.columns)
+    stage = f"{tablename}_stage"
+
+    cursor.copy_expert(
+        f"COPY {stage} ({columns}) FROM STDIN "
+        "WITH (FORMAT csv, NULL '\\N')",
+        to_copy_buffer(df),
+    )
+    cursor.execute(
+        f"INSERT INTO {tablename} ({columns}) "
+        f"SELECT {columns} FROM {stage} "
+        "ON CONFLICT ON CONSTRAINT casos_unicos DO UPDATE SET "
+        + ",".join([f"{c}=excluded.{c}" for c in df.columns])
+    )
+    cursor.execute(f"TRUNCATE {stage};")
+
+
+LOADERS = {
+    "executemany": executemany_to_temp_table,
+    "copy": copy_to_temp_table,
+}
+
+
 def insert_temp_to_notificacao(
     cursor,
     temp_table: str,
@@ -175,8 +346,16 @@ def insert_temp_to_notificacao(
 
 
 @shared_task
-def sinan_insert_to_db(upload_sinan_id: int):
+def sinan_insert_to_db(
+    upload_sinan_id: int,
+    loader: Optional[Literal["executemany", "copy"]] = None,
+    workers: Optional[int] = None,
+    queue_depth: Optional[int] = None,
+):
     sinan = SINANUpload.objects.get(pk=upload_sinan_id)
+    loader = loader or settings.SINAN_UPLOAD_LOADER
+    workers = workers or settings.SINAN_UPLOAD_PARSE_WORKERS
+    queue_depth = queue_depth or settings.SINAN_UPLOAD_PARSE_QUEUE_DEPTH
     status = sinan.status
     status.debug("Task 'sinan_insert_to_db' started.")
 
@@ -189,114 +368,30 @@ def sinan_insert_to_db(upload_sinan_id: int):
 
     with ENGINE.begin() as conn:
         cursor = conn.connection.cursor(cursor_factory=DictCursor)
-        cursor.execute(f"""
-            CREATE TEMP TABLE {temp_table} (
-                dt_notific DATE,
-                se_notif INTEGER,
-                ano_notif INTEGER,
-                dt_sin_pri DATE,
-                se_sin_pri INTEGER,
-                dt_digita DATE,
-                municipio_geocodigo INTEGER,
-                nu_notific INTEGER,
-                cid10_codigo VARCHAR(5),
-                dt_nasc DATE,
-                cs_sexo VARCHAR(1),
-                nu_idade_n INTEGER,
-                resul_pcr NUMERIC,
-                criterio NUMERIC,
-                classi_fin NUMERIC,
-                dt_chik_s1 DATE,
-                dt_chik_s2 DATE,
-                dt_prnt DATE,
-                res_chiks1 VARCHAR(255),
-                res_chiks2 VARCHAR(255),
-                resul_prnt VARCHAR(255),
-                dt_soro DATE,
-                resul_soro VARCHAR(255),
-                dt_ns1 DATE,
-                resul_ns1 VARCHAR(255),
-                dt_viral DATE,
-                resul_vi_n VARCHAR(255),
-                dt_pcr DATE,
-                sorotipo VARCHAR(255),
-                id_distrit NUMERIC,
-                id_bairro NUMERIC,
-                nm_bairro VARCHAR(255),
-                id_unidade NUMERIC,
-                CONSTRAINT casos_unicos UNIQUE (
-                    nu_notific,
-                    dt_notific,
-                    cid10_codigo,
-                    municipio_geocodigo
-                )
-            );
-        """)
+        create_temp_table(cursor, temp_table)
         status.debug(f"{temp_table} created.")
         try:
-            if file.suffix.lower() == ".parquet":
-                parquet = pq.ParquetFile(str(file))
-                total_rows = parquet.count
-                status.progress(current_row, total_rows)
-                for batch in parquet.iter_batches(
-                    batch_size=chunksize,
-                    columns=list(sinan.COLUMNS)
-                ):
-                    df_chunk = batch.to_pandas()
-                    insert_chunk_to_temp_table(
-                        upload_sinan_id,
-                        df_chunk,
-                        temp_table,
-                        cursor,
-                        filtered_rows,
-                    )
-                    current_row += chunksize
-                    status.progress(current_row, total_rows)
-            elif file.suffix.lower() == ".csv":
-                with file.open("r", encoding="iso-8859-1") as csv:
-                    total_rows = sum(1 for _ in csv) - 1
-
+            try:
+                total_rows = count_rows(file)
+            except ValueError as e:
+                raise SINANUploadFatalError(status, str(e))
+
+            status.progress(current_row, total_rows)
+            for df_chunk, dropped, raw_rows in parse_chunks(
+                iter_chunks(file, list(sinan.COLUMNS), chunksize),
+                parse_args=(
+                    sinan.cid10,
+                    sinan.year,
+                    sinan.COLUMNS,
+                    sinan.REQUIRED_COLS,
+                ),
+                workers=workers,
+                queue_depth=queue_depth,
+            ):
+                LOADERS[loader](cursor, df_chunk, temp_table)
+                filtered_rows += dropped
+                current_row += raw_rows
                 status.progress(current_row, total_rows)
-                for chunk in pd.read_csv(
-                    str(file),
-                    chunksize=chunksize,
-                    usecols=list(sinan.COLUMNS)
-                ):
-                    insert_chunk_to_temp_table(
-                        upload_sinan_id,
-                        chunk,
-                        temp_table,
-                        cursor,
-                        filtered_rows,
-                    )
-                    current_row += chunksize
-                    status.progress(current_row, total_rows)
-            elif file.suffix.lower() == ".dbf":
-                dbf = Dbf5(str(file), codec="iso-8859-1")
-                total_rows = dbf.numrec
-                status.progress(current_row, total_rows)
-                for chunk, (lowerbound, upperbound) in enumerate(
-                    chunk_gen(chunksize, dbf.numrec)
-                ):
-                    chunk = gpd.read_file(
-                        str(file),
-                        include_fields=list(sinan.COLUMNS),
-                        rows=slice(lowerbound, upperbound),
-                        ignore_geometry=True,
-                    )
-                    insert_chunk_to_temp_table(
-                        upload_sinan_id,
-                        chunk,
-                        temp_table,
-                        cursor,
-                        filtered_rows,
-                    )
-                    current_row += chunksize
-                    status.progress(current_row, total_rows)
-            else:
-                raise SINANUploadFatalError(
-                    status, f"File type '{file.suffix}' is not supported"
-                )
         except Exception as e:
             if not isinstance(e, SINANUploadFatalError):
                 raise SINANUploadFatalError(
@@ -334,7 +429,7 @@ def sinan_insert_to_db(upload_sinan_id: int):
                 sinan.status, f"Error inserting {file.name} into db: {e}"
             )
         finally:
-            cursor.execute(f"DROP TABLE IF EXISTS {temp_table};")
+            drop_temp_table(cursor, temp_table)
             sinan.status.debug(f"{temp_table} dropped.")
 
         et = time.time()
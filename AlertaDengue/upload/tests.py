@@ -1,3 +1,241 @@
-from django.test import TestCase
+import datetime as dt
+import pickle
+import tempfile
+from array import array
+from pathlib import Path
 
-# Create your tests here.
+import pandas as pd
+from dbf.tests import legacy
+from django.test import SimpleTestCase
+
+from .models import SINANUpload
+from .sinan import ids, utils
+from .sinan.logs import UploadLog
+from .tasks import parse_chunks
+
+DT_COLS = [
+    "DT_SIN_PRI",
+    "DT_DIGITA",
+    "DT_NASC",
+    "DT_NOTIFIC",
+    "DT_CHIK_S1",
+    "DT_CHIK_S2",
+    "DT_PRNT",
+    "DT_SORO",
+    "DT_NS1",
+    "DT_VIRAL",
+    "DT_PCR",
+]
+
+
+def as_list(values) -> list:
+    return [None if pd.isnull(v) else v for v in values]
+
+
+class TestColumnarConverters(SimpleTestCase):
+    def assertSameOutput(self, func, legacy_func, *args):
+        self.assertEqual(as_list(func(*args)), as_list(legacy_func(*args)))
+
+    def test_add_dv(self):
+        geocodes = pd.Series(
+            # 220191 and 520396 are in the miscalculated geocodes
+            [None, "330455", "3304557", "220191", "520396", "33045", 355030]
+        )
+        self.assertSameOutput(utils.add_dv, legacy.sinan_add_dv, geocodes)
+
+    def test_convert_date(self):
+        values = pd.Series(
+            [
+                None,
+                "2023-01-15",
+                "not a date",
+                dt.date(2021, 5, 3),
+                "20230601",
+            ]
+        )
+        self.assertSameOutput(
+            utils.convert_date, legacy.sinan_convert_date, values
+        )
+
+    def test_convert_nu_ano(self):
+        values = pd.Series(["2023", None, "2022"])
+        self.assertSameOutput(
+            utils.convert_nu_ano, legacy.convert_nu_ano, "2024", values
+        )
+
+    def test_convert_sem_pri(self):
+        values = pd.Series(["202301", "202352", 202310])
+        self.assertSameOutput(
+            utils.convert_sem_pri, legacy.convert_sem_pri, values
+        )
+
+    def test_fix_nu_notif(self):
+        values = pd.Series(
+            [None, "1234567", "1.234.567", "12,345", "'123'", "12a34"]
+        )
+        self.assertSameOutput(utils.fix_nu_notif, legacy.fix_nu_notif, values)
+
+    def test_fill_id_agravo(self):
+        values = pd.Series([None, "A90", "", "A92.0"])
+        self.assertSameOutput(
+            utils.fill_id_agravo, legacy.sinan_fill_id_agravo, values, "A928"
+        )
+
+    def test_convert_sem_not(self):
+        values = pd.Series(["202301", "202352", 202310])
+        self.assertSameOutput(
+            utils.convert_sem_not, legacy.convert_sem_not, values
+        )
+
+    def test_parse_data_keeps_index(self):
+        df = pd.DataFrame(
+            {
+                "NU_NOTIFIC": ["1234567", "7654321"],
+                "ID_MUNICIP": ["330455", "355030"],
+                "CS_SEXO": ["M", None],
+                "NU_IDADE_N": ["4030", None],
+                "ID_DISTRIT": [None, None],
+                "ID_BAIRRO": [None, None],
+                "ID_UNIDADE": [None, None],
+                "ID_AGRAVO": [None, "A90"],
+                "SEM_PRI": ["202301", "202302"],
+                "NU_ANO": [None, "2023"],
+                "SEM_NOT": ["202302", "202303"],
+            },
+            index=[10, 20],
+        )
+        for col in DT_COLS:
+            df[col] = ["2023-01-08", None]
+
+        df = utils.parse_data(df, "A90", 2023)
+
+        self.assertEqual(list(df.index), [10, 20])
+        self.assertEqual(list(df.ID_MUNICIP), [3304557, 3550308])
+        self.assertEqual(list(df.CS_SEXO), ["M", "I"])
+        self.assertEqual(list(df.ID_AGRAVO), ["A90", "A90"])
+        self.assertEqual(list(df.NU_ANO), [2023, 2023])
+        self.assertEqual(list(df.SEM_NOT), [2, 3])
+        self.assertEqual(as_list(df.DT_NOTIFIC), [dt.date(2023, 1, 8), None])
+
+
+class TestParseChunks(SimpleTestCase):
+    def raw_chunk(self, start: int, rows: int) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                "NU_NOTIFIC": [str(n) for n in range(start, start + rows)],
+                "ID_MUNICIP": "330455",
+                "CS_SEXO": "F",
+                "NU_IDADE_N": "4030",
+                "ID_DISTRIT": None,
+                "ID_BAIRRO": None,
+                "ID_UNIDADE": None,
+                "ID_AGRAVO": "A90",
+                "SEM_PRI": "202301",
+                "NU_ANO": "2023",
+                "SEM_NOT": "202302",
+            },
+            index=range(rows),
+        )
+        for col in DT_COLS:
+            df[col] = "2023-01-08"
+        return df
+
+    def test_pool_keeps_chunks_order(self):
+        parse_args = (
+            "A90",
+            2023,
+            SINANUpload.COLUMNS,
+            SINANUpload.REQUIRED_COLS,
+        )
+        chunks = [self.raw_chunk(start, 10) for start in range(0, 100, 10)]
+
+        sequential = list(parse_chunks(iter(chunks), parse_args, workers=1))
+        pipelined = list(
+            parse_chunks(iter(chunks), parse_args, workers=3, queue_depth=4)
+        )
+
+        self.assertEqual(len(pipelined), len(chunks))
+        for (seq, _, seq_rows), (pip, _, pip_rows) in zip(
+            sequential, pipelined
+        ):
+            self.assertEqual(seq_rows, pip_rows)
+            self.assertEqual(list(seq.nu_notific), list(pip.nu_notific))
+
+
+class TestIdsStorage(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "1.inserts.log"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_window(self):
+        ids.write_ids(self.path, range(1000, 2000))
+        self.assertEqual(ids.count_ids(self.path), 1000)
+        self.assertEqual(ids.read_ids(self.path, 10, 13), [1010, 1011, 1012])
+        self.assertEqual(ids.read_ids(self.path, 998, 5000), [1998, 1999])
+        self.assertEqual(ids.read_ids(self.path, 2000, 2010), [])
+
+    def test_large_ids(self):
+        big = [1, 2**31, 2**40]
+        ids.write_ids(self.path, big)
+        self.assertEqual(ids.count_ids(self.path), 3)
+        self.assertEqual(ids.read_ids(self.path), big)
+
+    def test_empty_and_missing(self):
+        self.assertEqual(ids.count_ids(self.path), 0)
+        self.assertEqual(ids.read_ids(self.path), [])
+        ids.write_ids(self.path, [])
+        self.assertEqual(ids.count_ids(self.path), 0)
+        self.assertEqual(ids.read_ids(self.path, 0, 10), [])
+
+    def test_convert_pickled(self):
+        with self.path.open("wb") as log:
+            pickle.dump(array("i", [5, 3, 8]), log)
+        self.assertTrue(ids.convert_pickled_ids(self.path))
+        self.assertFalse(ids.convert_pickled_ids(self.path))
+        self.assertEqual(ids.read_ids(self.path), [5, 3, 8])
+
+
+class TestUploadLog(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log = UploadLog(Path(self.tmp.name) / "upload-1.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_read(self):
+        first = self.log.write("DEBUG", "started")
+        self.log.write("INFO", "10 rows were found.")
+        self.log.write("PROGRESS", "50.00%", state={"progress": "50.00"})
+
+        self.assertEqual(len(self.log.read()), 3)
+        self.assertEqual(
+            self.log.read(since=first),
+            [(2, "INFO", "10 rows were found."), (3, "PROGRESS", "50.00%")],
+        )
+        self.assertEqual(
+            self.log.read(levels=["INFO", "ERROR"]),
+            [(2, "INFO", "10 rows were found.")],
+        )
+        self.assertEqual(self.log.get("progress"), "50.00")
+        self.assertIsNone(self.log.get("time_spend"))
+
+    def test_import_text_log(self):
+        text_log = Path(self.tmp.name) / "upload-1.log"
+        text_log.write_text(
+            "DEBUG    - Log file created\n"
+            "PROGRESS - 100.00%\n"
+            "DEBUG    - time_spend: 12.5\n"
+            "SUCCESS  - 10 inserts in 12.50 seconds.\n",
+            encoding="utf-8",
+        )
+        self.assertEqual(self.log.import_text_log(text_log), 4)
+        self.assertEqual(self.log.get("time_spend"), "12.5")
+        self.assertEqual(self.log.get("progress"), "100.00")
+        self.assertEqual(
+            self.log.read(levels=["SUCCESS"]),
+            [(4, "SUCCESS", "10 inserts in 12.50 seconds.")],
+        )